@@ -1,42 +1,229 @@
+import asyncio
+import mimetypes
+import os
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
 from pathlib import Path
 from typing import Any
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+import aiofiles  # type: ignore
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
-from app.api.file_storage.utils import get_file_path_by_uuid, save_file
-from app.api.qr_code_recognize.enhance_and_recognize_qr_code import get_qr_code_data
+from app.api.file_storage.file_index import FileIndex
+from app.api.file_storage.image_probe import ImageDimensionsError, InvalidImageError, validate_image
+from app.api.file_storage.image_variants import ImageVariantError, ImageVariantStore
+from app.api.file_storage.models import (
+    StoredFile,
+    StoredFileStats,
+    UploadSessionComplete,
+    UploadSessionCreate,
+    UploadSessionStatus,
+)
+from app.api.file_storage.resumable_upload import (
+    UploadChecksumMismatchError,
+    UploadOffsetMismatchError,
+    UploadSessionNotFoundError,
+    append_upload_chunk,
+    cancel_upload_session,
+    complete_upload_session,
+    create_upload_session,
+    get_upload_session,
+)
+from app.api.file_storage.storage import FilesystemStorage, create_file_storage
+from app.api.file_storage.utils import (
+    FileTooLargeError,
+    extract_zip_archive,
+    get_content_hasher,
+    get_stored_file_path,
+    read_file_content,
+    save_file,
+)
+from app.api.qr_code_recognize.models import RecognitionJob, RecognitionJobStatus
+from app.api.qr_code_recognize.recognition_cache import get_recognition_cache_key, recognition_cache
+from app.api.qr_code_recognize.recognition_executor import RecognitionExecutorBusyError, recognition_executor
+from app.api.qr_code_recognize.recognition_job_queue import RecognitionJobQueue, RecognitionJobRetryLaterError
+from app.api.qr_code_recognize.recognition_worker import recognize_qr_code_data
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.startup import startup_state
+from app.logger import logger
 
 file_storage_router = APIRouter()
 
 _ROOT_DIRECTORY: Path = Path(__file__).resolve().parent.parent.parent.parent
 BASE_STORAGE_PATH = Path.joinpath(_ROOT_DIRECTORY, "file_storage")
 
+ALLOWED_IMAGE_CONTENT_TYPES = ["image/jpeg", "image/png", "image/gif", "image/webp"]
+ALLOWED_ARCHIVE_CONTENT_TYPES = ["application/zip", "application/x-zip-compressed"]
 
-def validate_image_content_type(
+# Сохраненные файлы не изменяются, поэтому клиенты и прокси могут кэшировать их бессрочно
+FILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+FILE_INDEX_DB_NAME = ".file_index.sqlite3"
+RECOGNITION_JOBS_DB_NAME = ".recognition_jobs.sqlite3"
+
+file_storage = create_file_storage(BASE_STORAGE_PATH)
+
+image_variant_store = ImageVariantStore(
+    BASE_STORAGE_PATH,
+    widths=settings.FILE_STORAGE_IMAGE_VARIANT_WIDTHS,
+    image_format=settings.FILE_STORAGE_IMAGE_VARIANT_FORMAT,
+    quality=settings.FILE_STORAGE_IMAGE_VARIANT_QUALITY,
+    max_total_bytes=settings.FILE_STORAGE_IMAGE_VARIANTS_MAX_TOTAL_BYTE,
+    storage=file_storage,
+)
+
+
+file_index = FileIndex(
+    settings.FILE_INDEX_DB_PATH or BASE_STORAGE_PATH / FILE_INDEX_DB_NAME,
+    batch_size=settings.FILE_INDEX_BATCH_SIZE,
+    flush_interval_sec=settings.FILE_INDEX_FLUSH_INTERVAL_SEC,
+)
+
+recognition_job_queue = RecognitionJobQueue(
+    settings.RECOGNITION_JOBS_DB_PATH or BASE_STORAGE_PATH / RECOGNITION_JOBS_DB_NAME,
+    max_attempts=settings.RECOGNITION_JOBS_MAX_ATTEMPTS,
+    retry_delay_sec=settings.RECOGNITION_JOBS_RETRY_DELAY_SEC,
+    lease_sec=settings.RECOGNITION_JOBS_LEASE_SEC,
+)
+
+
+def index_saved_file(
+    uploaded_file_data: dict[str, Any], file_name: str | None, content_type: str | None
+) -> None:
+    """Добавление сохраненного файла в индекс файлов"""
+    file_index.add(
+        uploaded_file_data["file_id"],
+        extension=Path(file_name).suffix if file_name else "",
+        size_byte=uploaded_file_data["file_size_byte"],
+        content_hash=uploaded_file_data["content_hash"],
+        content_type=content_type,
+        file_name=file_name,
+        # Ключ duplicate есть только у файлов, сохраненных по хэшу содержимого
+        content_addressed="duplicate" in uploaded_file_data,
+    )
+
+
+async def save_and_index_file(file: UploadFile) -> dict[str, Any]:
+    uploaded_file_data = await save_file(file, BASE_STORAGE_PATH, storage=file_storage)
+    index_saved_file(uploaded_file_data, file.filename, file.content_type)
+    return uploaded_file_data
+
+
+async def discard_saved_file(save_task: "asyncio.Task[dict[str, Any]]") -> None:
+    """Удаление файла, сохраненного задачей save_task, из хранилища и индекса файлов"""
+    try:
+        uploaded_file_data = await save_task
+    except Exception:
+        return
+    file_id = uploaded_file_data["file_id"]
+    await asyncio.to_thread(file_storage.delete, file_id)
+    await file_index.remove(file_id)
+
+
+async def save_and_recognize_file(
+    file: UploadFile, content: bytes, recognize: Callable[[bytes, str | None], Awaitable[Any]]
+) -> tuple[dict[str, Any], Any]:
+    """
+    Распознавание QR-кода из памяти, параллельно с сохранением файла на диск.
+    Если распознавание не выполнено (сервис перегружен, превышено время, ошибка), сохраненный файл
+    удаляется: клиент повторит запрос, а файл без результата остался бы в хранилище и индексе
+    """
+    save_task = asyncio.create_task(save_and_index_file(file))
+    try:
+        qr_code_data_result = await recognize(content, file.filename)
+    except asyncio.CancelledError:
+        save_task.cancel()
+        raise
+    except Exception:
+        await discard_saved_file(save_task)
+        raise
+    return await save_task, qr_code_data_result
+
+
+async def resolve_file_path(file_id: str) -> tuple[str, str]:
+    """
+    Путь к сохраненному файлу и расширение загруженного файла по индексу файлов, для файлов,
+    сохраненных до появления индекса, - по содержимому директории хранилища
+    :raises FileNotFoundError: файла нет в хранилище
+    """
+    stored_file = await file_index.get(file_id)
+    if stored_file is not None:
+        file_path = get_stored_file_path(
+            file_id,
+            stored_file.extension,
+            stored_file.content_hash,
+            stored_file.content_addressed,
+            BASE_STORAGE_PATH,
+        )
+        return file_path, stored_file.extension
+    if not isinstance(file_storage, FilesystemStorage):
+        raise FileNotFoundError(f"Файл {file_id} хранится не отдельным файлом")
+    return await asyncio.to_thread(file_storage.get_file_path_and_extension, file_id)
+
+
+def schedule_image_variants(background_tasks: BackgroundTasks, file_id: str) -> None:
+    """Построение превью после ответа клиенту (если включено FILE_STORAGE_IMAGE_VARIANTS_EAGER)"""
+    if settings.FILE_STORAGE_IMAGE_VARIANTS_EAGER:
+        background_tasks.add_task(image_variant_store.generate_all, file_id)
+
+
+async def validate_uploaded_image(file: UploadFile) -> None:
+    """
+    Проверка содержимого изображения по заголовку (сигнатура формата и размеры) без декодирования
+    :raises FileTooLargeError: размер файла больше FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE
+    :raises InvalidImageError: файл не является изображением
+    :raises ImageDimensionsError: размеры изображения больше допустимых
+    """
+    if file.size is not None and file.size > settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE:
+        raise FileTooLargeError(f"Размер файла больше {settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE} байт")
+    await asyncio.to_thread(
+        validate_image,
+        file.file,
+        settings.FILE_STORAGE_IMAGE_MAX_DIMENSION_PX,
+        settings.FILE_STORAGE_IMAGE_MAX_PIXELS,
+    )
+
+
+async def validate_image_content_type(
     file: UploadFile = File(..., description="Изображение для загрузки"),
 ) -> UploadFile:
     """
-    Dependency для проверки типа контента изображения
+    Dependency для проверки типа контента изображения и его содержимого по заголовку:
+    не изображения и слишком большие изображения отклоняются до записи на диск и распознавания
     """
-    allowed_content_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
-
-    if file.content_type not in allowed_content_types:
+    if file.content_type not in ALLOWED_IMAGE_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
             detail="Недопустимый тип файла. Разрешены только изображения (JPEG, PNG, GIF, WebP)",
         )
 
+    try:
+        await validate_uploaded_image(file)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageDimensionsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     return file
 
 
 @file_storage_router.post("/upload-image/")
-async def upload_image(file: UploadFile = Depends(validate_image_content_type)) -> dict[str, Any]:
+async def upload_image(
+    background_tasks: BackgroundTasks, file: UploadFile = Depends(validate_image_content_type)
+) -> dict[str, Any]:
     """
     Эндпоинт для загрузки изображения (jpeg, png, gif, webp)
     """
     try:
         # Загрузка файла
-        uploaded_file_data = await save_file(file, BASE_STORAGE_PATH)
+        uploaded_file_data = await save_and_index_file(file)
+        schedule_image_variants(background_tasks, uploaded_file_data["file_id"])
 
         return {
             **uploaded_file_data,
@@ -44,23 +231,79 @@ async def upload_image(file: UploadFile = Depends(validate_image_content_type))
             "content_type": file.content_type,
         }
 
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла {file.filename}: {str(e)}")
     finally:
         await file.close()
 
 
+async def recognize_qr_code(content: bytes, file_name: str | None) -> Any:
+    """
+    Распознавание QR-кода из содержимого файла в пуле процессов с использованием кэша результатов
+    """
+    content_hash = get_content_hasher()
+    content_hash.update(content)
+    cache_key = get_recognition_cache_key(content_hash.hexdigest())
+
+    if settings.RECOGNITION_CACHE_ENABLED:
+        found_in_cache, qr_code_data_result = await recognition_cache.get(cache_key)
+        if found_in_cache:
+            return qr_code_data_result
+
+    try:
+        qr_code_data_result, is_final, worker_metrics = await recognition_executor.run(
+            recognize_qr_code_data, content, file_name
+        )
+    except RecognitionExecutorBusyError:
+        metrics.inc("qr_recognition_failures_total", reason="busy")
+        raise
+    except TimeoutError:
+        metrics.inc("qr_recognition_failures_total", reason="timeout")
+        raise
+    metrics.merge(worker_metrics)
+    # "Не найден" после пропуска части улучшений (adaptive) не кэшируется: при следующем запросе
+    # пропущенные улучшения могут быть применены
+    if settings.RECOGNITION_CACHE_ENABLED and is_final:
+        await recognition_cache.set(cache_key, qr_code_data_result)
+
+    return qr_code_data_result
+
+
+async def warm_up_recognition() -> None:
+    """
+    Прогрев распознавания в фоне после запуска: загрузка модулей распознавания в основном процессе
+    (нужны для ключа кэша) и запуск всех процессов пула с пробным распознаванием в каждом
+    """
+    started_at = time.perf_counter()
+    try:
+        await asyncio.to_thread(get_recognition_cache_key, "")
+        await recognition_executor.warm_up()
+    except Exception as e:
+        logger.warning("Ошибка прогрева распознавания: %s", e)
+        return
+    startup_state.mark_warmed_up(time.perf_counter() - started_at)
+
+
 @file_storage_router.post("/get-qr-code-data/")
-async def qr_code_data(file: UploadFile = Depends(validate_image_content_type)) -> dict[str, Any]:
+async def qr_code_data(
+    background_tasks: BackgroundTasks, file: UploadFile = Depends(validate_image_content_type)
+) -> dict[str, Any]:
     """
     Эндпоинт для получения данных QR-code
     """
     try:
-        # Загрузка файла
-        uploaded_file_data = await save_file(file, BASE_STORAGE_PATH)
-
-        file_path = get_file_path_by_uuid(uploaded_file_data.get("file_id"), BASE_STORAGE_PATH)
-        qr_code_data_result = get_qr_code_data(file_path)
+        content = await read_file_content(file)
+        uploaded_file_data, qr_code_data_result = await save_and_recognize_file(
+            file, content, recognize_qr_code
+        )
+        file_index.set_recognition(
+            uploaded_file_data["file_id"],
+            "recognized" if qr_code_data_result else "not_found",
+            qr_code_data_result,
+        )
+        schedule_image_variants(background_tasks, uploaded_file_data["file_id"])
 
         return {
             "qr_code_data_result": qr_code_data_result,
@@ -69,7 +312,495 @@ async def qr_code_data(file: UploadFile = Depends(validate_image_content_type))
             "content_type": file.content_type,
         }
 
+    except RecognitionExecutorBusyError:
+        raise HTTPException(
+            status_code=429,
+            detail="Сервис распознавания перегружен, повторите запрос позже",
+            headers={"Retry-After": str(settings.RECOGNITION_RETRY_AFTER_SEC)},
+        )
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Превышено время распознавания файла {file.filename}")
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла {file.filename}: {str(e)}")
+    finally:
+        await file.close()
+
+
+async def run_recognition_job(job: RecognitionJob) -> Any:
+    """Выполнение задачи из очереди асинхронного распознавания (обработчик RecognitionJobQueue.run_worker)"""
+    if job.file_path:
+        async with aiofiles.open(job.file_path, "rb") as f:
+            content = await f.read()
+    else:
+        # Файл хранится в сегменте (FILE_STORAGE_BACKEND=pack)
+        content, _ = await asyncio.to_thread(file_storage.read, job.file_id)
+    try:
+        qr_code_data_result = await recognize_qr_code(content, job.file_name)
+    except RecognitionExecutorBusyError:
+        raise RecognitionJobRetryLaterError() from None
+
+    file_index.set_recognition(
+        job.file_id, "recognized" if qr_code_data_result else "not_found", qr_code_data_result
+    )
+    return qr_code_data_result
+
+
+def get_recognition_job_status(job: RecognitionJob) -> RecognitionJobStatus:
+    return RecognitionJobStatus(
+        job_id=job.id,
+        file_id=job.file_id,
+        file_name=job.file_name,
+        status=job.status,
+        attempts=job.attempts,
+        qr_code_data_result=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+@file_storage_router.post("/get-qr-code-data/async/", response_model=RecognitionJobStatus, status_code=202)
+async def qr_code_data_async(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = Depends(validate_image_content_type),
+    priority: int = Query(0, description="Задачи с большим приоритетом выполняются раньше"),
+) -> RecognitionJobStatus:
+    """
+    Эндпоинт для асинхронного получения данных QR-code: файл сохраняется, задача распознавания
+    ставится в очередь, ответ 202 содержит job_id. Результат - GET /jobs/{job_id} (заголовок Location)
+    """
+    try:
+        uploaded_file_data = await save_and_index_file(file)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла {file.filename}: {str(e)}")
     finally:
         await file.close()
+
+    file_id = uploaded_file_data["file_id"]
+    file_path = ""
+    if file_storage.has_file_paths:
+        file_path = get_stored_file_path(
+            file_id,
+            Path(file.filename).suffix if file.filename else "",
+            uploaded_file_data["content_hash"],
+            "duplicate" in uploaded_file_data,
+            BASE_STORAGE_PATH,
+        )
+    job = await recognition_job_queue.enqueue(file_id, file_path, file.filename, priority=priority)
+    schedule_image_variants(background_tasks, file_id)
+
+    response.headers["Location"] = str(request.url_for("get_recognition_job", job_id=job.id))
+    return get_recognition_job_status(job)
+
+
+@file_storage_router.get("/jobs/{job_id}", response_model=RecognitionJobStatus)
+async def get_recognition_job(
+    job_id: str,
+    wait: float = Query(
+        0, ge=0, le=settings.RECOGNITION_JOBS_MAX_WAIT_SEC, description="Ожидание завершения задачи, секунд"
+    ),
+) -> RecognitionJobStatus:
+    """
+    Состояние задачи асинхронного распознавания (queued, running, done, failed).
+    С параметром wait ответ возвращается при завершении задачи или по истечении wait секунд
+    """
+    job = await recognition_job_queue.get(job_id, wait_sec=wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+    return get_recognition_job_status(job)
+
+
+async def recognize_batch_file(file: UploadFile, semaphore: asyncio.Semaphore) -> dict[str, Any]:
+    """Сохранение и распознавание одного файла пакета; ошибки возвращаются в результате, а не выбрасываются"""
+    file_info = {"file_name": file.filename, "content_type": file.content_type}
+    if file.content_type not in ALLOWED_IMAGE_CONTENT_TYPES:
+        return {"status": "error", "detail": "Недопустимый тип файла", **file_info}
+    try:
+        await validate_uploaded_image(file)
+    except (FileTooLargeError, InvalidImageError, ImageDimensionsError) as e:
+        await file.close()
+        return {"status": "error", "detail": str(e), **file_info}
+
+    async with semaphore:
+        try:
+            content = await read_file_content(file)
+            uploaded_file_data, qr_code_data_result = await save_and_recognize_file(
+                file, content, recognize_qr_code_with_retry
+            )
+        except Exception as e:
+            return {"status": "error", "detail": str(e) or e.__class__.__name__, **file_info}
+        finally:
+            await file.close()
+
+    status = "recognized" if qr_code_data_result else "not_found"
+    file_index.set_recognition(uploaded_file_data["file_id"], status, qr_code_data_result)
+    return {
+        "status": status,
+        "qr_code_data_result": qr_code_data_result,
+        **uploaded_file_data,
+        **file_info,
+    }
+
+
+async def recognize_qr_code_with_retry(content: bytes, file_name: str | None, attempts: int = 3) -> Any:
+    """Распознавание с ожиданием свободного места в очереди вместо немедленного отказа"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return await recognize_qr_code(content, file_name)
+        except RecognitionExecutorBusyError:
+            if attempt == attempts:
+                raise
+            await asyncio.sleep(settings.RECOGNITION_RETRY_AFTER_SEC)
+
+
+async def stream_batch_results(files: list[UploadFile | tuple[str, str]]) -> AsyncGenerator[bytes]:
+    """Результаты по файлам в формате NDJSON в порядке готовности, последней строкой - итоги"""
+    started_at = time.perf_counter()
+    # Пакет не занимает все процессы распознавания, оставляя место одиночным запросам
+    semaphore = asyncio.Semaphore(max(settings.RECOGNITION_MAX_WORKERS // 2, 1))
+
+    summary: dict[str, float] = {"total": len(files), "recognized": 0, "not_found": 0, "error": 0}
+    tasks = []
+    for file in files:
+        if isinstance(file, tuple):
+            file_name, detail = file
+            summary["error"] += 1
+            yield orjson.dumps({"status": "error", "detail": detail, "file_name": file_name}) + b"\n"
+        else:
+            tasks.append(asyncio.create_task(recognize_batch_file(file, semaphore)))
+
+    try:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            summary[result["status"]] += 1
+            yield orjson.dumps(result) + b"\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    summary["elapsed_sec"] = round(time.perf_counter() - started_at, 3)
+    yield orjson.dumps({"summary": summary}) + b"\n"
+
+
+@file_storage_router.post("/get-qr-code-data/batch/")
+async def qr_code_data_batch(
+    files: list[UploadFile] = File(..., description="Изображения или zip-архивы с изображениями"),
+) -> StreamingResponse:
+    """
+    Эндпоинт для пакетного получения данных QR-code.
+    Файлы сохраняются и распознаются параллельно, результаты возвращаются построчно (NDJSON)
+    по мере готовности, последняя строка - итоги {"summary": {...}}
+    """
+    batch_files: list[UploadFile | tuple[str, str]] = []
+    for file in files:
+        if file.content_type in ALLOWED_ARCHIVE_CONTENT_TYPES:
+            try:
+                batch_files.extend(
+                    await asyncio.to_thread(
+                        extract_zip_archive, file.file, settings.RECOGNITION_BATCH_MAX_FILES
+                    )
+                )
+            except (ValueError, OSError) as e:
+                raise HTTPException(status_code=400, detail=f"Ошибка чтения архива {file.filename}: {str(e)}")
+        elif file.content_type in ALLOWED_IMAGE_CONTENT_TYPES:
+            batch_files.append(file)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Недопустимый тип файла {file.filename}. Разрешены изображения и zip-архивы",
+            )
+
+    if len(batch_files) > settings.RECOGNITION_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400, detail=f"Слишком много файлов, максимум {settings.RECOGNITION_BATCH_MAX_FILES}"
+        )
+
+    return StreamingResponse(stream_batch_results(batch_files), media_type="application/x-ndjson")
+
+
+@file_storage_router.post("/uploads/", response_model=UploadSessionStatus, status_code=201)
+async def create_upload(upload: UploadSessionCreate) -> UploadSessionStatus:
+    """
+    Создание сессии загрузки изображения по частям.
+    Далее части отправляются через PUT /uploads/{upload_id}?offset=N, загрузка завершается
+    через POST /uploads/{upload_id}/complete. После обрыва соединения текущее смещение
+    возвращает GET /uploads/{upload_id}.
+    """
+    if upload.content_type not in ALLOWED_IMAGE_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail="Недопустимый тип файла. Разрешены только изображения (JPEG, PNG, GIF, WebP)",
+        )
+
+    try:
+        session = create_upload_session(upload.file_name, upload.content_type, upload.size, BASE_STORAGE_PATH)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return UploadSessionStatus(**session)
+
+
+@file_storage_router.get("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def get_upload(upload_id: str) -> UploadSessionStatus:
+    """
+    Состояние сессии загрузки: offset - сколько байт уже принято
+    """
+    try:
+        return UploadSessionStatus(**get_upload_session(upload_id, BASE_STORAGE_PATH))
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@file_storage_router.put("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Смещение части в файле"),
+) -> UploadSessionStatus:
+    """
+    Часть файла в теле запроса (application/octet-stream), записывается на диск по мере получения.
+    Если offset не совпадает с количеством принятых байт - 409 с текущим смещением.
+    """
+    try:
+        session = await append_upload_chunk(upload_id, offset, request.stream(), BASE_STORAGE_PATH)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return UploadSessionStatus(**session)
+
+
+@file_storage_router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str, upload: UploadSessionComplete, background_tasks: BackgroundTasks
+) -> dict[str, Any]:
+    """
+    Завершение загрузки: проверка хэша (BLAKE2b, 32 байта, hex) и сохранение файла в хранилище
+    """
+    try:
+        uploaded_file_data = await complete_upload_session(
+            upload_id, upload.content_hash, BASE_STORAGE_PATH, storage=file_storage
+        )
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Файл загружен не полностью: {str(e)}",
+            headers={"Upload-Offset": str(e.offset)},
+        )
+    except UploadChecksumMismatchError as e:
+        raise HTTPException(status_code=400, detail=f"{str(e)}, загрузку нужно начать заново")
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageDimensionsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    index_saved_file(uploaded_file_data, uploaded_file_data["file_name"], uploaded_file_data["content_type"])
+    schedule_image_variants(background_tasks, upload_id)
+    return uploaded_file_data
+
+
+@file_storage_router.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str) -> None:
+    """
+    Отмена загрузки и удаление принятых частей
+    """
+    try:
+        await cancel_upload_session(upload_id, BASE_STORAGE_PATH)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def get_file_etag(file_id: str, file_path: str, stat_result: os.stat_result) -> str:
+    """
+    ETag сохраненного файла: для файлов, хранящихся по хэшу содержимого (имя блоба не совпадает
+    с file_id), - сам хэш, иначе время изменения и размер
+    """
+    blob_name = Path(file_path).stem
+    if blob_name != file_id:
+        return f'"{blob_name}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def get_byte_range(range_header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Диапазон байт (начало, конец включительно) из заголовка Range: bytes=0-99, bytes=100-, bytes=-100.
+    None - заголовка нет или он не поддерживается (несколько диапазонов), отдается весь файл
+    :raises ValueError: диапазон за пределами файла
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, _, end_str = range_header.removeprefix("bytes=").strip().partition("-")
+    try:
+        if start_str:
+            start, end = int(start_str), int(end_str) if end_str else size - 1
+        else:
+            start, end = max(size - int(end_str), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise ValueError(f"Диапазон {range_header} за пределами файла размером {size} байт")
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def is_not_modified(if_none_match: str | None, etag: str) -> bool:
+    """Проверка заголовка If-None-Match (список ETag, слабые W/ и "*")"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@file_storage_router.get("/files/", response_model=list[StoredFile])
+async def list_files(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    recognition_status: str | None = Query(None, description="recognized, not_found"),
+) -> list[StoredFile]:
+    """
+    Список сохраненных файлов (последние загруженные первыми) по индексу файлов
+    """
+    return await file_index.list(limit=limit, offset=offset, recognition_status=recognition_status)
+
+
+@file_storage_router.get("/files/stats", response_model=StoredFileStats)
+async def files_stats() -> StoredFileStats:
+    """
+    Количество и общий размер сохраненных файлов, количество по статусу распознавания
+    """
+    return StoredFileStats(**await file_index.stats())
+
+
+@file_storage_router.api_route("/files/{file_id}", methods=["GET", "HEAD"])
+async def download_file(file_id: str, request: Request) -> Response:
+    """
+    Эндпоинт для получения сохраненного файла.
+    Поддерживаются Range-запросы и If-None-Match (304). Файл отдается FileResponse без чтения
+    в память приложения (через http.response.pathsend, если сервер его поддерживает).
+    """
+    if not file_storage.has_file_paths:
+        return await download_stored_content(file_id, request)
+
+    try:
+        UUID(file_id)
+        file_path, extension = await resolve_file_path(file_id)
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail=f"Файл {file_id} не найден")
+
+    headers = {"ETag": get_file_etag(file_id, file_path, stat_result), "Cache-Control": FILE_CACHE_CONTROL}
+    if is_not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # Тип по расширению загруженного файла: у блоба, сохраненного по хэшу содержимого, расширения нет
+    return FileResponse(
+        file_path,
+        media_type=mimetypes.guess_type(f"{file_id}{extension}")[0] or "application/octet-stream",
+        headers=headers,
+        stat_result=stat_result,
+    )
+
+
+async def download_stored_content(file_id: str, request: Request) -> Response:
+    """Ответ с содержимым файла, хранящегося не отдельным файлом (в сегменте): Range и If-None-Match"""
+    try:
+        UUID(file_id)
+        content, extension = await asyncio.to_thread(file_storage.read, file_id)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail=f"Файл {file_id} не найден")
+
+    # Содержимое файла с данным id не изменяется
+    headers = {"ETag": f'"{file_id}"', "Cache-Control": FILE_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if is_not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(f"{file_id}{extension}")[0] or "application/octet-stream"
+    try:
+        byte_range = get_byte_range(request.headers.get("range"), len(content))
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(content)}"})
+    if byte_range is None:
+        return Response(content, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+    return Response(content[start : end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+def delete_file_and_variants(file_id: str) -> bool:
+    """
+    Удаление файла из хранилища и его уменьшенных копий. Копии блоба, сохраненного по хэшу
+    содержимого, удаляются только вместе с блобом: на него могут ссылаться другие загрузки
+    :return: Был ли файл в хранилище
+    """
+    try:
+        file_path = file_storage.get_file_path(file_id)
+    except FileNotFoundError:
+        return False
+    if not file_storage.delete(file_id):
+        return False
+    if file_path is None:
+        image_variant_store.delete_variants(file_id)
+    elif not os.path.exists(file_path):
+        image_variant_store.delete_variants(Path(file_path).stem)
+    return True
+
+
+@file_storage_router.delete("/files/{file_id}", status_code=204)
+async def delete_file(file_id: str) -> None:
+    """
+    Удаление сохраненного файла из хранилища и индекса файлов
+    """
+    try:
+        UUID(file_id)
+        deleted = await asyncio.to_thread(delete_file_and_variants, file_id)
+    except ValueError:
+        deleted = False
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Файл {file_id} не найден")
+    await file_index.remove(file_id)
+
+
+@file_storage_router.api_route("/files/{file_id}/preview", methods=["GET", "HEAD"])
+async def download_file_preview(
+    file_id: str,
+    request: Request,
+    width: int = Query(..., description="Ширина превью из FILE_STORAGE_IMAGE_VARIANT_WIDTHS"),
+) -> Response:
+    """
+    Эндпоинт для получения уменьшенной копии изображения (строится при первом запросе)
+    """
+    if width not in settings.FILE_STORAGE_IMAGE_VARIANT_WIDTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Недопустимая ширина превью, разрешены: {settings.FILE_STORAGE_IMAGE_VARIANT_WIDTHS}",
+        )
+
+    try:
+        UUID(file_id)
+        variant_path, variant_data = await image_variant_store.read_variant_async(file_id, width)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail=f"Файл {file_id} не найден")
+    except ImageVariantError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    headers = {"ETag": f'"{variant_path.stem}"', "Cache-Control": FILE_CACHE_CONTROL}
+    if is_not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # Превью небольшие и отдаются из памяти: файл копии может быть вытеснен во время ответа
+    media_type = f"image/{settings.FILE_STORAGE_IMAGE_VARIANT_FORMAT}"
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(variant_data))
+        return Response(media_type=media_type, headers=headers)
+    return Response(variant_data, media_type=media_type, headers=headers)
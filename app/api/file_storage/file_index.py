@@ -0,0 +1,201 @@
+"""
+Индекс сохраненных файлов в SQLite (WAL): расширение, размер, тип, хэш и результат распознавания.
+Записи накапливаются в памяти и записываются в БД пакетами: по достижении batch_size записей
+или через flush_interval_sec после первой незаписанной. Чтение учитывает еще не записанные данные.
+Драйвер SQLite синхронный, поэтому обращения к БД выполняются в отдельном потоке.
+"""
+
+import asyncio
+import threading
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Engine, delete, func, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, col, select
+
+from app.api.file_storage.models import StoredFile
+from app.core.db import create_sqlite_engine
+from app.logger import logger
+
+
+class FileIndex:
+    def __init__(self, db_path: Path, batch_size: int = 100, flush_interval_sec: float = 1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+
+        self._engine: Engine | None = None
+        # Новые файлы (id -> значения всех колонок) и изменения уже записанных (id -> значения колонок)
+        self._pending_inserts: dict[str, dict[str, Any]] = {}
+        self._pending_updates: dict[str, dict[str, Any]] = {}
+        self._flush_timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def engine(self) -> Engine:
+        """Подключение к БД создается при первом обращении"""
+        if self._engine is None:
+            self._engine = create_sqlite_engine(self.db_path, tables=[sa_inspect(StoredFile).local_table])
+        return self._engine
+
+    def _schedule_flush(self) -> None:
+        if len(self._pending_inserts) + len(self._pending_updates) >= self.batch_size:
+            threading.Thread(target=self._flush_in_background, name="file-index-flush", daemon=True).start()
+        elif self._flush_timer is None:
+            self._start_flush_timer()
+
+    def _start_flush_timer(self) -> None:
+        self._flush_timer = threading.Timer(self.flush_interval_sec, self._flush_in_background)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _flush_in_background(self) -> None:
+        """Сброс пакета в фоновом потоке: при ошибке записи повторная попытка через flush_interval_sec"""
+        try:
+            self.flush()
+        except Exception:
+            # Ошибка уже записана в лог, изменения возвращены в очередь
+            with self._lock:
+                if self._flush_timer is None:
+                    self._start_flush_timer()
+
+    def add(
+        self,
+        file_id: str,
+        extension: str,
+        size_byte: int,
+        content_hash: str,
+        content_type: str | None = None,
+        file_name: str | None = None,
+        content_addressed: bool = False,
+    ) -> None:
+        """Добавление сохраненного файла (запись в БД - при следующем сбросе пакета)"""
+        with self._lock:
+            self._pending_inserts[file_id] = {
+                "id": file_id,
+                "extension": extension,
+                "size_byte": size_byte,
+                "content_type": content_type,
+                "content_hash": content_hash,
+                "content_addressed": content_addressed,
+                "file_name": file_name,
+                "created_at": datetime.now(UTC),
+                "recognition_status": None,
+                "recognition_result": None,
+            }
+            self._schedule_flush()
+
+    def set_recognition(self, file_id: str, status: str, result: Any) -> None:
+        """Сохранение результата распознавания файла"""
+        with self._lock:
+            values = {"recognition_status": status, "recognition_result": result}
+            if file_id in self._pending_inserts:
+                self._pending_inserts[file_id].update(values)
+            else:
+                self._pending_updates.setdefault(file_id, {}).update(values)
+            self._schedule_flush()
+
+    def flush(self) -> None:
+        """Запись накопленных изменений в БД одной транзакцией"""
+        with self._flush_lock:
+            with self._lock:
+                inserts, self._pending_inserts = self._pending_inserts, {}
+                updates, self._pending_updates = self._pending_updates, {}
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+            if not inserts and not updates:
+                return
+
+            try:
+                with Session(self.engine) as session:
+                    if inserts:
+                        session.execute(insert(StoredFile).on_conflict_do_nothing(), list(inserts.values()))
+                    for file_id, values in updates.items():
+                        session.execute(
+                            update(StoredFile).where(col(StoredFile.id) == file_id).values(**values)
+                        )
+                    session.commit()
+            except Exception as e:
+                logger.error(
+                    "Не удалось записать индекс файлов (%s записей): %s", len(inserts) + len(updates), e
+                )
+                # Изменения возвращаются в очередь и будут записаны при следующем сбросе
+                with self._lock:
+                    self._pending_inserts = {**inserts, **self._pending_inserts}
+                    for file_id, values in updates.items():
+                        self._pending_updates[file_id] = {**values, **self._pending_updates.get(file_id, {})}
+                raise
+
+    def _get(self, file_id: str) -> StoredFile | None:
+        with self._lock:
+            pending = self._pending_inserts.get(file_id)
+            pending_update = self._pending_updates.get(file_id, {})
+        if pending is not None:
+            return StoredFile(**pending)
+
+        with Session(self.engine) as session:
+            stored_file = session.get(StoredFile, file_id)
+        if stored_file is not None and pending_update:
+            stored_file.sqlmodel_update(pending_update)
+        return stored_file
+
+    async def get(self, file_id: str) -> StoredFile | None:
+        return await asyncio.to_thread(self._get, file_id)
+
+    def _list(self, limit: int, offset: int, recognition_status: str | None) -> list[StoredFile]:
+        self.flush()
+        query = select(StoredFile).order_by(StoredFile.created_at.desc()).offset(offset).limit(limit)  # type: ignore[attr-defined]
+        if recognition_status is not None:
+            query = query.where(StoredFile.recognition_status == recognition_status)
+        with Session(self.engine) as session:
+            return list(session.exec(query).all())
+
+    async def list(
+        self, limit: int = 100, offset: int = 0, recognition_status: str | None = None
+    ) -> list[StoredFile]:
+        """Последние сохраненные файлы"""
+        return await asyncio.to_thread(self._list, limit, offset, recognition_status)
+
+    def _stats(self) -> dict[str, Any]:
+        self.flush()
+        with Session(self.engine) as session:
+            total, total_size_byte = session.exec(
+                select(func.count(), func.coalesce(func.sum(StoredFile.size_byte), 0))
+            ).one()
+            by_status = session.exec(
+                select(StoredFile.recognition_status, func.count()).group_by(StoredFile.recognition_status)
+            ).all()
+        return {
+            "total": total,
+            "total_size_byte": total_size_byte,
+            "by_recognition_status": {str(status or "none"): count for status, count in by_status},
+        }
+
+    async def stats(self) -> dict[str, Any]:
+        """Количество и общий размер файлов, количество по статусу распознавания"""
+        return await asyncio.to_thread(self._stats)
+
+    def _remove(self, file_id: str) -> None:
+        # Под _flush_lock: удаление не может обогнать запись этого файла уже начатым сбросом пакета
+        with self._flush_lock:
+            with self._lock:
+                self._pending_inserts.pop(file_id, None)
+                self._pending_updates.pop(file_id, None)
+            with Session(self.engine) as session:
+                session.execute(delete(StoredFile).where(col(StoredFile.id) == file_id))
+                session.commit()
+
+    async def remove(self, file_id: str) -> None:
+        """Удаление файла из индекса"""
+        await asyncio.to_thread(self._remove, file_id)
+
+    def close(self) -> None:
+        self.flush()
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
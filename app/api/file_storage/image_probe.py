@@ -0,0 +1,138 @@
+"""
+Проверка изображения по заголовку файла без декодирования пикселей: формат определяется
+по сигнатуре (magic bytes), размеры - из заголовка формата. Позволяет отклонить не изображения,
+"бомбы" распаковки (маленький файл с огромными размерами) и слишком большие изображения
+до записи на диск и до полного декодирования.
+"""
+
+import struct
+from typing import BinaryIO
+
+# Байт заголовка, которых достаточно для определения формата и размеров PNG, GIF и WebP
+HEADER_SIZE_BYTE = 32
+
+# Маркеры JPEG без длины сегмента: TEM, RST0-RST7
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+# Маркеры начала кадра (SOF), содержащие размеры изображения; C4 (DHT), C8 (JPG), CC (DAC) - не SOF
+JPEG_SOF_MARKERS = {*range(0xC0, 0xD0)} - {0xC4, 0xC8, 0xCC}
+JPEG_SOS_MARKER = 0xDA
+JPEG_EOI_MARKER = 0xD9
+
+
+class InvalidImageError(Exception):
+    """Файл не является изображением допустимого формата или его заголовок поврежден"""
+
+
+class ImageDimensionsError(Exception):
+    """Размеры изображения превышают допустимые"""
+
+
+def sniff_image_format(header: bytes) -> str | None:
+    """Формат изображения по сигнатуре в начале файла (jpeg, png, gif, webp)"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _read_exactly(file: BinaryIO, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise InvalidImageError("Заголовок изображения обрезан")
+    return data
+
+
+def _probe_jpeg_size(file: BinaryIO) -> tuple[int, int]:
+    """Размеры JPEG из сегмента SOF: остальные сегменты пропускаются по их длине без чтения"""
+    file.seek(2)
+    while True:
+        if _read_exactly(file, 1) != b"\xff":
+            raise InvalidImageError("Поврежден заголовок JPEG")
+        marker = _read_exactly(file, 1)[0]
+        # Перед маркером может быть любое количество байт-заполнителей 0xFF
+        while marker == 0xFF:
+            marker = _read_exactly(file, 1)[0]
+
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (JPEG_SOS_MARKER, JPEG_EOI_MARKER):
+            raise InvalidImageError("В заголовке JPEG нет размеров изображения")
+
+        (segment_length,) = struct.unpack(">H", _read_exactly(file, 2))
+        if segment_length < 2:
+            raise InvalidImageError("Поврежден заголовок JPEG")
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack(">BHH", _read_exactly(file, 5))
+            return width, height
+        file.seek(segment_length - 2, 1)
+
+
+def _probe_webp_size(header: bytes) -> tuple[int, int]:
+    chunk_type = header[12:16]
+    if chunk_type == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height
+    if chunk_type == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk_type == b"VP8L" and header[20] == 0x2F:
+        (bits,) = struct.unpack("<I", header[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    raise InvalidImageError("Поврежден заголовок WebP")
+
+
+def probe_image(file: BinaryIO) -> tuple[str, int, int]:
+    """
+    Формат и размеры изображения по заголовку (синхронная, вызывать через asyncio.to_thread).
+    Позиция в файле возвращается в начало.
+    :raises InvalidImageError: файл не является изображением jpeg, png, gif или webp
+    :return: (формат, ширина, высота)
+    """
+    file.seek(0)
+    try:
+        header = file.read(HEADER_SIZE_BYTE)
+        image_format = sniff_image_format(header)
+        if image_format is None:
+            raise InvalidImageError("Содержимое файла не является изображением (JPEG, PNG, GIF, WebP)")
+        if len(header) < HEADER_SIZE_BYTE and image_format != "jpeg":
+            raise InvalidImageError("Заголовок изображения обрезан")
+
+        if image_format == "jpeg":
+            width, height = _probe_jpeg_size(file)
+        elif image_format == "png":
+            if header[12:16] != b"IHDR":
+                raise InvalidImageError("Поврежден заголовок PNG")
+            width, height = struct.unpack(">II", header[16:24])
+        elif image_format == "gif":
+            width, height = struct.unpack("<HH", header[6:10])
+        else:
+            width, height = _probe_webp_size(header)
+    finally:
+        file.seek(0)
+
+    if width == 0 or height == 0:
+        raise InvalidImageError("Нулевой размер изображения")
+    return image_format, width, height
+
+
+def validate_image(file: BinaryIO, max_dimension: int, max_pixels: int) -> tuple[str, int, int]:
+    """
+    Проверка изображения по заголовку: формат и ограничения размеров
+    :raises InvalidImageError: файл не является изображением
+    :raises ImageDimensionsError: ширина или высота больше max_dimension, пикселей больше max_pixels
+    :return: (формат, ширина, высота)
+    """
+    image_format, width, height = probe_image(file)
+    if width > max_dimension or height > max_dimension:
+        raise ImageDimensionsError(
+            f"Размеры изображения {width}x{height} больше допустимых {max_dimension} px"
+        )
+    if width * height > max_pixels:
+        raise ImageDimensionsError(f"Изображение {width}x{height} содержит больше {max_pixels} пикселей")
+    return image_format, width, height
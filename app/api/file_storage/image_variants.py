@@ -0,0 +1,231 @@
+"""
+Уменьшенные копии сохраненных изображений (превью) для показа в интерфейсе.
+Копии хранятся рядом с оригиналом: aa/bb/.variants/<имя оригинала>_w<ширина>_q<качество>.<формат>.
+Для файлов, сохраненных по хэшу содержимого, копии строятся один раз на блоб.
+Для файлов в сегментах (FILE_STORAGE_BACKEND=pack) копии хранятся в aa/bb/.variants по uuid файла.
+Общий размер копий ограничен: при превышении удаляются давно не запрашивавшиеся.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+from app.api.file_storage.storage import FileStorage, FilesystemStorage
+from app.api.file_storage.utils import TMP_DIR_NAME, get_sharded_dir
+from app.logger import logger
+
+VARIANTS_DIR_NAME = ".variants"
+# Сколько раз копия строится заново, если ее вытеснили до чтения (см. read_variant)
+MAX_READ_ATTEMPTS = 3
+
+# Параметры качества cv2.imencode (cv2 импортируется при построении первой копии)
+ENCODE_PARAMS = {
+    "webp": "IMWRITE_WEBP_QUALITY",
+    "jpeg": "IMWRITE_JPEG_QUALITY",
+}
+
+
+class ImageVariantError(Exception):
+    """Не удалось построить уменьшенную копию (файл не является изображением)"""
+
+
+def get_variant_path(original_path: Path, width: int, image_format: str, quality: int) -> Path:
+    return (
+        original_path.parent / VARIANTS_DIR_NAME / f"{original_path.stem}_w{width}_q{quality}.{image_format}"
+    )
+
+
+def render_variant(
+    original: Path | bytes, variant_path: Path, width: int, image_format: str, quality: int
+) -> int:
+    """
+    Построение уменьшенной копии (изображения уже меньше width не увеличиваются)
+    :param original: Путь к оригиналу или его содержимое
+    :raises ImageVariantError: файл не удалось прочитать как изображение
+    :return: Размер копии в байтах
+    """
+    import cv2
+    import numpy as np
+
+    if isinstance(original, bytes):
+        image = cv2.imdecode(np.frombuffer(original, dtype=np.uint8), cv2.IMREAD_COLOR)
+        original_name = variant_path.stem.rsplit("_w", 1)[0]
+    else:
+        image = cv2.imread(str(original), cv2.IMREAD_COLOR)
+        original_name = original.name
+    if image is None:
+        raise ImageVariantError(f"Не удалось прочитать изображение {original_name}")
+
+    height, original_width = image.shape[:2]
+    if original_width > width:
+        image = cv2.resize(
+            image, (width, max(round(height * width / original_width), 1)), interpolation=cv2.INTER_AREA
+        )
+
+    encoded, image_data = cv2.imencode(
+        f".{image_format}", image, [getattr(cv2, ENCODE_PARAMS[image_format]), quality]
+    )
+    if not encoded:
+        raise ImageVariantError(f"Не удалось закодировать изображение в {image_format}")
+
+    variant_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = variant_path.with_name(f".{variant_path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(image_data.tobytes())
+    os.replace(tmp_path, variant_path)
+    return variant_path.stat().st_size
+
+
+class ImageVariantStore:
+    """
+    Уменьшенные копии изображений хранилища: строятся при первом запросе или заранее (generate_all)
+    и вытесняются по давности последнего запроса, когда их общий размер превышает max_total_bytes.
+    Индекс копий строится обходом хранилища при первом обращении.
+    """
+
+    def __init__(
+        self,
+        base_storage_path: Path,
+        widths: list[int],
+        image_format: str = "webp",
+        quality: int = 80,
+        max_total_bytes: int = 1024 * 1024 * 1024,
+        storage: FileStorage | None = None,
+    ):
+        self.base_storage_path = base_storage_path
+        self.storage = storage or FilesystemStorage(base_storage_path)
+        self.widths = widths
+        self.image_format = image_format
+        self.quality = quality
+        self.max_total_bytes = max_total_bytes
+
+        # Путь копии -> размер, в порядке от давно запрашивавшихся к недавним
+        self._index: OrderedDict[Path, int] | None = None
+        self._total_bytes = 0
+        # Одновременные запросы одной копии ждут одно построение
+        self._rendering: dict[Path, Future[int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _load_index(self) -> OrderedDict[Path, int]:
+        if self._index is None:
+            variants = []
+            if self.base_storage_path.exists():
+                for variants_dir in self.base_storage_path.glob(f"*/*/{VARIANTS_DIR_NAME}"):
+                    if variants_dir.parts[-3] == TMP_DIR_NAME:
+                        continue
+                    for entry in os.scandir(variants_dir):
+                        if entry.is_file() and not entry.name.startswith("."):
+                            stat_result = entry.stat()
+                            variants.append((stat_result.st_mtime, Path(entry.path), stat_result.st_size))
+            variants.sort()
+            self._index = OrderedDict((path, size) for _, path, size in variants)
+            self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def _evict(self, keep: Path) -> None:
+        index = self._load_index()
+        while self._total_bytes > self.max_total_bytes and len(index) > 1:
+            path, size = next(iter(index.items()))
+            if path == keep:
+                index.move_to_end(path)
+                continue
+            del index[path]
+            self._total_bytes -= size
+            path.unlink(missing_ok=True)
+
+    def get_variant(self, file_id: str, width: int) -> Path:
+        """
+        Путь к уменьшенной копии файла (копия строится, если ее еще нет)
+        :raises FileNotFoundError: файла нет в хранилище
+        :raises ImageVariantError: файл не является изображением
+        """
+        file_path = self.storage.get_file_path(file_id)
+        # Файл без отдельного пути (в сегменте) читается, только если копию нужно построить
+        original_path = (
+            Path(file_path) if file_path else get_sharded_dir(file_id, self.base_storage_path) / file_id
+        )
+        variant_path = get_variant_path(original_path, width, self.image_format, self.quality)
+
+        with self._lock:
+            index = self._load_index()
+            if variant_path in index and variant_path.exists():
+                index.move_to_end(variant_path)
+                # Время изменения - время последнего запроса: порядок вытеснения переживает перезапуск
+                os.utime(variant_path)
+                return variant_path
+
+            future = self._rendering.get(variant_path)
+            owner = future is None
+            if future is None:
+                future = self._rendering[variant_path] = Future()
+
+        if not owner:
+            future.result()
+            return variant_path
+
+        try:
+            original = original_path if file_path else self.storage.read(file_id)[0]
+            size = render_variant(original, variant_path, width, self.image_format, self.quality)
+            future.set_result(size)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._rendering.pop(variant_path, None)
+
+        with self._lock:
+            index = self._load_index()
+            self._total_bytes += size - index.get(variant_path, 0)
+            index[variant_path] = size
+            self._evict(keep=variant_path)
+
+        return variant_path
+
+    def read_variant(self, file_id: str, width: int) -> tuple[Path, bytes]:
+        """
+        Путь и содержимое уменьшенной копии файла. Копию могут вытеснить другие запросы сразу
+        после построения, поэтому отсутствующая копия строится заново
+        :raises FileNotFoundError: файла нет в хранилище
+        :raises ImageVariantError: файл не является изображением
+        """
+        for _ in range(MAX_READ_ATTEMPTS - 1):
+            variant_path = self.get_variant(file_id, width)
+            try:
+                return variant_path, variant_path.read_bytes()
+            except FileNotFoundError:
+                logger.info("Превью %s вытеснено до чтения, строится заново", variant_path.name)
+        variant_path = self.get_variant(file_id, width)
+        return variant_path, variant_path.read_bytes()
+
+    async def read_variant_async(self, file_id: str, width: int) -> tuple[Path, bytes]:
+        return await asyncio.to_thread(self.read_variant, file_id, width)
+
+    def delete_variants(self, blob_name: str) -> int:
+        """
+        Удаление всех копий оригинала blob_name (uuid файла или хэш блоба), когда удален сам оригинал
+        :return: Количество удаленных копий
+        """
+        variants_dir = get_sharded_dir(blob_name, self.base_storage_path) / VARIANTS_DIR_NAME
+        with self._lock:
+            index = self._load_index()
+            variant_paths = list(variants_dir.glob(f"{blob_name}_w*_q*.*"))
+            for variant_path in variant_paths:
+                self._total_bytes -= index.pop(variant_path, 0)
+                variant_path.unlink(missing_ok=True)
+        return len(variant_paths)
+
+    def generate_all(self, file_id: str) -> None:
+        """Построение копий всех размеров (фоновая задача после загрузки)"""
+        for width in self.widths:
+            try:
+                self.get_variant(file_id, width)
+            except (FileNotFoundError, ImageVariantError) as e:
+                logger.warning("Не удалось построить превью %s (%s px): %s", file_id, width, e)
+                return
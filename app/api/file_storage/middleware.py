@@ -0,0 +1,51 @@
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Запас на заголовки multipart и остальные поля формы
+MULTIPART_OVERHEAD_BYTE = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Отклоняет слишком большие запросы с кодом 413 до того, как тело будет прочитано целиком:
+    сразу по заголовку Content-Length или по мере получения тела (chunked-запросы).
+    Для маршрутов из route_max_upload_sizes (например, пакетной загрузки) задается свой предел
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_upload_size: int, route_max_upload_sizes: dict[str, int] | None = None
+    ):
+        self.app = app
+        self.max_body_size = max_upload_size + MULTIPART_OVERHEAD_BYTE
+        self.route_max_body_sizes = {
+            path: max_size + MULTIPART_OVERHEAD_BYTE
+            for path, max_size in (route_max_upload_sizes or {}).items()
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self.route_max_body_sizes.get(scope["path"], self.max_body_size)
+        detail = f"Размер запроса больше {max_body_size} байт"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body_size:
+            response = ORJSONResponse(status_code=413, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+
+# Модели только для Pydantic (без таблицы в БД)
+class UploadSessionCreate(SQLModel):
+    file_name: str
+    content_type: str
+    size: int = Field(gt=0, description="Размер файла в байтах")
+
+
+class UploadSessionStatus(SQLModel):
+    upload_id: str
+    file_name: str
+    content_type: str
+    size: int
+    offset: int = Field(description="Сколько байт уже принято: следующая часть начинается с этого смещения")
+
+
+class UploadSessionComplete(SQLModel):
+    content_hash: str = Field(description="BLAKE2b (32 байта) всего файла в hex")
+
+
+# Таблица индекса сохраненных файлов (см. file_index.FileIndex)
+class StoredFile(SQLModel, table=True):
+    __tablename__ = "stored_file"
+
+    id: str = Field(primary_key=True)
+    extension: str
+    size_byte: int
+    content_type: str | None = None
+    content_hash: str = Field(index=True)
+    content_addressed: bool = False
+    file_name: str | None = None
+    created_at: datetime = Field(index=True)
+    recognition_status: str | None = Field(default=None, index=True)
+    recognition_result: Any = Field(default=None, sa_column=Column(JSON))
+
+
+class StoredFileStats(SQLModel):
+    total: int
+    total_size_byte: int
+    by_recognition_status: dict[str, int]
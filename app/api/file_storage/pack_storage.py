@@ -0,0 +1,493 @@
+"""
+Хранение файлов в больших файлах-сегментах вместо отдельного файла на каждую загрузку.
+Файлы дописываются в конец текущего сегмента записями <заголовок><расширение><данные>;
+удаление дописывает запись-метку. Когда сегмент достигает segment_max_bytes, он закрывается
+(становится неизменяемым), и рядом записывается его индекс .idx - положения всех записей,
+чтобы при запуске не читать заголовки по всему сегменту.
+Индекс id -> (сегмент, смещение, длина, расширение) хранится в памяти и строится при запуске
+из .idx закрытых сегментов и заголовков записей текущего. fsync выполняется пакетами.
+Закрытые сегменты, в которых много удаленных записей, пересобираются (compact): живые записи
+копируются в новый файл сегмента с тем же номером, который заменяет старый. Номер определяет
+порядок применения записей при загрузке, поэтому записи, сделанные во время копирования
+в текущий сегмент, остаются более поздними, а копирование не блокирует запись файлов.
+Индекс и положение конца сегмента есть только в памяти процесса, поэтому директорию сегментов
+может использовать только один процесс: при открытии берется эксклюзивная блокировка (flock)
+на файл .lock, второй процесс (например, второй воркер uvicorn) получает PackStorageLockedError.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import NamedTuple
+from uuid import UUID
+
+from app.logger import logger
+
+PACKS_DIR_NAME = ".packs"
+SEGMENT_SUFFIX = ".pack"
+SEGMENT_INDEX_SUFFIX = ".idx"
+TMP_SUFFIX = ".tmp"
+LOCK_FILE_NAME = ".lock"
+
+RECORD_MAGIC = b"QRPK"
+RECORD_PUT = 0
+RECORD_DELETE = 1
+# Заголовок записи: сигнатура, тип записи, id (uuid, 16 байт), длина расширения, длина данных.
+# У записи-метки удаления вместо длины данных - номер сегмента, в котором лежал удаленный файл
+RECORD_HEADER = struct.Struct(">4sB16sBI")
+# Запись индекса сегмента: тип записи, id, смещение данных, длина данных (номер сегмента), расширение
+INDEX_ENTRY = struct.Struct(">B16sQI16p")
+MAX_EXTENSION_LENGTH = 15
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class PackEntry(NamedTuple):
+    """Положение файла в сегменте"""
+
+    segment: int
+    offset: int  # Смещение данных (после заголовка записи)
+    length: int
+    extension: str
+
+
+class PackStorageLockedError(Exception):
+    """Директория сегментов уже открыта другим процессом"""
+
+
+def get_segment_name(segment: int) -> str:
+    return f"segment-{segment:08d}"
+
+
+class PackStorage:
+    def __init__(
+        self,
+        packs_path: Path,
+        segment_max_bytes: int = 1024 * 1024 * 1024,
+        fsync_interval_sec: float = 0.2,
+    ):
+        self.packs_path = packs_path
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_interval_sec = fsync_interval_sec
+
+        self._entries: dict[bytes, PackEntry] = {}
+        # Размер каждого сегмента и сколько байт в нем занимают записи еще не удаленных файлов
+        self._segment_sizes: dict[int, int] = {}
+        self._live_bytes: dict[int, int] = {}
+        # Записи текущего сегмента - для его индекса при закрытии
+        self._active_index: list[bytes] = []
+        self._active_segment = 0
+        self._active_file: int | None = None
+        self._lock_file: int | None = None
+        # Отображения сегментов в память. При пересборке и дописывании текущего сегмента отображение
+        # не закрывается, а заменяется: чтения, начатые со старым, завершаются с ним
+        self._mmaps: dict[int, mmap.mmap] = {}
+
+        self._fsync_timer: threading.Timer | None = None
+        # _write_lock - дописывание в сегменты (записи идут строго друг за другом),
+        # _lock - индекс в памяти, берется ненадолго: чтения не ждут копирования загружаемых файлов.
+        # Если нужны обе, _write_lock берется первой
+        self._write_lock = threading.RLock()
+        self._lock = threading.RLock()
+        # Пересборки выполняются по одной, не блокируя запись и чтение
+        self._compact_lock = threading.Lock()
+        self._loaded = False
+
+    def _segment_path(self, segment: int, suffix: str = SEGMENT_SUFFIX) -> Path:
+        return self.packs_path / f"{get_segment_name(segment)}{suffix}"
+
+    def open(self) -> None:
+        """
+        Блокировка директории и построение индекса (иначе выполняется при первом обращении)
+        :raises PackStorageLockedError: директория сегментов используется другим процессом
+        """
+        self._ensure_loaded()
+
+    def _ensure_loaded(self) -> None:
+        """Построение индекса при первом обращении"""
+        if self._loaded:
+            return
+        with self._write_lock, self._lock:
+            if not self._loaded:
+                self._load()
+
+    def _load(self) -> None:
+        self.packs_path.mkdir(parents=True, exist_ok=True)
+        self._lock_file = os.open(self.packs_path / LOCK_FILE_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_file)
+            self._lock_file = None
+            raise PackStorageLockedError(
+                f"Хранилище сегментов {self.packs_path} используется другим процессом: "
+                "FILE_STORAGE_BACKEND=pack поддерживает только один процесс приложения"
+            ) from None
+
+        segments = sorted(
+            int(path.stem.removeprefix("segment-")) for path in self.packs_path.glob(f"*{SEGMENT_SUFFIX}")
+        )
+        # Индекс без сегмента остается, если пересборка прервалась между удалением сегмента и индекса,
+        # временные файлы - если прервалась запись индекса или копирование сегмента
+        for index_path in self.packs_path.glob(f"*{SEGMENT_INDEX_SUFFIX}"):
+            if not index_path.with_suffix(SEGMENT_SUFFIX).exists():
+                index_path.unlink()
+        for tmp_path in self.packs_path.glob(f"*{TMP_SUFFIX}"):
+            tmp_path.unlink()
+
+        # Дописывается последний сегмент без индекса (индекс есть только у закрытых)
+        if segments and not self._segment_path(segments[-1], SEGMENT_INDEX_SUFFIX).exists():
+            self._active_segment = segments[-1]
+        else:
+            self._active_segment = (segments[-1] + 1) if segments else 1
+            self._segment_sizes[self._active_segment] = 0
+            self._live_bytes[self._active_segment] = 0
+            self._active_index = []
+
+        for segment in segments:
+            if self._segment_path(segment, SEGMENT_INDEX_SUFFIX).exists():
+                self._load_segment_index(segment)
+            else:
+                self._scan_segment(segment)
+
+        self._active_file = os.open(
+            self._segment_path(self._active_segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
+        self._loaded = True
+        logger.info("Загружен индекс хранилища сегментов: %s файлов", len(self._entries))
+
+    def _apply_record(
+        self, segment: int, kind: int, raw_id: bytes, offset: int, length: int, extension: str, size: int
+    ) -> None:
+        """Учет записи сегмента в индексе (при загрузке и при записи)"""
+        if kind == RECORD_PUT:
+            previous = self._entries.get(raw_id)
+            if previous is not None:
+                self._live_bytes[previous.segment] -= self._get_record_size(previous)
+            self._entries[raw_id] = PackEntry(segment, offset, length, extension)
+            self._live_bytes[segment] = self._live_bytes.get(segment, 0) + size
+        else:
+            previous = self._entries.pop(raw_id, None)
+            if previous is not None:
+                self._live_bytes[previous.segment] -= self._get_record_size(previous)
+
+    @staticmethod
+    def _get_record_size(entry: PackEntry) -> int:
+        return RECORD_HEADER.size + len(entry.extension.encode()) + entry.length
+
+    def _load_segment_index(self, segment: int) -> None:
+        data = self._segment_path(segment, SEGMENT_INDEX_SUFFIX).read_bytes()
+        self._segment_sizes[segment] = self._segment_path(segment).stat().st_size
+        for kind, raw_id, offset, length, raw_extension in INDEX_ENTRY.iter_unpack(data):
+            extension = raw_extension.decode()
+            size = RECORD_HEADER.size + len(raw_extension) + (length if kind == RECORD_PUT else 0)
+            self._apply_record(segment, kind, raw_id, offset, length, extension, size)
+
+    def _scan_segment(self, segment: int) -> None:
+        """
+        Чтение заголовков записей сегмента без индекса: текущего или закрытого, индекс которого
+        не успел записаться (для такого индекс записывается заново).
+        Запись, оборванная при сбое, отрезается: она не была подтверждена клиенту.
+        """
+        path = self._segment_path(segment)
+        index_entries = []
+        valid_size = 0
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                magic, kind, raw_id, extension_length, length = RECORD_HEADER.unpack(header)
+                if magic != RECORD_MAGIC:
+                    break
+                extension = f.read(extension_length)
+                data_offset = valid_size + RECORD_HEADER.size + extension_length
+                data_length = length if kind == RECORD_PUT else 0
+                if data_offset + data_length > file_size:
+                    break
+                f.seek(data_length, os.SEEK_CUR)
+
+                record_size = RECORD_HEADER.size + extension_length + data_length
+                self._apply_record(
+                    segment, kind, raw_id, data_offset, length, extension.decode(), record_size
+                )
+                index_entries.append(INDEX_ENTRY.pack(kind, raw_id, data_offset, length, extension))
+                valid_size += record_size
+
+        if valid_size < file_size:
+            logger.warning("Сегмент %s обрезан до последней целой записи (%s байт)", path.name, valid_size)
+            os.truncate(path, valid_size)
+        self._segment_sizes[segment] = valid_size
+        self._live_bytes.setdefault(segment, 0)
+        if segment == self._active_segment:
+            self._active_index = index_entries
+        else:
+            self._write_segment_index(segment, index_entries)
+
+    def _write_segment_index(self, segment: int, index_entries: list[bytes]) -> None:
+        index_path = self._segment_path(segment, SEGMENT_INDEX_SUFFIX)
+        tmp_index_path = index_path.with_suffix(f"{SEGMENT_INDEX_SUFFIX}{TMP_SUFFIX}")
+        with open(tmp_index_path, "wb") as f:
+            f.write(b"".join(index_entries))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_index_path, index_path)
+
+    def _append_record(
+        self, kind: int, raw_id: bytes, extension: str, length: int, source: int | bytes
+    ) -> int:
+        """
+        Дописывание записи в текущий сегмент (под self._write_lock).
+        Индекс обновляется после записи данных: до этого файл не виден читателям
+        :param source: Дескриптор файла с данными или данные
+        :return: Смещение данных записи
+        """
+        assert self._active_file is not None
+        raw_extension = extension.encode()
+        data_length = length if kind == RECORD_PUT else 0
+        record_size = RECORD_HEADER.size + len(raw_extension) + data_length
+
+        segment_size = self._segment_sizes[self._active_segment]
+        if segment_size > 0 and segment_size + record_size > self.segment_max_bytes:
+            self._rotate_segment()
+            segment_size = 0
+
+        header = RECORD_HEADER.pack(RECORD_MAGIC, kind, raw_id, len(raw_extension), length) + raw_extension
+        try:
+            os.write(self._active_file, header)
+            if isinstance(source, bytes):
+                os.write(self._active_file, source)
+            else:
+                while chunk := os.read(source, COPY_CHUNK_SIZE):
+                    os.write(self._active_file, chunk)
+        except BaseException:
+            # Оборванная запись отрезается, чтобы следующая не оказалась после мусора
+            os.truncate(self._segment_path(self._active_segment), segment_size)
+            raise
+
+        data_offset = segment_size + len(header)
+        with self._lock:
+            self._segment_sizes[self._active_segment] = segment_size + record_size
+            self._active_index.append(INDEX_ENTRY.pack(kind, raw_id, data_offset, length, raw_extension))
+            self._apply_record(
+                self._active_segment, kind, raw_id, data_offset, length, extension, record_size
+            )
+        self._schedule_fsync()
+        return data_offset
+
+    def _schedule_fsync(self) -> None:
+        if self.fsync_interval_sec <= 0:
+            os.fsync(self._active_file)  # type: ignore[arg-type]
+        elif self._fsync_timer is None:
+            self._fsync_timer = threading.Timer(self.fsync_interval_sec, self.fsync)
+            self._fsync_timer.daemon = True
+            self._fsync_timer.start()
+
+    def fsync(self) -> None:
+        """Сброс на диск всех записей текущего сегмента одним fsync"""
+        with self._write_lock:
+            if self._fsync_timer is not None:
+                self._fsync_timer.cancel()
+                self._fsync_timer = None
+            if self._active_file is not None:
+                os.fsync(self._active_file)
+
+    def _rotate_segment(self) -> None:
+        """Закрытие текущего сегмента с записью его индекса и начало нового (под self._write_lock)"""
+        assert self._active_file is not None
+        self.fsync()
+        os.close(self._active_file)
+        self._write_segment_index(self._active_segment, self._active_index)
+
+        with self._lock:
+            self._active_segment += 1
+            self._active_index = []
+            self._segment_sizes[self._active_segment] = 0
+            self._live_bytes[self._active_segment] = 0
+        self._active_file = os.open(
+            self._segment_path(self._active_segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
+
+    def put_file(self, file_id: str, extension: str, file_path: Path) -> None:
+        """Запись файла file_path (копируется в сегмент частями, без чтения в память целиком)"""
+        if len(extension.encode()) > MAX_EXTENSION_LENGTH:
+            extension = ""
+        self._ensure_loaded()
+        with open(file_path, "rb") as f, self._write_lock:
+            self._append_record(
+                RECORD_PUT, UUID(file_id).bytes, extension, os.fstat(f.fileno()).st_size, f.fileno()
+            )
+
+    def put(self, file_id: str, extension: str, data: bytes) -> None:
+        self._ensure_loaded()
+        with self._write_lock:
+            self._append_record(RECORD_PUT, UUID(file_id).bytes, extension, len(data), data)
+
+    def get_entry(self, file_id: str) -> PackEntry | None:
+        self._ensure_loaded()
+        with self._lock:
+            return self._entries.get(UUID(file_id).bytes)
+
+    def _get_segment_mmap(self, entry: PackEntry) -> mmap.mmap:
+        """
+        Отображение сегмента, в котором есть запись entry (под self._lock).
+        Текущий сегмент растет, поэтому при чтении записи за концом отображения оно создается заново
+        """
+        segment_mmap = self._mmaps.get(entry.segment)
+        if segment_mmap is None or len(segment_mmap) < entry.offset + entry.length:
+            with open(self._segment_path(entry.segment), "rb") as f:
+                segment_mmap = self._mmaps[entry.segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return segment_mmap
+
+    def read(self, file_id: str) -> tuple[bytes, str]:
+        """
+        Содержимое и расширение файла. Сегменты читаются через mmap, копирование данных выполняется
+        без блокировки: чтения не ждут записи и друг друга
+        :raises FileNotFoundError: файла нет в хранилище
+        """
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(UUID(file_id).bytes)
+            if entry is None:
+                raise FileNotFoundError(f"Файл {file_id} не найден")
+            segment_mmap = self._get_segment_mmap(entry)
+        return segment_mmap[entry.offset : entry.offset + entry.length], entry.extension
+
+    def delete(self, file_id: str) -> bool:
+        """
+        Удаление файла (дописывается метка удаления, место освобождается при compact)
+        :return: Был ли файл в хранилище
+        """
+        raw_id = UUID(file_id).bytes
+        self._ensure_loaded()
+        with self._write_lock:
+            entry = self.get_entry(file_id)
+            if entry is None:
+                return False
+            self._append_record(RECORD_DELETE, raw_id, "", entry.segment, b"")
+            return True
+
+    def compact(self, min_dead_ratio: float = 0.5) -> int:
+        """
+        Пересборка закрытых сегментов, в которых удаленные записи занимают не меньше min_dead_ratio:
+        живые файлы копируются в новый файл сегмента, который заменяет старый.
+        Метки удаления сохраняются, пока существует сегмент с удаленным файлом.
+        Блокировки записи и индекса берутся только для замены сегмента, не на время копирования
+        :return: Количество пересобранных сегментов
+        """
+        rebuilt = 0
+        self._ensure_loaded()
+        with self._compact_lock:
+            with self._lock:
+                segments = [
+                    segment
+                    for segment, size in sorted(self._segment_sizes.items())
+                    if segment != self._active_segment
+                    and size > 0
+                    and (size - self._live_bytes.get(segment, 0)) / size >= min_dead_ratio
+                ]
+            for segment in segments:
+                rebuilt += self._compact_segment(segment)
+        if rebuilt:
+            logger.info("Пересобрано сегментов хранилища: %s", rebuilt)
+        return rebuilt
+
+    def _compact_segment(self, segment: int) -> bool:
+        """
+        Пересборка закрытого сегмента (под self._compact_lock). Закрытый сегмент не меняется,
+        поэтому живые записи копируются во временный файл без блокировок; файлы, удаленные
+        или перезаписанные во время копирования, учитываются при замене сегмента
+        :return: Был ли сегмент заменен (или удален)
+        """
+        segment_path = self._segment_path(segment)
+        tmp_segment_path = self._segment_path(segment, f"{SEGMENT_SUFFIX}{TMP_SUFFIX}")
+        index_data = self._segment_path(segment, SEGMENT_INDEX_SUFFIX).read_bytes()
+        index_entries = []
+        # id -> (старое смещение, новое смещение) скопированных файлов
+        moved: dict[bytes, tuple[int, int]] = {}
+        new_size = 0
+        with open(segment_path, "rb") as f, open(tmp_segment_path, "wb") as tmp_f:
+            for kind, raw_id, offset, length, raw_extension in INDEX_ENTRY.iter_unpack(index_data):
+                with self._lock:
+                    entry = self._entries.get(raw_id)
+                    segment_exists = length in self._segment_sizes
+                if kind == RECORD_PUT:
+                    if entry is None or entry.segment != segment or entry.offset != offset:
+                        continue
+                    data = os.pread(f.fileno(), length, offset)
+                elif length != segment and segment_exists and entry is None:
+                    data = b""
+                else:
+                    continue
+                header = RECORD_HEADER.pack(RECORD_MAGIC, kind, raw_id, len(raw_extension), length)
+                tmp_f.write(header + raw_extension + data)
+                new_offset = new_size + len(header) + len(raw_extension)
+                index_entries.append(INDEX_ENTRY.pack(kind, raw_id, new_offset, length, raw_extension))
+                if kind == RECORD_PUT:
+                    moved[raw_id] = (offset, new_offset)
+                new_size = new_offset + len(data)
+            tmp_f.flush()
+            os.fsync(tmp_f.fileno())
+
+        with self._lock:
+            if new_size >= self._segment_sizes[segment]:
+                # Удалять нечего (остались только нужные метки удаления)
+                tmp_segment_path.unlink()
+                return False
+            # Без индекса при запуске читается сегмент: и старый, и уже замененный
+            self._segment_path(segment, SEGMENT_INDEX_SUFFIX).unlink()
+            if new_size == 0:
+                tmp_segment_path.unlink()
+                segment_path.unlink()
+                del self._segment_sizes[segment]
+                self._live_bytes.pop(segment, None)
+            else:
+                os.replace(tmp_segment_path, segment_path)
+                live_bytes = 0
+                for raw_id, (offset, new_offset) in moved.items():
+                    entry = self._entries.get(raw_id)
+                    if entry is not None and entry.segment == segment and entry.offset == offset:
+                        self._entries[raw_id] = entry._replace(offset=new_offset)
+                        live_bytes += self._get_record_size(entry)
+                self._segment_sizes[segment] = new_size
+                self._live_bytes[segment] = live_bytes
+            # Отображение не закрывается: чтения, которые уже получили его, дочитают данные
+            self._mmaps.pop(segment, None)
+        if new_size:
+            self._write_segment_index(segment, index_entries)
+        return True
+
+    def stats(self) -> dict[str, int]:
+        self._ensure_loaded()
+        with self._lock:
+            total_bytes = sum(self._segment_sizes.values())
+            return {
+                "files": len(self._entries),
+                "segments": len(self._segment_sizes),
+                "total_bytes": total_bytes,
+                "dead_bytes": total_bytes - sum(self._live_bytes.values()),
+            }
+
+    def close(self) -> None:
+        with self._write_lock, self._lock:
+            if not self._loaded:
+                return
+            self.fsync()
+            for segment_mmap in self._mmaps.values():
+                segment_mmap.close()
+            if self._active_file is not None:
+                os.close(self._active_file)
+            if self._lock_file is not None:
+                # Блокировка снимается при закрытии дескриптора
+                os.close(self._lock_file)
+            self._mmaps.clear()
+            self._active_file = None
+            self._lock_file = None
+            self._entries.clear()
+            self._segment_sizes.clear()
+            self._live_bytes.clear()
+            self._active_index = []
+            self._loaded = False
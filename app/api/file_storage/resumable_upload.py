@@ -0,0 +1,283 @@
+"""
+Загрузка больших файлов по частям с возможностью продолжения после обрыва соединения:
+создание сессии -> PUT частей со смещением -> завершение с проверкой хэша.
+Состояние сессии хранится на диске: <upload_id>.json (описание файла) и <upload_id>.part (принятые байты),
+текущее смещение - размер .part файла, поэтому сессии переживают перезапуск приложения.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import aiofiles  # type: ignore
+import orjson
+
+from app.api.file_storage.image_probe import ImageDimensionsError, InvalidImageError, validate_image
+from app.api.file_storage.storage import FileStorage
+from app.api.file_storage.utils import (
+    TMP_DIR_NAME,
+    FileTooLargeError,
+    get_content_hasher,
+    get_img_name_uuid4,
+    move_tmp_file_to_storage,
+)
+from app.core.config import settings
+from app.logger import logger
+
+UPLOAD_SESSIONS_DIR_NAME = "uploads"
+SESSION_FILE_SUFFIX = ".json"
+PART_FILE_SUFFIX = ".part"
+HASH_READ_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadSessionNotFoundError(Exception):
+    """Сессия загрузки не найдена (не создавалась, завершена или удалена по истечении срока)"""
+
+
+class UploadOffsetMismatchError(Exception):
+    """Смещение части не совпадает с количеством уже принятых байт"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Ожидается смещение {offset}")
+        self.offset = offset
+
+
+class UploadChecksumMismatchError(Exception):
+    """Хэш собранного файла не совпадает с переданным при завершении"""
+
+
+# Части одной сессии дописываются строго последовательно: upload_id -> (блокировка, сколько запросов ее ждут
+# или держат). Блокировка удаляется, когда она больше никому не нужна, в том числе для несуществующих сессий
+_session_locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+
+@asynccontextmanager
+async def lock_upload_session(upload_id: str) -> AsyncIterator[None]:
+    """Блокировка сессии загрузки на время изменения ее файлов"""
+    lock, users = _session_locks.get(upload_id, (asyncio.Lock(), 0))
+    _session_locks[upload_id] = (lock, users + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, users = _session_locks[upload_id]
+        if users == 1:
+            del _session_locks[upload_id]
+        else:
+            _session_locks[upload_id] = (lock, users - 1)
+
+
+def get_upload_sessions_dir(base_storage_path: Path) -> Path:
+    return base_storage_path / TMP_DIR_NAME / UPLOAD_SESSIONS_DIR_NAME
+
+
+def get_session_paths(upload_id: str, base_storage_path: Path) -> tuple[Path, Path]:
+    """Пути файла описания сессии и файла с принятыми байтами"""
+    sessions_dir = get_upload_sessions_dir(base_storage_path)
+    return sessions_dir / f"{upload_id}{SESSION_FILE_SUFFIX}", sessions_dir / f"{upload_id}{PART_FILE_SUFFIX}"
+
+
+def get_upload_session(upload_id: str, base_storage_path: Path) -> dict[str, Any]:
+    """
+    Состояние сессии загрузки
+    :raises UploadSessionNotFoundError: сессии нет
+    """
+    # upload_id приходит из URL: допускаются только uuid, которые выдает create_upload_session
+    try:
+        UUID(upload_id)
+    except ValueError:
+        raise UploadSessionNotFoundError(f"Сессия загрузки {upload_id} не найдена") from None
+
+    session_path, part_path = get_session_paths(upload_id, base_storage_path)
+    if not session_path.exists():
+        raise UploadSessionNotFoundError(f"Сессия загрузки {upload_id} не найдена")
+
+    session: dict[str, Any] = orjson.loads(session_path.read_bytes())
+    session["offset"] = part_path.stat().st_size if part_path.exists() else 0
+    return session
+
+
+def create_upload_session(
+    file_name: str,
+    content_type: str,
+    size: int,
+    base_storage_path: Path,
+    max_size: int = settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE,
+) -> dict[str, Any]:
+    """
+    Создание сессии загрузки файла размером size байт
+    :raises FileTooLargeError: размер файла больше max_size
+    """
+    if size > max_size:
+        raise FileTooLargeError(f"Размер файла больше {max_size} байт")
+
+    upload_id = get_img_name_uuid4()
+    session_path, part_path = get_session_paths(upload_id, base_storage_path)
+    session_path.parent.mkdir(parents=True, exist_ok=True)
+
+    session = {"upload_id": upload_id, "file_name": file_name, "content_type": content_type, "size": size}
+    part_path.touch()
+    session_path.write_bytes(orjson.dumps(session))
+
+    logger.info("Создана сессия загрузки %s: %s (%s байт)", upload_id, file_name, size)
+    return {**session, "offset": 0}
+
+
+async def append_upload_chunk(
+    upload_id: str, offset: int, chunks: AsyncIterator[bytes], base_storage_path: Path
+) -> dict[str, Any]:
+    """
+    Дописывает часть файла, начинающуюся со смещения offset.
+    Если соединение оборвалось посреди части, уже записанные байты остаются в сессии:
+    клиент узнает смещение через get_upload_session и продолжает с него.
+    :raises UploadSessionNotFoundError: сессии нет
+    :raises UploadOffsetMismatchError: offset не совпадает с количеством принятых байт
+    :raises FileTooLargeError: часть выходит за объявленный размер файла (часть отбрасывается)
+    """
+    async with lock_upload_session(upload_id):
+        session = get_upload_session(upload_id, base_storage_path)
+        if offset != session["offset"]:
+            raise UploadOffsetMismatchError(session["offset"])
+
+        _, part_path = get_session_paths(upload_id, base_storage_path)
+        received = offset
+        async with aiofiles.open(part_path, "ab") as f:
+            try:
+                async for chunk in chunks:
+                    received += len(chunk)
+                    if received > session["size"]:
+                        raise FileTooLargeError(f"Размер файла больше объявленного {session['size']} байт")
+                    await f.write(chunk)
+            except FileTooLargeError:
+                await f.truncate(offset)
+                raise
+
+    return {**session, "offset": received}
+
+
+def calculate_file_hash(file_path: Path) -> str:
+    hasher = get_content_hasher()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_READ_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def validate_part_image(part_path: Path) -> None:
+    with open(part_path, "rb") as f:
+        validate_image(
+            f, settings.FILE_STORAGE_IMAGE_MAX_DIMENSION_PX, settings.FILE_STORAGE_IMAGE_MAX_PIXELS
+        )
+
+
+async def complete_upload_session(
+    upload_id: str,
+    content_hash: str,
+    base_storage_path: Path,
+    content_addressed: bool = settings.FILE_STORAGE_CONTENT_ADDRESSED,
+    storage: FileStorage | None = None,
+) -> dict[str, Any]:
+    """
+    Проверка собранного файла (заголовок изображения и хэш blake2b, 32 байта, hex) и перенос его в хранилище.
+    Если проверка не пройдена, сессия удаляется: загрузку нужно начать заново.
+    :raises UploadSessionNotFoundError: сессии нет
+    :raises UploadOffsetMismatchError: приняты не все байты файла
+    :raises UploadChecksumMismatchError: хэш не совпадает
+    :raises InvalidImageError: файл не является изображением (сессия удаляется)
+    :raises ImageDimensionsError: размеры изображения больше допустимых (сессия удаляется)
+    :param storage: Бэкенд хранения, по умолчанию - директории aa/bb в base_storage_path
+    :return: Данные сохраненного файла (как у save_file), file_id совпадает с upload_id
+    """
+    async with lock_upload_session(upload_id):
+        session = get_upload_session(upload_id, base_storage_path)
+        if session["offset"] != session["size"]:
+            raise UploadOffsetMismatchError(session["offset"])
+
+        session_path, part_path = get_session_paths(upload_id, base_storage_path)
+        try:
+            await asyncio.to_thread(validate_part_image, part_path)
+        except (InvalidImageError, ImageDimensionsError):
+            delete_upload_session(upload_id, base_storage_path)
+            raise
+
+        actual_hash = await asyncio.to_thread(calculate_file_hash, part_path)
+        if actual_hash != content_hash.lower():
+            delete_upload_session(upload_id, base_storage_path)
+            raise UploadChecksumMismatchError("Хэш загруженного файла не совпадает с переданным")
+
+        extension = Path(session["file_name"]).suffix
+        if storage is not None:
+            uploaded_file_data = await storage.save_tmp_file(
+                part_path, upload_id, extension, session["size"], actual_hash
+            )
+        else:
+            uploaded_file_data = await move_tmp_file_to_storage(
+                part_path,
+                upload_id,
+                extension,
+                session["size"],
+                actual_hash,
+                base_storage_path,
+                content_addressed,
+            )
+        session_path.unlink(missing_ok=True)
+
+    return {**uploaded_file_data, "file_name": session["file_name"], "content_type": session["content_type"]}
+
+
+def delete_upload_session(upload_id: str, base_storage_path: Path) -> None:
+    for path in get_session_paths(upload_id, base_storage_path):
+        path.unlink(missing_ok=True)
+
+
+async def cancel_upload_session(upload_id: str, base_storage_path: Path) -> None:
+    """
+    Отмена загрузки: удаление сессии после того, как закончится запись уже принимаемой части
+    :raises UploadSessionNotFoundError: сессии нет
+    """
+    async with lock_upload_session(upload_id):
+        get_upload_session(upload_id, base_storage_path)
+        delete_upload_session(upload_id, base_storage_path)
+
+
+def cleanup_expired_upload_sessions(base_storage_path: Path, ttl_sec: float) -> int:
+    """
+    Удаление сессий, в которые ничего не дописывалось дольше ttl_sec
+    :return: Количество удаленных сессий
+    """
+    sessions_dir = get_upload_sessions_dir(base_storage_path)
+    if not sessions_dir.exists():
+        return 0
+
+    expired_before = time.time() - ttl_sec
+    removed = 0
+    for entry in os.scandir(sessions_dir):
+        if not entry.name.endswith(SESSION_FILE_SUFFIX):
+            continue
+        upload_id = entry.name.removesuffix(SESSION_FILE_SUFFIX)
+        _, part_path = get_session_paths(upload_id, base_storage_path)
+        last_activity = max(entry.stat().st_mtime, part_path.stat().st_mtime if part_path.exists() else 0)
+        if last_activity < expired_before:
+            delete_upload_session(upload_id, base_storage_path)
+            removed += 1
+
+    if removed:
+        logger.info("Удалено незавершенных сессий загрузки: %s", removed)
+    return removed
+
+
+async def cleanup_upload_sessions_periodically(
+    base_storage_path: Path, ttl_sec: float, interval_sec: float
+) -> None:
+    """Фоновая задача удаления заброшенных сессий загрузки"""
+    while True:
+        try:
+            await asyncio.to_thread(cleanup_expired_upload_sessions, base_storage_path, ttl_sec)
+        except OSError as e:
+            logger.warning("Ошибка удаления незавершенных сессий загрузки: %s", e)
+        await asyncio.sleep(interval_sec)
@@ -0,0 +1,204 @@
+"""
+Бэкенды хранения файлов: отдельный файл на каждую загрузку в директориях aa/bb (files, по умолчанию)
+или большие файлы-сегменты с индексом (pack, см. pack_storage.py).
+Загруженный файл сначала пишется во временный, затем передается бэкенду через save_tmp_file.
+"""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+from app.api.file_storage.pack_storage import PACKS_DIR_NAME, PackStorage
+from app.api.file_storage.utils import (
+    REF_FILE_SUFFIX,
+    get_file_path_by_uuid,
+    get_sharded_dir,
+    get_stored_file_by_uuid,
+    move_tmp_file_to_storage,
+    release_blob,
+)
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.logger import logger
+
+
+class FileStorage(ABC):
+    """Абстрактный базовый класс для бэкенда хранения файлов"""
+
+    # Каждый файл хранится отдельным файлом на диске (его можно отдать FileResponse по пути)
+    has_file_paths: bool = True
+
+    @abstractmethod
+    async def save_tmp_file(
+        self, tmp_file_path: Path, file_id: str, extension: str, file_size: int, content_hash: str
+    ) -> dict[str, Any]:
+        """
+        Перенос полностью записанного временного файла в хранилище
+        :return: {"file_id": file_id, "file_size_byte": file_size, "content_hash": хэш содержимого, ...}
+        """
+        pass
+
+    @abstractmethod
+    def get_file_path(self, file_id: str) -> str | None:
+        """
+        Путь к файлу на диске, None - если бэкенд не хранит файлы отдельно
+        :raises FileNotFoundError: файла нет в хранилище
+        """
+        pass
+
+    @abstractmethod
+    def read(self, file_id: str) -> tuple[bytes, str]:
+        """
+        Содержимое и расширение файла
+        :raises FileNotFoundError: файла нет в хранилище
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, file_id: str) -> bool:
+        """
+        Удаление файла
+        :return: Был ли файл в хранилище
+        """
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        """Освобождение ресурсов при остановке приложения"""
+        pass
+
+
+class FilesystemStorage(FileStorage):
+    """Файлы в директориях aa/bb/<uuid><ext> (или по хэшу содержимого с файлами-ссылками)"""
+
+    def __init__(self, base_storage_path: Path, content_addressed: bool = False):
+        self.base_storage_path = base_storage_path
+        self.content_addressed = content_addressed
+
+    async def save_tmp_file(
+        self, tmp_file_path: Path, file_id: str, extension: str, file_size: int, content_hash: str
+    ) -> dict[str, Any]:
+        return await move_tmp_file_to_storage(
+            tmp_file_path,
+            file_id,
+            extension,
+            file_size,
+            content_hash,
+            self.base_storage_path,
+            self.content_addressed,
+        )
+
+    def get_file_path(self, file_id: str) -> str:
+        return get_file_path_by_uuid(file_id, self.base_storage_path)
+
+    def get_file_path_and_extension(self, file_id: str) -> tuple[str, str]:
+        """
+        Путь к файлу и расширение загруженного файла (у блоба, сохраненного по хэшу, расширения нет)
+        :raises FileNotFoundError: файла нет в хранилище
+        """
+        return get_stored_file_by_uuid(file_id, self.base_storage_path)
+
+    def read(self, file_id: str) -> tuple[bytes, str]:
+        file_path, extension = self.get_file_path_and_extension(file_id)
+        return Path(file_path).read_bytes(), extension
+
+    def delete(self, file_id: str) -> bool:
+        # Блоб, сохраненный по хэшу содержимого, может быть общим для нескольких загрузок:
+        # удаляется ссылка, блоб - вместе с последней ссылкой на него
+        ref_file_path = get_sharded_dir(file_id, self.base_storage_path) / f"{file_id}{REF_FILE_SUFFIX}"
+        try:
+            blob_name = Path(ref_file_path.read_text(encoding="utf-8")).stem
+        except FileNotFoundError:
+            pass
+        else:
+            ref_file_path.unlink(missing_ok=True)
+            release_blob(blob_name, file_id, self.base_storage_path)
+            return True
+        try:
+            os.unlink(self.get_file_path(file_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class PackFileStorage(FileStorage):
+    """Файлы в сегментах <хранилище>/.packs/segment-NNNNNNNN.pack (см. PackStorage)"""
+
+    has_file_paths = False
+
+    def __init__(self, base_storage_path: Path, segment_max_bytes: int, fsync_interval_sec: float):
+        self.pack_storage = PackStorage(
+            base_storage_path / PACKS_DIR_NAME,
+            segment_max_bytes=segment_max_bytes,
+            fsync_interval_sec=fsync_interval_sec,
+        )
+
+    async def save_tmp_file(
+        self, tmp_file_path: Path, file_id: str, extension: str, file_size: int, content_hash: str
+    ) -> dict[str, Any]:
+        try:
+            await asyncio.to_thread(self.pack_storage.put_file, file_id, extension, tmp_file_path)
+        finally:
+            tmp_file_path.unlink(missing_ok=True)
+
+        logger.info("Фото сохранено в сегмент: %s (%s байт)", file_id, file_size)
+        metrics.inc("file_storage_stored_files_total", duplicate="false")
+        metrics.inc("file_storage_stored_bytes_total", file_size)
+
+        return {"file_id": file_id, "file_size_byte": file_size, "content_hash": content_hash}
+
+    def open(self) -> None:
+        """
+        Блокировка директории сегментов и загрузка индекса при запуске приложения
+        :raises PackStorageLockedError: сегменты уже открыты другим процессом
+        """
+        self.pack_storage.open()
+
+    def get_file_path(self, file_id: str) -> None:
+        if self.pack_storage.get_entry(file_id) is None:
+            raise FileNotFoundError(f"Файл {file_id} не найден")
+        return None
+
+    def read(self, file_id: str) -> tuple[bytes, str]:
+        return self.pack_storage.read(file_id)
+
+    def delete(self, file_id: str) -> bool:
+        return self.pack_storage.delete(file_id)
+
+    def compact(self, min_dead_ratio: float) -> int:
+        return self.pack_storage.compact(min_dead_ratio)
+
+    def close(self) -> None:
+        self.pack_storage.close()
+
+
+def create_file_storage(
+    base_storage_path: Path,
+    backend: str = settings.FILE_STORAGE_BACKEND,
+    content_addressed: bool = settings.FILE_STORAGE_CONTENT_ADDRESSED,
+) -> FileStorage:
+    """Бэкенд хранения по настройке FILE_STORAGE_BACKEND"""
+    if backend == "pack":
+        return PackFileStorage(
+            base_storage_path,
+            segment_max_bytes=settings.FILE_STORAGE_PACK_SEGMENT_MAX_BYTE,
+            fsync_interval_sec=settings.FILE_STORAGE_PACK_FSYNC_INTERVAL_SEC,
+        )
+    return FilesystemStorage(base_storage_path, content_addressed)
+
+
+async def compact_pack_storage_periodically(
+    storage: PackFileStorage, min_dead_ratio: float, interval_sec: float
+) -> None:
+    """Фоновая задача пересборки сегментов с большой долей удаленных файлов"""
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            await asyncio.to_thread(storage.compact, min_dead_ratio)
+        except OSError as e:
+            logger.warning("Ошибка пересборки сегментов хранилища: %s", e)
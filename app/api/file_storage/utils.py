@@ -1,72 +1,378 @@
+import asyncio
+import fcntl
+import hashlib
+import mimetypes
 import os
+import shutil
+import zipfile
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from tempfile import SpooledTemporaryFile
+from typing import TYPE_CHECKING, Any, BinaryIO
 from uuid import uuid4
 
 import aiofiles  # type: ignore
 from fastapi import UploadFile
+from starlette.datastructures import Headers
 
+from app.core.config import settings
+from app.core.metrics import metrics
 from app.logger import logger
 
+if TYPE_CHECKING:
+    from app.api.file_storage.storage import FileStorage
+
+# Временные файлы недописанных загрузок
+TMP_DIR_NAME = ".tmp"
+# Файл-ссылка uuid -> имя блоба в режиме хранения по хэшу содержимого
+REF_FILE_SUFFIX = ".ref"
+# Директория aa/bb/<hash>.links с пустым файлом <uuid> на каждую ссылку: блоб удаляется вместе с последней
+LINKS_DIR_SUFFIX = ".links"
+# Файлы из архива размером больше этого значения хранятся во временном файле, а не в памяти
+SPOOLED_FILE_MAX_MEMORY_BYTE = 1024 * 1024
+
 
 def get_img_name_uuid4() -> str:
     # Генерируем UUID и возвращаем как строку
     return str(uuid4())
 
 
+def get_content_hasher() -> "hashlib.blake2b":
+    """Хэш-функция для адресации файлов по содержимому"""
+    return hashlib.blake2b(digest_size=32)
+
+
+def get_sharded_dir(name: str, base_storage_path: Path) -> Path:
+    """Директория вида aa/bb по первым 4 символам имени"""
+    return base_storage_path / name[:2] / name[2:4]
+
+
+class FileTooLargeError(Exception):
+    """Размер загружаемого файла превышает допустимый"""
+
+
+async def write_to_tmp_file(
+    uploaded_file: UploadFile,
+    base_storage_path: Path,
+    file_name: str,
+    chunk_size: int = 500 * 1024,
+    max_size: int = settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE,
+) -> tuple[Path, int, str]:
+    """
+    Запись загруженного файла во временный файл за один проход: размер и хэш считаются по ходу записи
+    :raises FileTooLargeError: размер файла больше max_size, временный файл удаляется
+    :return: (путь к временному файлу, размер в байтах, хэш содержимого)
+    """
+    # Размер уже известен, если тело запроса разобрано целиком
+    if uploaded_file.size is not None and uploaded_file.size > max_size:
+        raise FileTooLargeError(f"Размер файла больше {max_size} байт")
+
+    tmp_dir = base_storage_path / TMP_DIR_NAME
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_file_path = tmp_dir / f"{file_name}.part"
+
+    hasher = get_content_hasher()
+    file_size = 0
+    try:
+        async with aiofiles.open(tmp_file_path, "wb") as f:
+            chunks = 0
+            while chunk := await uploaded_file.read(chunk_size):
+                chunks += 1
+                file_size += len(chunk)
+                if file_size > max_size:
+                    raise FileTooLargeError(f"Размер файла больше {max_size} байт")
+                hasher.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        tmp_file_path.unlink(missing_ok=True)
+        raise
+
+    logger.debug("Временный файл %s записан: %s чанков, %s байт", tmp_file_path, chunks, file_size)
+    return tmp_file_path, file_size, hasher.hexdigest()
+
+
+async def read_file_content(
+    uploaded_file: UploadFile, max_size: int = settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE
+) -> bytes:
+    """
+    Чтение содержимого загруженного файла в память (для распознавания без записи на диск).
+    Позиция в файле возвращается в начало, чтобы файл можно было сохранить через save_file.
+    :raises FileTooLargeError: размер файла больше max_size
+    """
+    if uploaded_file.size is not None and uploaded_file.size > max_size:
+        raise FileTooLargeError(f"Размер файла больше {max_size} байт")
+
+    content = await uploaded_file.read(max_size + 1)
+    await uploaded_file.seek(0)
+    if len(content) > max_size:
+        raise FileTooLargeError(f"Размер файла больше {max_size} байт")
+
+    return content
+
+
 async def save_file(
-    uploaded_file: UploadFile, base_storage_path: Path, chunk_size: int = 500 * 1024
+    uploaded_file: UploadFile,
+    base_storage_path: Path,
+    chunk_size: int = 500 * 1024,
+    content_addressed: bool = settings.FILE_STORAGE_CONTENT_ADDRESSED,
+    storage: "FileStorage | None" = None,
 ) -> dict[str, Any]:
     """
     Сохранение файла на диск с созданием структуры по uuid
     :param uploaded_file: Файл
     :param base_storage_path: Путь файлового хранилища
     :param chunk_size: Конфигурируемый размер чанка для сохранения фала)
+    :param content_addressed: Хранить файл по хэшу содержимого (см. move_tmp_file_content_addressed)
+    :param storage: Бэкенд хранения, по умолчанию - директории aa/bb в base_storage_path
+    :raises FileTooLargeError: размер файла больше FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE
     :return:
     {
         "file_id": uuid_str,
-        "file_size_byte": len(content)
+        "file_size_byte": file_size,
+        "content_hash": хэш содержимого
     }
     """
-    # Генерируем UUID
-    uuid_str = get_img_name_uuid4()
+    with metrics.timer("file_storage_duration_seconds"):
+        # Генерируем UUID
+        uuid_str = get_img_name_uuid4()
+
+        # Пишем файл во временный, затем атомарно переносим в хранилище
+        tmp_file_path, file_size, content_hash = await write_to_tmp_file(
+            uploaded_file, base_storage_path, uuid_str, chunk_size
+        )
 
-    # Извлекаем части для пути (первые 2 символа, следующие 2)
-    first_part, second_part = uuid_str[:2], uuid_str[2:4]
+        # Формируем полное имя файла с исходным расширением
+        file_extension = Path(uploaded_file.filename).suffix if uploaded_file.filename is not None else ""
+        if storage is not None:
+            return await storage.save_tmp_file(
+                tmp_file_path, uuid_str, file_extension, file_size, content_hash
+            )
+        return await move_tmp_file_to_storage(
+            tmp_file_path,
+            uuid_str,
+            file_extension,
+            file_size,
+            content_hash,
+            base_storage_path,
+            content_addressed,
+        )
+
+
+async def move_tmp_file_to_storage(
+    tmp_file_path: Path,
+    uuid_str: str,
+    file_extension: str,
+    file_size: int,
+    content_hash: str,
+    base_storage_path: Path,
+    content_addressed: bool = settings.FILE_STORAGE_CONTENT_ADDRESSED,
+) -> dict[str, Any]:
+    """
+    Перенос полностью записанного временного файла в хранилище aa/bb/<uuid><ext>
+    :return: {"file_id": uuid_str, "file_size_byte": file_size, "content_hash": хэш содержимого}
+    """
+    if content_addressed:
+        return await move_tmp_file_content_addressed(
+            tmp_file_path, uuid_str, file_extension, file_size, content_hash, base_storage_path
+        )
 
-    # Формируем полный путь для сохранения
-    target_dir = base_storage_path / first_part / second_part
+    # Формируем полный путь для сохранения (первые 2 символа, следующие 2)
+    target_dir = get_sharded_dir(uuid_str, base_storage_path)
 
     # Создаем директории, если их нет
     target_dir.mkdir(parents=True, exist_ok=True)
 
-    # Формируем полное имя файла с исходным расширением
-    file_extension = Path(uploaded_file.filename).suffix if uploaded_file.filename is not None else ""
-    target_filename = f"{uuid_str}{file_extension}"
-    full_file_path = target_dir / target_filename
+    full_file_path = target_dir / f"{uuid_str}{file_extension}"
+    os.replace(tmp_file_path, full_file_path)
 
-    # Если нужно проверить размер до сохранения
-    content = await uploaded_file.read()
-    file_size = len(content)
+    logger.info("Фото сохранено: %s (%s байт)", uuid_str, file_size)
+    metrics.inc("file_storage_stored_files_total", duplicate="false")
+    metrics.inc("file_storage_stored_bytes_total", file_size)
 
-    # Сохраняем файл частями:
-    await uploaded_file.seek(0)
-    async with aiofiles.open(full_file_path, "wb") as f:
-        c = 0
-        while chunk := await uploaded_file.read(chunk_size):
-            c += 1
-            logger.debug(f"chunk: {c}")
-            await f.write(chunk)
+    return {"file_id": uuid_str, "file_size_byte": file_size, "content_hash": content_hash}
 
-    logger.info(f"Фото сохранено: {uuid_str} ({file_size} байт)")
 
-    return {"file_id": uuid_str, "file_size_byte": file_size}
+@contextmanager
+def lock_sharded_dir(sharded_dir: Path) -> Iterator[None]:
+    """Блокировка директории aa/bb между потоками и процессами (flock)"""
+    fd = os.open(sharded_dir, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
 
 
-def get_file_path_by_uuid(file_uuid: str, base_storage_path: Path) -> str:
-    """Функция для получения пути к файлу по его UUID"""
+def store_blob(tmp_file_path: Path, content_hash: str, uuid_str: str, base_storage_path: Path) -> bool:
+    """
+    Перенос временного файла в блоб aa/bb/<hash> (если его еще нет) и учет ссылки uuid на блоб
+    :return: Был ли блоб уже сохранен
+    """
+    blob_dir = get_sharded_dir(content_hash, base_storage_path)
+    blob_dir.mkdir(parents=True, exist_ok=True)
+    blob_path = blob_dir / content_hash
+    links_dir = blob_dir / f"{content_hash}{LINKS_DIR_SUFFIX}"
+    # Под блокировкой: удаление последней ссылки (release_blob) не удалит блоб, на который ссылается новая
+    with lock_sharded_dir(blob_dir):
+        duplicate = blob_path.exists()
+        if duplicate:
+            tmp_file_path.unlink()
+        else:
+            os.replace(tmp_file_path, blob_path)
+        links_dir.mkdir(exist_ok=True)
+        (links_dir / uuid_str).touch()
+    return duplicate
+
+
+def release_blob(content_hash: str, uuid_str: str, base_storage_path: Path) -> bool:
+    """
+    Удаление ссылки uuid на блоб и самого блоба, если ссылок на него больше нет
+    :return: Был ли удален блоб
+    """
+    blob_dir = get_sharded_dir(content_hash, base_storage_path)
+    links_dir = blob_dir / f"{content_hash}{LINKS_DIR_SUFFIX}"
+    if not links_dir.is_dir():
+        return False
+    with lock_sharded_dir(blob_dir):
+        (links_dir / uuid_str).unlink(missing_ok=True)
+        if any(links_dir.iterdir()):
+            return False
+        links_dir.rmdir()
+        (blob_dir / content_hash).unlink(missing_ok=True)
+    return True
+
+
+async def move_tmp_file_content_addressed(
+    tmp_file_path: Path,
+    uuid_str: str,
+    file_extension: str,
+    file_size: int,
+    content_hash: str,
+    base_storage_path: Path,
+) -> dict[str, Any]:
+    """
+    Хранение файла по хэшу содержимого.
+    Временный файл переносится в aa/bb/<hash>, если такого блоба еще нет, иначе удаляется:
+    одинаковые файлы с разными расширениями хранятся одним блобом.
+    Для uuid создается файл-ссылка <uuid>.ref с именем блоба и расширением загруженного файла: <hash><ext>,
+    ссылки на блоб учитываются в aa/bb/<hash>.links (см. release_blob).
+    :return:
+    {
+        "file_id": uuid_str,
+        "file_size_byte": file_size,
+        "content_hash": content_hash,
+        "duplicate": True, если такой файл уже был сохранен
+    }
+    """
+    try:
+        duplicate = await asyncio.to_thread(
+            store_blob, tmp_file_path, content_hash, uuid_str, base_storage_path
+        )
+    except BaseException:
+        tmp_file_path.unlink(missing_ok=True)
+        raise
+
+    ref_dir = get_sharded_dir(uuid_str, base_storage_path)
+    ref_dir.mkdir(parents=True, exist_ok=True)
+    async with aiofiles.open(ref_dir / f"{uuid_str}{REF_FILE_SUFFIX}", "w") as f:
+        await f.write(f"{content_hash}{file_extension}")
+
+    if duplicate:
+        logger.info("Фото %s совпадает с уже сохраненным %s (%s байт)", uuid_str, content_hash, file_size)
+    else:
+        logger.info("Фото сохранено: %s -> %s (%s байт)", uuid_str, content_hash, file_size)
+        metrics.inc("file_storage_stored_bytes_total", file_size)
+    metrics.inc("file_storage_stored_files_total", duplicate=str(duplicate).lower())
+
+    return {
+        "file_id": uuid_str,
+        "file_size_byte": file_size,
+        "content_hash": content_hash,
+        "duplicate": duplicate,
+    }
+
+
+def get_stored_file_by_uuid(file_uuid: str, base_storage_path: Path) -> tuple[str, str]:
+    """
+    Путь к файлу по его UUID и расширение, с которым файл был загружен
+    :raises FileNotFoundError: файла нет в хранилище
+    """
     uuid_str = file_uuid.split(".")[0]
-    first_part = file_uuid[0:2]
-    second_part = file_uuid[2:4]
-    file_extension = ".jpg"  # Это нужно знать или хранить в БД
-    return os.path.join(base_storage_path, first_part, second_part, f"{uuid_str}{file_extension}")
+    target_dir = get_sharded_dir(uuid_str, base_storage_path)
+
+    # Файл сохранен по хэшу содержимого: в ссылке имя блоба и расширение
+    ref_file_path = target_dir / f"{uuid_str}{REF_FILE_SUFFIX}"
+    if ref_file_path.exists():
+        ref = Path(ref_file_path.read_text(encoding="utf-8"))
+        blob_name = ref.stem
+        return os.path.join(get_sharded_dir(blob_name, base_storage_path), blob_name), ref.suffix
+
+    # Расширение берется из имени сохраненного файла: в директории aa/bb немного файлов
+    if target_dir.is_dir():
+        for entry in os.scandir(target_dir):
+            entry_path = Path(entry.name)
+            if entry_path.stem == uuid_str and entry.is_file():
+                return entry.path, entry_path.suffix
+
+    raise FileNotFoundError(f"Файл {uuid_str} не найден")
+
+
+def get_file_path_by_uuid(file_uuid: str, base_storage_path: Path) -> str:
+    """
+    Функция для получения пути к файлу по его UUID
+    :raises FileNotFoundError: файла нет в хранилище
+    """
+    return get_stored_file_by_uuid(file_uuid, base_storage_path)[0]
+
+
+def get_stored_file_path(
+    file_id: str, extension: str, content_hash: str, content_addressed: bool, base_storage_path: Path
+) -> str:
+    """Путь к файлу по данным индекса файлов (без обращения к файловой системе)"""
+    blob_name = content_hash if content_addressed else f"{file_id}{extension}"
+    return os.path.join(get_sharded_dir(blob_name, base_storage_path), blob_name)
+
+
+def extract_zip_archive(
+    archive: BinaryIO, max_files: int, max_file_size: int = settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE
+) -> list[UploadFile | tuple[str, str]]:
+    """
+    Распаковка zip-архива в список файлов (синхронная, вызывать через asyncio.to_thread).
+    Содержимое файлов копируется во временные файлы, поэтому в памяти архив целиком не держится.
+    :param archive: zip-архив
+    :param max_files: Максимальное количество файлов в архиве
+    :param max_file_size: Максимальный размер распакованного файла
+    :return: Файлы архива; для файлов, которые не удалось распаковать - (имя файла, описание ошибки)
+    """
+    files: list[UploadFile | tuple[str, str]] = []
+    with zipfile.ZipFile(archive) as zip_file:
+        entries = [
+            entry
+            for entry in zip_file.infolist()
+            if not entry.is_dir() and not entry.filename.startswith("__MACOSX/")
+        ]
+        if len(entries) > max_files:
+            raise ValueError(f"В архиве больше {max_files} файлов")
+
+        for entry in entries:
+            if entry.file_size > max_file_size:
+                files.append((entry.filename, f"Размер файла больше {max_file_size} байт"))
+                continue
+
+            spooled_file = SpooledTemporaryFile(max_size=SPOOLED_FILE_MAX_MEMORY_BYTE)
+            with zip_file.open(entry) as entry_file:
+                shutil.copyfileobj(entry_file, spooled_file)
+            spooled_file.seek(0)
+
+            content_type = mimetypes.guess_type(entry.filename)[0] or "application/octet-stream"
+            files.append(
+                UploadFile(
+                    file=spooled_file,  # type: ignore[arg-type]
+                    size=entry.file_size,
+                    filename=Path(entry.filename).name,
+                    headers=Headers({"content-type": content_type}),
+                )
+            )
+
+    return files
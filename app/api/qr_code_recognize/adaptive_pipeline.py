@@ -0,0 +1,180 @@
+import fcntl
+import json
+import os
+import random
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from app.api.qr_code_recognize.image_enhancement import ImageEnhancement
+from app.core.config import settings
+from app.logger import logger
+
+# Через сколько новых замеров статистика сохраняется на диск (остальные - при завершении процесса)
+SAVE_EVERY_RECORDS = 100
+
+
+@dataclass
+class EnhancementStats:
+    """Статистика применения одного улучшения"""
+
+    attempts: int = 0
+    successes: int = 0
+    total_ms: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts else 0.0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.attempts if self.attempts else 0.0
+
+    @property
+    def score(self) -> float:
+        """Ожидаемое число успешных распознаваний на миллисекунду работы"""
+        # Сглаживание (+1 / +2), чтобы редкие замеры не давали крайних значений
+        return (self.successes + 1) / (self.attempts + 2) / max(self.mean_ms, 1.0)
+
+
+class AdaptivePipelineScheduler:
+    """
+    Определяет порядок улучшений по накопленной статистике: первыми идут улучшения
+    с наибольшей вероятностью успеха на миллисекунду. Улучшения, которые почти никогда
+    не помогают, пропускаются (кроме доли exploration_rate запросов, чтобы статистика обновлялась).
+    В режиме deterministic порядок всегда совпадает с исходным.
+    """
+
+    def __init__(
+        self,
+        deterministic: bool = False,
+        stats_path: Path | None = None,
+        min_attempts: int = 50,
+        prune_success_rate: float = 0.01,
+        exploration_rate: float = 0.05,
+    ):
+        self.deterministic = deterministic
+        self.stats_path = stats_path
+        self.min_attempts = min_attempts
+        self.prune_success_rate = prune_success_rate
+        self.exploration_rate = exploration_rate
+
+        self._stats: dict[str, EnhancementStats] = {}
+        # Замеры, еще не добавленные в файл статистики (файл общий для всех процессов пула)
+        self._unsaved_stats: dict[str, EnhancementStats] = {}
+        self._loaded = False
+        self._unsaved_records = 0
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> None:
+        # Загрузка откладывается до первого использования: каждый процесс пула читает снимок сам
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.stats_path is None or not self.stats_path.exists():
+            return
+        try:
+            self._stats = self._read_stats_file()
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Не удалось загрузить статистику улучшений {self.stats_path}: {e}")
+
+    def _read_stats_file(self) -> dict[str, EnhancementStats]:
+        if self.stats_path is None or not self.stats_path.exists():
+            return {}
+        snapshot = json.loads(self.stats_path.read_text(encoding="utf-8"))
+        return {name: EnhancementStats(**stats) for name, stats in snapshot.items()}
+
+    def order(self, enhancement_pipeline: list[ImageEnhancement]) -> list[ImageEnhancement]:
+        """Порядок применения улучшений для очередного изображения"""
+        if self.deterministic:
+            return list(enhancement_pipeline)
+
+        with self._lock:
+            self._ensure_loaded()
+            stats = {e.name: self._stats.get(e.name, EnhancementStats()) for e in enhancement_pipeline}
+
+        # Пока статистики мало, сохраняем исходный порядок
+        if any(s.attempts < self.min_attempts for s in stats.values()):
+            return list(enhancement_pipeline)
+
+        ordered = sorted(enhancement_pipeline, key=lambda e: stats[e.name].score, reverse=True)
+        if random.random() < self.exploration_rate:
+            return ordered
+
+        kept = [e for e in ordered if stats[e.name].success_rate >= self.prune_success_rate]
+        return kept or ordered
+
+    def record(self, enhancement_name: str, success: bool, elapsed_ms: float) -> None:
+        """Учет результата применения улучшения"""
+        if self.deterministic:
+            return
+
+        with self._lock:
+            self._ensure_loaded()
+            for stats_by_name in (self._stats, self._unsaved_stats):
+                stats = stats_by_name.setdefault(enhancement_name, EnhancementStats())
+                stats.attempts += 1
+                stats.successes += int(success)
+                stats.total_ms += elapsed_ms
+
+            self._unsaved_records += 1
+            if self._unsaved_records >= SAVE_EVERY_RECORDS:
+                self._save()
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            return {name: asdict(stats) for name, stats in self._stats.items()}
+
+    def save(self) -> None:
+        """Сохранение накопленных замеров (в том числе при завершении процесса пула)"""
+        with self._lock:
+            if self._unsaved_records:
+                self._save()
+
+    def _save(self) -> None:
+        """
+        Добавление новых замеров к статистике в файле. Файл общий для всех процессов пула,
+        поэтому он перечитывается под блокировкой, а не перезаписывается статистикой одного процесса
+        """
+        self._unsaved_records = 0
+        if self.stats_path is None:
+            self._unsaved_stats = {}
+            return
+        lock_path = self.stats_path.with_name(f"{self.stats_path.name}.lock")
+        tmp_path = self.stats_path.with_name(f"{self.stats_path.name}.{os.getpid()}.tmp")
+        try:
+            self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    merged = self._read_stats_file()
+                except (ValueError, TypeError) as e:
+                    logger.warning(
+                        f"Статистика улучшений {self.stats_path} повреждена и будет перезаписана: {e}"
+                    )
+                    merged = {}
+                for name, unsaved in self._unsaved_stats.items():
+                    stats = merged.setdefault(name, EnhancementStats())
+                    stats.attempts += unsaved.attempts
+                    stats.successes += unsaved.successes
+                    stats.total_ms += unsaved.total_ms
+                snapshot = {name: asdict(stats) for name, stats in merged.items()}
+                tmp_path.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить статистику улучшений {self.stats_path}: {e}")
+            return
+        # Вместе с замерами этого процесса подхватываются замеры остальных
+        self._stats = merged
+        self._unsaved_stats = {}
+
+
+pipeline_scheduler = AdaptivePipelineScheduler(
+    deterministic=settings.RECOGNITION_PIPELINE_MODE == "fixed",
+    stats_path=settings.RECOGNITION_PIPELINE_STATS_PATH,
+    min_attempts=settings.RECOGNITION_PIPELINE_MIN_ATTEMPTS,
+    prune_success_rate=settings.RECOGNITION_PIPELINE_PRUNE_SUCCESS_RATE,
+    exploration_rate=settings.RECOGNITION_PIPELINE_EXPLORATION_RATE,
+)
@@ -1,9 +1,36 @@
-import cv2
-from pyzbar.pyzbar import decode  # type: ignore
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
 
-from app.api.qr_code_recognize.qr_code_enhancer import qr_code_enhancement_pipeline
+import cv2
+import numpy as np
+
+from app.api.file_storage.image_probe import InvalidImageError, probe_image
+from app.api.qr_code_recognize.adaptive_pipeline import AdaptivePipelineScheduler, pipeline_scheduler
+from app.api.qr_code_recognize.image_enhancement import EnhancementCache, ImageEnhancement
+from app.api.qr_code_recognize.qr_code_decoder import DecodedObject, QRCodeDecoder
+from app.api.qr_code_recognize.qr_code_enhancer import qr_code_decoders, qr_code_enhancement_pipeline
+from app.api.qr_code_recognize.qr_code_localizer import crop_region, locate_qr_code_regions
+from app.core.config import settings
+from app.core.metrics import metrics
 from app.logger import logger
 
+STAGE_DURATION_METRIC = "qr_recognition_stage_duration_seconds"
+NO_ENHANCEMENT_NAME = "Без улучшения"
+REDUCED_RESOLUTION_NAME = "Уменьшенное разрешение"
+
+# Данные QR-кода: поля платежного QR-кода (ST...) или текст QR-кода другого формата
+QRCodeData = dict[str, str] | str
+
+# Флаги загрузки в оттенках серого с уменьшением в 8, 4 и 2 раза (от большего к меньшему)
+REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+
 
 def is_double_encoded_cp1251(text: str) -> bool:
     """
@@ -55,64 +82,451 @@ def decode_qr_data(data_bytes: bytes) -> dict[str, str | None | bool]:
         return {"data": None, "double_encoded": False, "success": False}
 
 
-def handle_decoded_objects(decoded_objects, enhancement_name: str, img_path: str) -> dict[str, str] | None:
-    """Обрабатывает результат распознавания QR-кода и возвращает декодированные данные"""
+def handle_decoded_objects(
+    decoded_objects: list[DecodedObject], enhancement_name: str, img_path: str
+) -> dict[str, Any] | None:
+    """Обрабатывает результат распознавания QR-кода и возвращает декодированные данные первого QR-кода"""
     if not decoded_objects:
-        logger.warning(f"[{enhancement_name}] QR-код не найден на {img_path}")
+        logger.warning("[%s] QR-код не найден на %s", enhancement_name, img_path)
         return None
 
-    logger.info(f"[{enhancement_name}] QR-код распознан на {img_path}")
-
-    for obj in decoded_objects:
-        decoded_qr_data = decode_qr_data(obj.data)
-
-        if decoded_qr_data.get("success"):
-            return {
-                "data": decoded_qr_data.get("data"),
-                "type": obj.type,
-                "rect": obj.rect,
-                "polygon": obj.polygon,
-                "quality": obj.quality,
-                "orientation": obj.orientation,
-                "double_encoded": decoded_qr_data.get("double_encoded"),
-                "file_name": img_path,
-            }
+    logger.info("[%s] QR-код распознан на %s", enhancement_name, img_path)
+
+    obj = decoded_objects[0]
+    decoded_qr_data = decode_qr_data(obj.data)
+
+    if decoded_qr_data.get("success"):
+        return {
+            "data": decoded_qr_data.get("data"),
+            "type": obj.type,
+            "rect": obj.rect,
+            "polygon": obj.polygon,
+            "quality": obj.quality,
+            "orientation": obj.orientation,
+            "double_encoded": decoded_qr_data.get("double_encoded"),
+            "file_name": img_path,
+            "decoder": obj.decoder,
+        }
+    return {
+        "data": decoded_qr_data.get("data"),
+        "double_encoded": decoded_qr_data.get("double_encoded"),
+        "file_name": img_path,
+        "decoder": obj.decoder,
+    }
+
+
+def load_image(
+    image_source: str | bytes | memoryview, flags: int = cv2.IMREAD_GRAYSCALE
+) -> np.ndarray | None:
+    """
+    Загрузка изображения из файла или из буфера в памяти (по умолчанию сразу в оттенках серого).
+    Буфер декодируется через memoryview без копирования данных.
+    """
+    with metrics.timer(STAGE_DURATION_METRIC, stage="imread"):
+        if isinstance(image_source, str):
+            return cv2.imread(image_source, flags)
+
+        buffer = np.frombuffer(memoryview(image_source), dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+        return cv2.imdecode(buffer, flags)
+
+
+def get_image_size(image_source: str | bytes | memoryview) -> tuple[int, int] | None:
+    """Ширина и высота изображения по заголовку файла, без декодирования"""
+    try:
+        if isinstance(image_source, str):
+            with open(image_source, "rb") as f:
+                _, width, height = probe_image(f)
         else:
-            return {
-                "data": decoded_qr_data.get("data"),
-                "double_encoded": decoded_qr_data.get("double_encoded"),
-                "file_name": img_path,
-            }
+            _, width, height = probe_image(io.BytesIO(image_source))
+    except (InvalidImageError, OSError):
+        return None
+    return width, height
 
 
-def enhance_and_recognize_qr_code(
-    img_path: str, enhancement_pipeline: list = qr_code_enhancement_pipeline
+def get_reduction_factor(width: int, height: int, target_size: int) -> int:
+    """Наибольшее уменьшение, при котором большая сторона остается не меньше target_size (1 - без уменьшения)"""
+    for factor in REDUCED_GRAYSCALE_FLAGS:
+        if max(width, height) // factor >= target_size:
+            return factor
+    return 1
+
+
+def recognize_reduced_image(
+    image_source: str | bytes | memoryview,
+    img_path: str,
+    target_size: int,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
 ) -> dict[str, str] | None:
-    original_image = cv2.imread(img_path)
+    """
+    Быстрая попытка распознать QR-код на уменьшенной копии большого изображения (без улучшений).
+    JPEG декодируется сразу в уменьшенном размере, поэтому полное изображение в память не загружается.
+    """
+    image_size = get_image_size(image_source)
+    if image_size is None:
+        return None
+    factor = get_reduction_factor(*image_size, target_size)
+    if factor == 1:
+        return None
 
-    if original_image is None:
-        logger.warning(f"Ошибка: не удалось загрузить изображение {img_path}")
+    reduced_image = load_image(image_source, REDUCED_GRAYSCALE_FLAGS[factor])
+    if reduced_image is None:
+        return None
+
+    decoded_objects = decode_image(reduced_image, REDUCED_RESOLUTION_NAME, decoders)
+    result = handle_decoded_objects(decoded_objects, REDUCED_RESOLUTION_NAME, img_path)
+    if not result:
         return None
+    metrics.inc("qr_recognition_success_total", step=REDUCED_RESOLUTION_NAME, decoder=result["decoder"])
+    return to_image_coordinates(result, scale=factor)
+
+
+def run_decoder(decoder: QRCodeDecoder, image: np.ndarray, enhancement_name: str) -> list[DecodedObject]:
+    """Распознавание одним декодером с замером времени"""
+    with metrics.timer(STAGE_DURATION_METRIC, stage="decode", step=enhancement_name, decoder=decoder.name):
+        return decoder.decode(image)
+
+
+def race_decoders(
+    image: np.ndarray, enhancement_name: str, decoders: list[QRCodeDecoder]
+) -> list[DecodedObject]:
+    """Параллельный запуск декодеров: возвращается результат первого успешного, остальные отбрасываются"""
+    pool = get_decoder_pool()
+    futures = [pool.submit(run_decoder, decoder, image, enhancement_name) for decoder in decoders]
+    try:
+        for future in as_completed(futures):
+            decoded_objects = future.result()
+            if decoded_objects:
+                return decoded_objects
+    finally:
+        for future in futures:
+            future.cancel()
+    return []
+
+
+def decode_image(
+    image: np.ndarray,
+    enhancement_name: str,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+    race: bool = settings.RECOGNITION_DECODER_MODE == "race",
+) -> list[DecodedObject]:
+    """Распознавание декодерами по очереди до первого успешного или параллельно (race)"""
+    if race and len(decoders) > 1:
+        return race_decoders(image, enhancement_name, decoders)
+
+    for decoder in decoders:
+        decoded_objects = run_decoder(decoder, image, enhancement_name)
+        if decoded_objects:
+            return decoded_objects
+    return []
+
+
+def enhance_image(
+    enhancement_cache: EnhancementCache, enhancement: ImageEnhancement, image: np.ndarray
+) -> Any:
+    """Улучшение изображения (с учетом уже вычисленных шагов) с замером времени"""
+    with metrics.timer(STAGE_DURATION_METRIC, stage="enhance", step=enhancement.name):
+        return enhancement_cache.enhance(enhancement, image)
+
+
+# Если найденная область занимает большую часть кадра, кадр обрабатывается целиком
+MAX_REGION_AREA_RATIO = 0.5
+
+# Применения улучшений к одному изображению (его областям и кадру целиком):
+# имя улучшения -> (помогло ли хотя бы раз, суммарное время, мс). В статистику scheduler попадают
+# один раз на изображение, чтобы повторные попытки на кадре целиком не искажали ее
+EnhancementAttempts = dict[str, tuple[bool, float]]
+
+
+def add_enhancement_attempt(
+    attempts: EnhancementAttempts, name: str, success: bool, elapsed_ms: float
+) -> None:
+    previous_success, previous_elapsed_ms = attempts.get(name, (False, 0.0))
+    attempts[name] = (previous_success or success, previous_elapsed_ms + elapsed_ms)
+
+
+def to_image_coordinates(result: dict[str, Any], x: int = 0, y: int = 0, scale: int = 1) -> dict[str, Any]:
+    """
+    Координаты QR-кода, распознанного в области с началом (x, y) или на уменьшенной в scale раз копии,
+    в координатах всего изображения
+    """
+    if "rect" not in result:
+        return result
+    rect_x, rect_y, width, height = result["rect"]
+    return {
+        **result,
+        "rect": (rect_x * scale + x, rect_y * scale + y, width * scale, height * scale),
+        "polygon": [(point_x * scale + x, point_y * scale + y) for point_x, point_y in result["polygon"]],
+    }
+
+
+_speculative_pool: ThreadPoolExecutor | None = None
+_decoder_pool: ThreadPoolExecutor | None = None
+
+
+def get_speculative_pool() -> ThreadPoolExecutor:
+    """Пул потоков для параллельного распознавания (создается в каждом процессе при первом обращении)"""
+    global _speculative_pool
+    if _speculative_pool is None:
+        _speculative_pool = ThreadPoolExecutor(
+            max_workers=settings.RECOGNITION_SPECULATIVE_THREADS, thread_name_prefix="qr-speculative"
+        )
+    return _speculative_pool
+
+
+def get_decoder_pool() -> ThreadPoolExecutor:
+    """
+    Пул потоков для параллельного запуска декодеров (отдельный от пула recognize_speculatively:
+    декодеры запускаются из его потоков, и общий пул мог бы заполниться ожидающими задачами)
+    """
+    global _decoder_pool
+    if _decoder_pool is None:
+        _decoder_pool = ThreadPoolExecutor(
+            max_workers=len(settings.RECOGNITION_DECODERS) * settings.RECOGNITION_SPECULATIVE_THREADS,
+            thread_name_prefix="qr-decoder",
+        )
+    return _decoder_pool
+
+
+def recognize_speculatively(
+    original_image: np.ndarray,
+    enhancement_pipeline: list[ImageEnhancement],
+    img_path: str,
+    attempts: EnhancementAttempts,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+) -> dict[str, str] | None:
+    """
+    Параллельное распознавание исходного изображения и всех вариантов улучшений.
+    OpenCV и zbar отпускают GIL, поэтому варианты выполняются в потоках действительно параллельно.
+    Возвращается первый успешный результат, остальные задачи отменяются, а их результаты отбрасываются.
+    """
+    stop_event = threading.Event()
+    # attempts пополняется из потоков пула и не должен меняться после возврата результата
+    attempts_lock = threading.Lock()
+    enhancement_cache = EnhancementCache(enhancement_pipeline)
+
+    def attempt(enhancement: ImageEnhancement | None) -> dict[str, str] | None:
+        if stop_event.is_set():
+            return None
+
+        started_at = time.perf_counter()
+        if enhancement is None:
+            enhancement_name, image = NO_ENHANCEMENT_NAME, original_image
+        else:
+            enhancement_name = enhancement.name
+            image = enhance_image(enhancement_cache, enhancement, original_image)
+        if stop_event.is_set():
+            return None
+
+        decoded_objects = decode_image(image, enhancement_name, decoders)
+        result = handle_decoded_objects(decoded_objects, enhancement_name, img_path)
+        if enhancement is not None:
+            with attempts_lock:
+                if not stop_event.is_set():
+                    add_enhancement_attempt(
+                        attempts,
+                        enhancement.name,
+                        result is not None,
+                        (time.perf_counter() - started_at) * 1000,
+                    )
+        return result
+
+    pool = get_speculative_pool()
+    futures = {
+        pool.submit(attempt, enhancement): enhancement for enhancement in [None, *enhancement_pipeline]
+    }
+    try:
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                enhancement = futures[future]
+                metrics.inc(
+                    "qr_recognition_success_total",
+                    step=enhancement.name if enhancement else NO_ENHANCEMENT_NAME,
+                    decoder=result["decoder"],
+                )
+                return result
+    finally:
+        with attempts_lock:
+            stop_event.set()
+        for future in futures:
+            future.cancel()
+
+    return None
+
+
+def recognize_image(
+    image: np.ndarray,
+    enhancement_pipeline: list[ImageEnhancement],
+    img_path: str,
+    attempts: EnhancementAttempts,
+    speculative: bool,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+) -> dict[str, str] | None:
+    """
+    Распознавание QR-кода на изображении без улучшений, затем с улучшениями
+    :param attempts: Сюда добавляются результаты применения улучшений (см. EnhancementAttempts)
+    """
+    if speculative:
+        return recognize_speculatively(image, enhancement_pipeline, img_path, attempts, decoders)
 
     # Пробуем распознать без улучшений
-    decoded_objects = decode(original_image)
-    result = handle_decoded_objects(decoded_objects, "Без улучшения", img_path)
+    decoded_objects = decode_image(image, NO_ENHANCEMENT_NAME, decoders)
+    result = handle_decoded_objects(decoded_objects, NO_ENHANCEMENT_NAME, img_path)
     if result:
+        metrics.inc("qr_recognition_success_total", step=NO_ENHANCEMENT_NAME, decoder=result["decoder"])
         return result
 
-    # Пробуем с улучшениями (каждое применяется к оригинальному изображению)
+    # Пробуем с улучшениями (каждое применяется к оригинальному изображению,
+    # общие шаги цепочек улучшений вычисляются один раз)
+    enhancement_cache = EnhancementCache(enhancement_pipeline)
     for enhancement in enhancement_pipeline:
-        enhanced_image = enhancement.enhance(original_image)
-        decoded_objects = decode(enhanced_image)
+        started_at = time.perf_counter()
+        enhanced_image = enhance_image(enhancement_cache, enhancement, image)
+        decoded_objects = decode_image(enhanced_image, enhancement.name, decoders)
 
         result = handle_decoded_objects(decoded_objects, enhancement.name, img_path)
+        add_enhancement_attempt(
+            attempts, enhancement.name, result is not None, (time.perf_counter() - started_at) * 1000
+        )
         if result:
+            metrics.inc("qr_recognition_success_total", step=enhancement.name, decoder=result["decoder"])
             return result
 
-    logger.warning(f"Не удалось распознать QR-код после всех улучшений: {img_path}")
     return None
 
 
+def recognize_located_regions(
+    original_image: np.ndarray,
+    enhancement_pipeline: list[ImageEnhancement],
+    img_path: str,
+    attempts: EnhancementAttempts,
+    speculative: bool,
+    localization: bool,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+) -> dict[str, str] | None:
+    """
+    Распознавание в найденных областях с QR-кодом (localization), затем на кадре целиком.
+    Координаты результата - в координатах всего изображения
+    """
+    # Улучшения дешевле применять к небольшой области с QR-кодом, чем ко всему фото
+    if localization:
+        image_area = original_image.shape[0] * original_image.shape[1]
+        with metrics.timer(STAGE_DURATION_METRIC, stage="localization"):
+            regions = locate_qr_code_regions(
+                original_image,
+                preview_size=settings.RECOGNITION_LOCALIZATION_PREVIEW_SIZE,
+                padding=settings.RECOGNITION_LOCALIZATION_PADDING,
+            )
+        for region in regions:
+            # Область почти во весь кадр - быстрее сразу обработать кадр целиком
+            if region[2] * region[3] > image_area * MAX_REGION_AREA_RATIO:
+                continue
+            result = recognize_image(
+                crop_region(original_image, region),
+                enhancement_pipeline,
+                img_path,
+                attempts,
+                speculative,
+                decoders,
+            )
+            if result:
+                return to_image_coordinates(result, *region[:2])
+
+    return recognize_image(original_image, enhancement_pipeline, img_path, attempts, speculative, decoders)
+
+
+def enhance_and_recognize_qr_code(
+    image_source: str | bytes | memoryview,
+    enhancement_pipeline: list[ImageEnhancement] = qr_code_enhancement_pipeline,
+    img_name: str | None = None,
+    scheduler: AdaptivePipelineScheduler = pipeline_scheduler,
+    speculative: bool = settings.RECOGNITION_SPECULATIVE,
+    localization: bool = settings.RECOGNITION_LOCALIZATION,
+    reduced_resolution: bool = settings.RECOGNITION_REDUCED_RESOLUTION,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+) -> dict[str, str] | None:
+    """
+    Распознавание QR-кода с последовательным применением улучшений
+    (параметры - см. enhance_and_recognize_qr_code_with_status)
+    """
+    result, _ = enhance_and_recognize_qr_code_with_status(
+        image_source,
+        enhancement_pipeline,
+        img_name,
+        scheduler,
+        speculative,
+        localization,
+        reduced_resolution,
+        decoders,
+    )
+    return result
+
+
+def enhance_and_recognize_qr_code_with_status(
+    image_source: str | bytes | memoryview,
+    enhancement_pipeline: list[ImageEnhancement] = qr_code_enhancement_pipeline,
+    img_name: str | None = None,
+    scheduler: AdaptivePipelineScheduler = pipeline_scheduler,
+    speculative: bool = settings.RECOGNITION_SPECULATIVE,
+    localization: bool = settings.RECOGNITION_LOCALIZATION,
+    reduced_resolution: bool = settings.RECOGNITION_REDUCED_RESOLUTION,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+) -> tuple[dict[str, str] | None, bool]:
+    """
+    Распознавание QR-кода с последовательным применением улучшений
+    :param image_source: Путь к файлу или содержимое файла
+    :param enhancement_pipeline: Улучшения изображения
+    :param img_name: Имя изображения для логов и результата (по умолчанию путь к файлу)
+    :param scheduler: Определяет порядок улучшений и собирает статистику по ним
+    :param speculative: Запускать все варианты параллельно (см. recognize_speculatively)
+    :param localization: Сначала искать QR-код и обрабатывать только найденные области
+    :param reduced_resolution: Сначала пробовать уменьшенную копию большого изображения
+    :param decoders: Декодеры QR-кодов (см. decode_image)
+    :return: (результат, окончательный ли он): "QR-код не найден" не окончательный, если scheduler
+    пропустил часть улучшений - такой результат нельзя кэшировать
+    """
+    img_path = img_name or (image_source if isinstance(image_source, str) else "<bytes>")
+
+    # Крупный QR-код на большом фото распознается без загрузки изображения в полном разрешении
+    if reduced_resolution:
+        result = recognize_reduced_image(
+            image_source, img_path, settings.RECOGNITION_REDUCED_TARGET_SIZE_PX, decoders
+        )
+        if result:
+            return result, True
+
+    original_image = load_image(image_source)
+
+    if original_image is None:
+        logger.warning("Ошибка: не удалось загрузить изображение %s", img_path)
+        metrics.inc("qr_recognition_failures_total", reason="load_error")
+        return None, True
+
+    ordered_pipeline = scheduler.order(enhancement_pipeline)
+    all_enhancements_applied = len(ordered_pipeline) == len(enhancement_pipeline)
+    attempts: EnhancementAttempts = {}
+    try:
+        result = recognize_located_regions(
+            original_image, ordered_pipeline, img_path, attempts, speculative, localization, decoders
+        )
+    finally:
+        for enhancement_name, (success, elapsed_ms) in attempts.items():
+            scheduler.record(enhancement_name, success, elapsed_ms)
+    if result:
+        return result, True
+
+    if not all_enhancements_applied:
+        logger.warning("Не удалось распознать QR-код, часть улучшений пропущена: %s", img_path)
+        metrics.inc("qr_recognition_failures_total", reason="not_found_pruned")
+        return None, False
+
+    logger.warning("Не удалось распознать QR-код после всех улучшений: %s", img_path)
+    metrics.inc("qr_recognition_failures_total", reason="not_found")
+    return None, True
+
+
 def parse_qr_data(data: str) -> dict[str, str]:
     """Парсинг данных QR-кода оплаты"""
 
@@ -130,43 +544,59 @@ def parse_qr_data(data: str) -> dict[str, str]:
     return result
 
 
-def get_qr_code_data(file_path: str) -> dict[str, str] | None:
-    qr_content = enhance_and_recognize_qr_code(file_path)
+def get_qr_code_data(
+    file: str | bytes | memoryview,
+    file_name: str | None = None,
+    scheduler: AdaptivePipelineScheduler = pipeline_scheduler,
+) -> QRCodeData | None:
+    """
+    Получение данных QR-кода из файла
+    :param file: Путь к файлу или содержимое файла
+    :param file_name: Имя файла для логов
+    :param scheduler: Определяет порядок улучшений и собирает статистику по ним
+    """
+    qr_code_data_result, _ = get_qr_code_data_with_status(file, file_name, scheduler)
+    return qr_code_data_result
 
-    if not qr_content:
-        logger.warning(f"QR-код не найден в файле: {file_path}")
-        return
 
-    else:
-        if qr_content.get("data").startswith("ST"):
-            return parse_qr_data(qr_content.get("data"))
-        else:
-            # TODO возврат текста "QR код не для оплаты квитаници
-            return qr_content.get("data")
-
-
-# BASE_DIR = r"C:\GIT_PROJECTS\utility_bills_archive\photo_saver_tg_bot\saved_photos\pnv\photo_600.jpg"
-# r = enhance_and_recognize_qr_code(BASE_DIR)
-# print(r)
-# print("---")
-#
-# for k, v in r.items():
-#     print(f"{k}: {v}")
-#
-
-
-# BASE_DIR = r"C:\GIT_PROJECTS\utility_bills_archive\photo_saver_tg_bot\saved_photos"
-# qr_files = [f for f in os.listdir(BASE_DIR)
-#             if os.path.isfile(os.path.join(BASE_DIR, f)) and
-#             f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.tiff'))]
-# # print(qr_files)
-# qr_files_cnt = len(qr_files)
-# for cnt, filename in enumerate(qr_files, 1):
-#     print(f" {cnt}/{qr_files_cnt} Обработка {filename}")
-#
-#     file_path = os.path.join(BASE_DIR, filename)
-#     # r = enhance_and_recognize_qr_code(file_path)
-#     r = get_qr_code_data(file_path)
-#     print(r)
-#
-# print("Fine))")
+def get_qr_code_data_with_status(
+    file: str | bytes | memoryview,
+    file_name: str | None = None,
+    scheduler: AdaptivePipelineScheduler = pipeline_scheduler,
+) -> tuple[QRCodeData | None, bool]:
+    """
+    get_qr_code_data, вместе с результатом возвращается, окончательный ли он
+    (см. enhance_and_recognize_qr_code_with_status)
+    """
+    file_name = file_name or (file if isinstance(file, str) else "<bytes>")
+    qr_content, is_final = enhance_and_recognize_qr_code_with_status(
+        file, img_name=file_name, scheduler=scheduler
+    )
+
+    if not qr_content:
+        logger.warning("QR-код не найден в файле: %s", file_name)
+        return None, is_final
+
+    data = qr_content.get("data")
+    if data is None:
+        # QR-код найден, но его содержимое не удалось декодировать: повторное распознавание не поможет
+        logger.warning("Не удалось декодировать данные QR-кода в файле: %s", file_name)
+        return None, True
+    if data.startswith("ST"):
+        with metrics.timer(STAGE_DURATION_METRIC, stage="parse_qr_data"):
+            return parse_qr_data(data), True
+    # QR-код не для оплаты квитанции: возвращается его текст
+    return data, True
+
+
+def get_qr_code_data_with_metrics(
+    file: str | bytes | memoryview, file_name: str | None = None
+) -> tuple[QRCodeData | None, bool, dict[str, Any]]:
+    """
+    get_qr_code_data для пула процессов: вместе с результатом возвращаются признак окончательного
+    результата (см. get_qr_code_data_with_status) и метрики, накопленные процессом распознавания
+    (см. MetricsRegistry.drain)
+    """
+    with metrics.timer(STAGE_DURATION_METRIC, stage="total"):
+        qr_code_data_result, is_final = get_qr_code_data_with_status(file, file_name)
+    return qr_code_data_result, is_final, metrics.drain()
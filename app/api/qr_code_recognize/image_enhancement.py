@@ -1,11 +1,25 @@
+import threading
 from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import Future
 
 import cv2
 import numpy as np
 
 
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Приводит изображение к одному каналу (оттенки серого), если оно цветное"""
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
 class ImageEnhancement(ABC):
-    """Абстрактный базовый класс для улучшения изображения"""
+    """
+    Абстрактный базовый класс для улучшения изображения.
+    Улучшения работают с изображением в оттенках серого (один канал) и возвращают его же:
+    zbar все равно распознает только яркость, а один канал в 3 раза дешевле по памяти.
+    """
 
     @abstractmethod
     def enhance(self, image: np.ndarray) -> np.ndarray:
@@ -18,6 +32,11 @@ class ImageEnhancement(ABC):
         """Возвращает название улучшения"""
         pass
 
+    @property
+    def steps(self) -> list["ImageEnhancement"]:
+        """Шаги улучшения (для цепочек - несколько)"""
+        return [self]
+
 
 class UpscaleEnhancement(ImageEnhancement):
     """Увеличение размера изображения для улучшения читаемости"""
@@ -26,6 +45,7 @@ class UpscaleEnhancement(ImageEnhancement):
         self.scale_factor = scale_factor
 
     def enhance(self, image: np.ndarray) -> np.ndarray:
+        image = to_grayscale(image)
         new_width = int(image.shape[1] * self.scale_factor)
         new_height = int(image.shape[0] * self.scale_factor)
         return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
@@ -39,12 +59,9 @@ class ContrastEnhancement(ImageEnhancement):
     """Улучшение контрастности изображения"""
 
     def enhance(self, image: np.ndarray) -> np.ndarray:
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        lab_planes = list(cv2.split(lab))
+        # Для серого изображения CLAHE применяется напрямую, без перехода в LAB
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        lab_planes[0] = clahe.apply(lab_planes[0])
-        lab = cv2.merge(lab_planes)
-        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+        return clahe.apply(to_grayscale(image))
 
     @property
     def name(self) -> str:
@@ -56,7 +73,7 @@ class SharpnessEnhancement(ImageEnhancement):
 
     def enhance(self, image: np.ndarray) -> np.ndarray:
         kernel = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
-        return cv2.filter2D(image, -1, kernel)
+        return cv2.filter2D(to_grayscale(image), -1, kernel)
 
     @property
     def name(self) -> str:
@@ -67,9 +84,8 @@ class BinarizationEnhancement(ImageEnhancement):
     """Бинаризация для выделения контуров"""
 
     def enhance(self, image: np.ndarray) -> np.ndarray:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        return cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+        _, binary = cv2.threshold(to_grayscale(image), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
 
     @property
     def name(self) -> str:
@@ -80,8 +96,74 @@ class DenoisingEnhancement(ImageEnhancement):
     """Подавление шумов"""
 
     def enhance(self, image: np.ndarray) -> np.ndarray:
-        return cv2.medianBlur(image, 3)
+        return cv2.medianBlur(to_grayscale(image), 3)
 
     @property
     def name(self) -> str:
         return "Denoising Enhancement"
+
+
+class EnhancementChain(ImageEnhancement):
+    """Последовательное применение нескольких улучшений (например, увеличение, затем бинаризация)"""
+
+    def __init__(self, *enhancements: ImageEnhancement):
+        self.enhancements = [step for enhancement in enhancements for step in enhancement.steps]
+
+    def enhance(self, image: np.ndarray) -> np.ndarray:
+        for enhancement in self.enhancements:
+            image = enhancement.enhance(image)
+        return image
+
+    @property
+    def name(self) -> str:
+        return " -> ".join(enhancement.name for enhancement in self.enhancements)
+
+    @property
+    def steps(self) -> list[ImageEnhancement]:
+        return list(self.enhancements)
+
+
+class EnhancementCache:
+    """
+    Промежуточные результаты улучшений в рамках обработки одного изображения.
+    Сохраняются только результаты, которые понадобятся еще хотя бы одному улучшению
+    (например, Upscale (x2) для Upscale (x2) -> Binarization), чтобы не держать в памяти лишнее.
+    Потокобезопасен: если шаг уже вычисляется в другом потоке, результат ожидается, а не считается заново.
+    """
+
+    def __init__(self, enhancement_pipeline: list[ImageEnhancement]):
+        self._usages: Counter[tuple[str, ...]] = Counter()
+        for enhancement in enhancement_pipeline:
+            names = tuple(step.name for step in enhancement.steps)
+            for i in range(1, len(names) + 1):
+                self._usages[names[:i]] += 1
+        self._results: dict[tuple[str, ...], Future[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def enhance(self, enhancement: ImageEnhancement, image: np.ndarray) -> np.ndarray:
+        """Применяет улучшение, переиспользуя уже вычисленные шаги"""
+        key: tuple[str, ...] = ()
+        for step in enhancement.steps:
+            key = (*key, step.name)
+            with self._lock:
+                result = self._results.get(key)
+                is_owner = result is None
+                if result is None:
+                    result = Future()
+                    if self._usages[key] > 1:
+                        self._results[key] = result
+
+            if is_owner:
+                try:
+                    result.set_result(step.enhance(image))
+                except BaseException as e:
+                    result.set_exception(e)
+                    raise
+            image = result.result()
+
+            with self._lock:
+                self._usages[key] -= 1
+                # Больше никому не нужен - освобождаем память
+                if self._usages[key] <= 0:
+                    self._results.pop(key, None)
+        return image
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, Column, Index
+from sqlmodel import Field, SQLModel
+
+
+# Таблица очереди задач распознавания (см. recognition_job_queue.RecognitionJobQueue)
+class RecognitionJob(SQLModel, table=True):
+    __tablename__ = "recognition_job"
+    __table_args__ = (Index("ix_recognition_job_queue", "status", "priority", "created_at"),)
+
+    id: str = Field(primary_key=True)
+    file_id: str
+    file_path: str
+    file_name: str | None = None
+    status: str = "queued"  # queued, running, done, failed
+    priority: int = 0  # Задачи с большим приоритетом выполняются раньше
+    attempts: int = 0
+    result: Any = Field(default=None, sa_column=Column(JSON))
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    available_at: datetime  # Повторная попытка не раньше этого времени
+    # Обработчик, выполняющий задачу, и срок, до которого он ее удерживает (продлевается во время выполнения).
+    # Задачу с истекшим сроком (процесс остановлен или завис) может взять другой обработчик
+    owner: str | None = None
+    lease_expires_at: datetime | None = None
+
+
+# Модель только для Pydantic (без таблицы в БД)
+class RecognitionJobStatus(SQLModel):
+    job_id: str
+    file_id: str
+    file_name: str | None
+    status: str
+    attempts: int
+    qr_code_data_result: Any = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,149 @@
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any, NamedTuple, cast
+
+import cv2
+import numpy as np
+from pyzbar.pyzbar import decode  # type: ignore
+
+from app.logger import logger
+
+
+class DecodedObject(NamedTuple):
+    """Распознанный код (поля как у pyzbar.pyzbar.Decoded) и имя распознавшего его декодера"""
+
+    data: bytes
+    type: str
+    rect: tuple[int, int, int, int]
+    polygon: list[tuple[int, int]]
+    quality: int
+    orientation: str | None
+    decoder: str
+
+
+class QRCodeDecoder(ABC):
+    """
+    Абстрактный базовый класс для декодера QR-кодов.
+    Декодеры получают изображение в оттенках серого (как и улучшения ImageEnhancement)
+    и возвращают все найденные на нем коды.
+    """
+
+    @abstractmethod
+    def decode(self, image: np.ndarray) -> list[DecodedObject]:
+        """Распознает коды на изображении"""
+        pass
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Возвращает название декодера"""
+        pass
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Поддерживается ли декодер установленными библиотеками"""
+        return True
+
+
+class PyzbarDecoder(QRCodeDecoder):
+    """Распознавание zbar"""
+
+    def decode(self, image: np.ndarray) -> list[DecodedObject]:
+        return [
+            DecodedObject(
+                data=obj.data,
+                type=obj.type,
+                rect=tuple(obj.rect),
+                polygon=[tuple(point) for point in obj.polygon],
+                quality=obj.quality,
+                orientation=obj.orientation,
+                decoder=self.name,
+            )
+            for obj in decode(image)
+        ]
+
+    @property
+    def name(self) -> str:
+        return "pyzbar"
+
+
+class OpenCVDecoder(QRCodeDecoder):
+    """
+    Распознавание cv2.QRCodeDetector: лучше zbar справляется с мелкими плотными кодами,
+    для которых иначе требуется увеличение изображения
+    """
+
+    def __init__(self) -> None:
+        # Детектор хранит состояние между вызовами, поэтому у каждого потока свой
+        self._local = threading.local()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        # Данные в байтах есть начиная с OpenCV 4.11. detectAndDecodeMulti возвращает уже
+        # преобразованный в строку текст, по которому не определить двойное кодирование CP1251
+        return hasattr(cv2.QRCodeDetector, "detectAndDecodeBytesMulti")
+
+    def _get_detector(self) -> cv2.QRCodeDetector:
+        if not hasattr(self._local, "detector"):
+            self._local.detector = cv2.QRCodeDetector()
+        return cast(cv2.QRCodeDetector, self._local.detector)
+
+    def _detect_and_decode(self, image: np.ndarray) -> tuple[list[bytes], Any]:
+        found, data, points, _ = self._get_detector().detectAndDecodeBytesMulti(image)
+        if not found or points is None:
+            return [], None
+        return list(data), points
+
+    def decode(self, image: np.ndarray) -> list[DecodedObject]:
+        try:
+            data, points = self._detect_and_decode(image)
+        except cv2.error:
+            return []
+
+        corners_list = np.asarray(points, dtype=np.float32)
+        # Углы есть не у всех сборок OpenCV и не для всех найденных кодов
+        if corners_list.size != len(data) * 8:
+            corners_list = np.zeros((len(data), 4, 2), dtype=np.float32)
+        corners_list = corners_list.reshape(-1, 4, 2)
+
+        decoded_objects = []
+        # Найденные, но не декодированные коды возвращаются с пустыми данными
+        for qr_data, corners in zip(data, corners_list, strict=True):
+            if not qr_data:
+                continue
+            x, y, w, h = cv2.boundingRect(corners)
+            decoded_objects.append(
+                DecodedObject(
+                    data=bytes(qr_data),
+                    type="QRCODE",
+                    rect=(x, y, w, h),
+                    polygon=[(int(point_x), int(point_y)) for point_x, point_y in corners],
+                    quality=1,
+                    orientation=None,
+                    decoder=self.name,
+                )
+            )
+        return decoded_objects
+
+    @property
+    def name(self) -> str:
+        return "opencv"
+
+
+QR_CODE_DECODERS: dict[str, type[QRCodeDecoder]] = {
+    "pyzbar": PyzbarDecoder,
+    "opencv": OpenCVDecoder,
+}
+
+
+def get_qr_code_decoders(names: Sequence[str]) -> list[QRCodeDecoder]:
+    """Декодеры в заданном порядке (кроме не поддерживаемых установленными библиотеками)"""
+    decoders = []
+    for name in names:
+        decoder_class = QR_CODE_DECODERS[name]
+        if not decoder_class.is_available():
+            logger.warning("Декодер QR-кодов %s не поддерживается установленной версией библиотеки", name)
+            continue
+        decoders.append(decoder_class())
+    return decoders
@@ -1,7 +1,42 @@
-from app.api.qr_code_recognize.image_enhancement import BinarizationEnhancement, UpscaleEnhancement
+import hashlib
 
-qr_code_enhancement_pipeline = [
+from app.api.qr_code_recognize.image_enhancement import (
+    BinarizationEnhancement,
+    EnhancementChain,
+    ImageEnhancement,
+    UpscaleEnhancement,
+)
+from app.api.qr_code_recognize.qr_code_decoder import QRCodeDecoder, get_qr_code_decoders
+from app.core.config import settings
+
+# Увеличивать при изменении алгоритма распознавания или разбора данных QR-кода
+QR_CODE_RECOGNITION_VERSION = 1
+
+qr_code_enhancement_pipeline: list[ImageEnhancement] = [
     BinarizationEnhancement(),
     UpscaleEnhancement(scale_factor=2.0),
     UpscaleEnhancement(scale_factor=4.0),
 ]
+if settings.RECOGNITION_UPSCALED_BINARIZATION:
+    # Увеличенное изображение берется готовым из шага Upscale (x2).
+    # Отпечаток распознавания включает имена улучшений, поэтому кэш с шагом и без него не смешивается
+    qr_code_enhancement_pipeline.insert(
+        2, EnhancementChain(UpscaleEnhancement(scale_factor=2.0), BinarizationEnhancement())
+    )
+
+qr_code_decoders = get_qr_code_decoders(settings.RECOGNITION_DECODERS)
+
+
+def get_pipeline_fingerprint(
+    enhancement_pipeline: list[ImageEnhancement] = qr_code_enhancement_pipeline,
+    decoders: list[QRCodeDecoder] = qr_code_decoders,
+) -> str:
+    """Отпечаток версии распознавания, набора улучшений и декодеров (для ключей кэша)"""
+    description = "|".join(
+        [
+            str(QR_CODE_RECOGNITION_VERSION),
+            *(e.name for e in enhancement_pipeline),
+            *(d.name for d in decoders),
+        ]
+    )
+    return hashlib.blake2b(description.encode("utf-8"), digest_size=8).hexdigest()
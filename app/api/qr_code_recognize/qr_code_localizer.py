@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from app.logger import logger
+
+# Область QR-кода в координатах исходного изображения: x, y, ширина, высота
+Region = tuple[int, int, int, int]
+
+
+def locate_qr_code_regions(
+    image: np.ndarray, preview_size: int = 1200, padding: float = 0.25
+) -> list[Region]:
+    """
+    Поиск областей с QR-кодами на уменьшенной копии изображения
+    :param image: Изображение в оттенках серого
+    :param preview_size: Размер большей стороны уменьшенной копии
+    :param padding: Отступ вокруг найденной области (доля от ее размера)
+    :return: Найденные области в координатах исходного изображения
+    """
+    height, width = image.shape[:2]
+    scale = min(preview_size / max(height, width), 1.0)
+    preview = (
+        image if scale == 1.0 else cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    )
+
+    detector = cv2.QRCodeDetector()
+    try:
+        found, points = detector.detectMulti(preview)
+        if not found:
+            # detect находит одиночный код в случаях, когда detectMulti не справляется
+            found, points = detector.detect(preview)
+    except cv2.error as e:
+        logger.warning("Ошибка поиска QR-кода: %s", e)
+        return []
+
+    if not found or points is None:
+        return []
+
+    regions = []
+    for corners in np.asarray(points).reshape(-1, 4, 2) / scale:
+        x_min, y_min = corners.min(axis=0)
+        x_max, y_max = corners.max(axis=0)
+        pad_x, pad_y = (x_max - x_min) * padding, (y_max - y_min) * padding
+
+        x_min, y_min = max(int(x_min - pad_x), 0), max(int(y_min - pad_y), 0)
+        x_max, y_max = min(int(x_max + pad_x), width), min(int(y_max + pad_y), height)
+        if x_max > x_min and y_max > y_min:
+            regions.append((x_min, y_min, x_max - x_min, y_max - y_min))
+
+    return regions
+
+
+def crop_region(image: np.ndarray, region: Region) -> np.ndarray:
+    """Вырезает область изображения (без копирования данных)"""
+    x, y, w, h = region
+    return image[y : y + h, x : x + w]
@@ -0,0 +1,159 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from app.core.config import settings
+from app.logger import logger
+
+# Как часто (в записях) из SQLite удаляются истекшие и лишние сверх disk_max_size результаты
+DISK_PRUNE_EVERY_WRITES = 100
+
+
+def get_recognition_cache_key(content_hash: str) -> str:
+    """Ключ кэша: хэш изображения + отпечаток алгоритма распознавания"""
+    # Модули распознавания (cv2, pyzbar) загружаются при первом обращении, а не при импорте приложения
+    from app.api.qr_code_recognize.qr_code_enhancer import get_pipeline_fingerprint
+
+    return f"{content_hash}:{get_pipeline_fingerprint()}"
+
+
+class RecognitionCache:
+    """
+    Кэш результатов распознавания QR-кодов.
+    Первый уровень - LRU в памяти с ограничением размера и TTL, второй (опционально) - SQLite
+    с ограничением количества записей disk_max_size (вытесняются самые старые).
+    Сохраняются и найденные данные, и результат "QR-код не найден" (None).
+    """
+
+    def __init__(
+        self, max_size: int, ttl_sec: float, db_path: Path | None = None, disk_max_size: int = 1_000_000
+    ):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self.disk_max_size = disk_max_size
+
+        self._items: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recognition_cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_recognition_cache_created_at ON recognition_cache (created_at)"
+            )
+            self._prune_disk()
+            self._db.commit()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_sec
+
+    def _memory_set(self, key: str, created_at: float, value: Any) -> None:
+        self._items[key] = (created_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def _disk_get(self, key: str) -> tuple[float, Any] | None:
+        with self._db_lock:
+            row = self._db.execute(  # type: ignore[union-attr]
+                "SELECT created_at, value FROM recognition_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], orjson.loads(row[1])
+
+    def _prune_disk(self) -> None:
+        """Удаление истекших результатов и самых старых сверх disk_max_size (под _db_lock или при создании)"""
+        self._db.execute(  # type: ignore[union-attr]
+            "DELETE FROM recognition_cache WHERE created_at < ?", (time.time() - self.ttl_sec,)
+        )
+        self._db.execute(  # type: ignore[union-attr]
+            "DELETE FROM recognition_cache WHERE key IN "
+            "(SELECT key FROM recognition_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_size,),
+        )
+
+    def _disk_set(self, key: str, created_at: float, value: Any) -> None:
+        with self._db_lock:
+            self._db.execute(  # type: ignore[union-attr]
+                "INSERT OR REPLACE INTO recognition_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, orjson.dumps(value), created_at),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % DISK_PRUNE_EVERY_WRITES == 0:
+                self._prune_disk()
+            self._db.commit()  # type: ignore[union-attr]
+
+    async def get(self, key: str) -> tuple[bool, Any]:
+        """
+        Поиск результата в кэше
+        :return: (найден ли результат, результат)
+        """
+        item = self._items.get(key)
+        if item is not None and not self._is_expired(item[0]):
+            self._items.move_to_end(key)
+            self.hits += 1
+            return True, item[1]
+
+        if self._db is not None:
+            item = await asyncio.to_thread(self._disk_get, key)
+            if item is not None and not self._is_expired(item[0]):
+                self._memory_set(key, *item)
+                self.hits += 1
+                self.disk_hits += 1
+                return True, item[1]
+
+        self._items.pop(key, None)
+        self.misses += 1
+        return False, None
+
+    async def set(self, key: str, value: Any) -> None:
+        created_at = time.time()
+        self._memory_set(key, created_at, value)
+        if self._db is not None:
+            try:
+                await asyncio.to_thread(self._disk_set, key, created_at, value)
+            except sqlite3.Error as e:
+                logger.warning("Не удалось сохранить результат распознавания в кэш: %s", e)
+
+    def clear(self) -> None:
+        self._items.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM recognition_cache")
+                self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "enabled": settings.RECOGNITION_CACHE_ENABLED,
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+
+recognition_cache = RecognitionCache(
+    max_size=settings.RECOGNITION_CACHE_MAX_SIZE,
+    ttl_sec=settings.RECOGNITION_CACHE_TTL_SEC,
+    db_path=settings.RECOGNITION_CACHE_DB_PATH,
+    disk_max_size=settings.RECOGNITION_CACHE_DB_MAX_SIZE,
+)
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Any
+
+from app.api.qr_code_recognize.recognition_worker import init_recognition_worker, warm_up_recognition_worker
+from app.core.config import settings
+from app.core.load_monitor import load_monitor
+from app.core.metrics import metrics
+from app.logger import get_process_log_queue, logger
+
+
+class RecognitionExecutorBusyError(Exception):
+    """Все процессы заняты и очередь распознавания заполнена"""
+
+
+class RecognitionExecutor:
+    """
+    Пул процессов для распознавания QR-кодов вне event loop.
+    Число одновременно принятых задач ограничено: max_workers выполняются, max_queue_size ждут.
+    initializer выполняется в каждом процессе при его запуске (прогрев, см. warm_up).
+    Очередь лога основного процесса передается процессам явно, поэтому mp_context может быть любым.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue_size: int,
+        timeout: float,
+        initializer: Callable[[], None] | None = None,
+        mp_context: BaseContext | None = None,
+    ):
+        self.max_workers = max(max_workers, 1)
+        self.max_queue_size = max(max_queue_size, 0)
+        self.timeout = timeout
+        self.initializer = initializer
+        self.mp_context = mp_context
+
+        self._pool: ProcessPoolExecutor | None = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue_size
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self.mp_context,
+                initializer=init_recognition_worker,
+                initargs=(get_process_log_queue(), self.initializer),
+            )
+            logger.info(
+                f"Запущен пул распознавания: {self.max_workers} процессов, очередь {self.max_queue_size}"
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+            logger.info("Пул распознавания остановлен")
+
+    async def warm_up(self) -> None:
+        """
+        Запуск всех процессов пула заранее: каждый выполняет initializer до первой задачи.
+        Пустые задачи не учитываются в in_flight и не занимают очередь распознавания
+        """
+        self.start()
+        futures = [self._pool.submit(os.getpid) for _ in range(self.max_workers)]  # type: ignore[union-attr]
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+    def _release(self, _: Future[Any]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет func(*args) в пуле процессов
+        :raises RecognitionExecutorBusyError: очередь заполнена
+        :raises TimeoutError: задача не уложилась в timeout
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise RecognitionExecutorBusyError("Очередь распознавания заполнена")
+            self._in_flight += 1
+
+        try:
+            self.start()
+            future = self._pool.submit(func, *args)  # type: ignore[union-attr]
+        except Exception:
+            self._release(Future())
+            raise
+
+        # Слот освобождается только когда процесс действительно закончил работу,
+        # даже если клиент уже получил ответ по таймауту
+        future.add_done_callback(self._release)
+
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+
+
+recognition_executor = RecognitionExecutor(
+    max_workers=settings.RECOGNITION_MAX_WORKERS,
+    max_queue_size=settings.RECOGNITION_MAX_QUEUE_SIZE,
+    timeout=settings.RECOGNITION_TIMEOUT_SEC,
+    initializer=warm_up_recognition_worker if settings.RECOGNITION_WARM_UP else None,
+)
+metrics.register_gauge("qr_recognition_in_flight", lambda: recognition_executor.in_flight)
+load_monitor.register_queue(
+    "recognition", lambda: recognition_executor.in_flight, recognition_executor.capacity
+)
@@ -0,0 +1,322 @@
+"""
+Очередь задач распознавания в SQLite (без внешнего брокера): задачи переживают перезапуск приложения.
+Задачи выбираются по приоритету, затем по времени создания; неудачные попытки повторяются
+с экспоненциально растущей задержкой.
+Очередь может обрабатываться несколькими процессами: задача захватывается условным UPDATE
+и удерживается обработчиком на срок lease_sec, который продлевается, пока задача выполняется.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, cast
+from uuid import uuid4
+
+from sqlalchemy import CursorResult, Engine, and_, delete, or_, update
+from sqlalchemy import inspect as sa_inspect
+from sqlmodel import Session, col, select
+
+from app.api.qr_code_recognize.models import RecognitionJob
+from app.core.db import create_sqlite_engine
+from app.logger import logger
+
+
+class RecognitionJobRetryLaterError(Exception):
+    """Задачу нужно повторить позже, не считая это неудачной попыткой (например, пул распознавания занят)"""
+
+
+def add_missing_lease_columns(engine: Engine) -> None:
+    """Добавление колонок owner и lease_expires_at в таблицу, созданную до их появления"""
+    with engine.begin() as connection:
+        columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(recognition_job)")}
+        for column, column_type in (("owner", "VARCHAR"), ("lease_expires_at", "DATETIME")):
+            if column not in columns:
+                connection.exec_driver_sql(f"ALTER TABLE recognition_job ADD COLUMN {column} {column_type}")
+
+
+class RecognitionJobQueue:
+    def __init__(
+        self, db_path: Path, max_attempts: int = 3, retry_delay_sec: float = 5.0, lease_sec: float = 60.0
+    ):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay_sec = retry_delay_sec
+        self.lease_sec = lease_sec
+        # Идентификатор обработчиков этого экземпляра очереди (процесса)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+        self._engine: Engine | None = None
+        # Потоки одного процесса не соревнуются за одну задачу (между процессами - условный UPDATE)
+        self._lock = threading.Lock()
+        # Ожидающие завершения задач (long polling) и обработчики, ждущие новых задач
+        self._finished_events: dict[str, asyncio.Event] = {}
+        self._new_job_event: asyncio.Event | None = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            engine = create_sqlite_engine(self.db_path, tables=[sa_inspect(RecognitionJob).local_table])
+            add_missing_lease_columns(engine)
+            self._engine = engine
+        return self._engine
+
+    def _enqueue(self, file_id: str, file_path: str, file_name: str | None, priority: int) -> RecognitionJob:
+        now = datetime.now(UTC)
+        job = RecognitionJob(
+            id=str(uuid4()),
+            file_id=file_id,
+            file_path=file_path,
+            file_name=file_name,
+            priority=priority,
+            created_at=now,
+            updated_at=now,
+            available_at=now,
+        )
+        with Session(self.engine) as session:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        return job
+
+    async def enqueue(
+        self, file_id: str, file_path: str, file_name: str | None = None, priority: int = 0
+    ) -> RecognitionJob:
+        """Добавление задачи (запись в БД до возврата: принятая задача не теряется при перезапуске)"""
+        job = await asyncio.to_thread(self._enqueue, file_id, file_path, file_name, priority)
+        if self._new_job_event is not None:
+            self._new_job_event.set()
+        return job
+
+    def claim(self) -> RecognitionJob | None:
+        """
+        Выбор следующей задачи с переводом ее в статус running. Задача в статусе running с истекшим
+        сроком удержания (обработчик остановлен) выбирается повторно, прерванное выполнение считается попыткой
+        """
+        with self._lock, Session(self.engine) as session:
+            while True:
+                now = datetime.now(UTC)
+                claimable = or_(
+                    and_(col(RecognitionJob.status) == "queued", col(RecognitionJob.available_at) <= now),
+                    and_(col(RecognitionJob.status) == "running", col(RecognitionJob.lease_expires_at) < now),
+                )
+                job_id = session.exec(
+                    select(RecognitionJob.id)
+                    .where(claimable)
+                    .order_by(col(RecognitionJob.priority).desc(), col(RecognitionJob.created_at))
+                    .limit(1)
+                ).first()
+                if job_id is None:
+                    return None
+
+                # Задачу мог захватить другой процесс между чтением и изменением: тогда выбирается следующая
+                result = cast(
+                    CursorResult[Any],
+                    session.execute(
+                        update(RecognitionJob)
+                        .where(col(RecognitionJob.id) == job_id, claimable)
+                        .values(
+                            status="running",
+                            attempts=col(RecognitionJob.attempts) + 1,
+                            owner=self.owner,
+                            lease_expires_at=now + timedelta(seconds=self.lease_sec),
+                            updated_at=now,
+                        )
+                    ),
+                )
+                session.commit()
+                if result.rowcount == 1:
+                    return session.get(RecognitionJob, job_id)
+
+    def renew_lease(self, job_id: str) -> bool:
+        """
+        Продление срока удержания выполняемой задачи
+        :return: Удерживает ли задачу этот обработчик (False - срок истек и задачу взял другой)
+        """
+        with Session(self.engine) as session:
+            result = cast(
+                CursorResult[Any],
+                session.execute(
+                    update(RecognitionJob)
+                    .where(
+                        col(RecognitionJob.id) == job_id,
+                        col(RecognitionJob.status) == "running",
+                        col(RecognitionJob.owner) == self.owner,
+                    )
+                    .values(lease_expires_at=datetime.now(UTC) + timedelta(seconds=self.lease_sec))
+                ),
+            )
+            session.commit()
+        return result.rowcount == 1
+
+    def _finish(self, job_id: str, **values: Any) -> None:
+        # Результат обработчика, у которого задачу забрали по истечении срока, не сохраняется
+        with Session(self.engine) as session:
+            session.execute(
+                update(RecognitionJob)
+                .where(
+                    col(RecognitionJob.id) == job_id,
+                    col(RecognitionJob.status) == "running",
+                    col(RecognitionJob.owner) == self.owner,
+                )
+                .values(updated_at=datetime.now(UTC), owner=None, lease_expires_at=None, **values)
+            )
+            session.commit()
+
+    def complete(self, job_id: str, result: Any) -> None:
+        self._finish(job_id, status="done", result=result, error=None)
+
+    def fail(self, job: RecognitionJob, error: str) -> bool:
+        """
+        Неудачная попытка: задача возвращается в очередь с задержкой или, если попытки закончились,
+        завершается со статусом failed
+        :return: Будет ли задача повторена
+        """
+        if job.attempts >= self.max_attempts:
+            self._finish(job.id, status="failed", error=error)
+            return False
+        delay = timedelta(seconds=self.retry_delay_sec * 2 ** (job.attempts - 1))
+        self._finish(job.id, status="queued", error=error, available_at=datetime.now(UTC) + delay)
+        return True
+
+    def retry_later(self, job: RecognitionJob, delay_sec: float) -> None:
+        """Возврат задачи в очередь без учета попытки"""
+        self._finish(
+            job.id,
+            status="queued",
+            attempts=job.attempts - 1,
+            available_at=datetime.now(UTC) + timedelta(seconds=delay_sec),
+        )
+
+    def delete_finished(self, ttl_sec: float) -> int:
+        """Удаление завершенных (done, failed) задач, которые не изменялись дольше ttl_sec"""
+        with Session(self.engine) as session:
+            result = cast(
+                CursorResult[Any],
+                session.execute(
+                    delete(RecognitionJob).where(
+                        col(RecognitionJob.status).in_(("done", "failed")),
+                        col(RecognitionJob.updated_at) < datetime.now(UTC) - timedelta(seconds=ttl_sec),
+                    )
+                ),
+            )
+            deleted = result.rowcount
+            session.commit()
+        if deleted:
+            logger.info("Удалено завершенных задач распознавания: %s", deleted)
+        return deleted
+
+    def _get(self, job_id: str) -> RecognitionJob | None:
+        with Session(self.engine) as session:
+            return session.get(RecognitionJob, job_id)
+
+    async def get(self, job_id: str, wait_sec: float = 0) -> RecognitionJob | None:
+        """
+        Состояние задачи; если задача еще не завершена, ожидание завершения до wait_sec секунд
+        """
+        # Событие создается до чтения задачи, чтобы не пропустить завершение между чтением и ожиданием
+        finished = self._finished_events.setdefault(job_id, asyncio.Event()) if wait_sec > 0 else None
+        job = await asyncio.to_thread(self._get, job_id)
+        if job is None or job.status in ("done", "failed") or finished is None:
+            if finished is not None and not finished.is_set():
+                self._finished_events.pop(job_id, None)
+            return job
+
+        try:
+            await asyncio.wait_for(finished.wait(), timeout=wait_sec)
+        except TimeoutError:
+            pass
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def _renew_lease_periodically(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_sec / 3)
+            try:
+                if not await asyncio.to_thread(self.renew_lease, job_id):
+                    logger.warning("Задача распознавания %s передана другому обработчику", job_id)
+                    return
+            except Exception as e:
+                logger.warning("Не удалось продлить задачу распознавания %s: %s", job_id, e)
+
+    async def _process(
+        self, job: RecognitionJob, handler: Callable[[RecognitionJob], Awaitable[Any]]
+    ) -> None:
+        lease_task = asyncio.create_task(self._renew_lease_periodically(job.id))
+        try:
+            try:
+                result = await handler(job)
+            finally:
+                lease_task.cancel()
+        except RecognitionJobRetryLaterError:
+            await asyncio.to_thread(self.retry_later, job, self.retry_delay_sec)
+            return
+        except Exception as e:
+            logger.warning("Ошибка задачи распознавания %s (попытка %s): %s", job.id, job.attempts, e)
+            if await asyncio.to_thread(self.fail, job, str(e) or e.__class__.__name__):
+                return
+        else:
+            await asyncio.to_thread(self.complete, job.id, result)
+
+        finished = self._finished_events.pop(job.id, None)
+        if finished is not None:
+            finished.set()
+
+    async def _fail_after_error(self, job: RecognitionJob, error: Exception) -> None:
+        """Учет неудачной попытки задачи, обработку которой прервала ошибка очереди"""
+        try:
+            await asyncio.to_thread(self.fail, job, str(error) or error.__class__.__name__)
+        except Exception as e:
+            # Задача останется в статусе running и будет выбрана снова по истечении срока удержания
+            logger.error("Не удалось вернуть задачу распознавания %s в очередь: %s", job.id, e)
+
+    async def run_worker(
+        self, handler: Callable[[RecognitionJob], Awaitable[Any]], poll_interval_sec: float = 1.0
+    ) -> None:
+        """
+        Обработчик очереди: выполняет задачи по одной. Новые задачи будят обработчик сразу,
+        отложенные повторы находятся опросом раз в poll_interval_sec.
+        Ошибки работы с очередью (например, БД заблокирована или результат не сохраняется в JSON)
+        не останавливают обработчик: задача, которую не удалось завершить, считается неудачной попыткой
+        """
+        if self._new_job_event is None:
+            self._new_job_event = asyncio.Event()
+
+        while True:
+            job = None
+            try:
+                job = await asyncio.to_thread(self.claim)
+                if job is not None:
+                    await self._process(job, handler)
+                    continue
+            except Exception as e:
+                logger.error("Ошибка обработчика очереди распознавания: %s", e)
+                if job is not None:
+                    await self._fail_after_error(job, e)
+                await asyncio.sleep(poll_interval_sec)
+                continue
+
+            self._new_job_event.clear()
+            try:
+                await asyncio.wait_for(self._new_job_event.wait(), timeout=poll_interval_sec)
+            except TimeoutError:
+                pass
+
+    async def delete_finished_periodically(self, ttl_sec: float, interval_sec: float) -> None:
+        """Фоновая задача удаления старых завершенных задач"""
+        while True:
+            try:
+                await asyncio.to_thread(self.delete_finished, ttl_sec)
+            except Exception as e:
+                logger.warning("Ошибка удаления завершенных задач распознавания: %s", e)
+            await asyncio.sleep(interval_sec)
+
+    def close(self) -> None:
+        # События привязаны к циклу событий, в котором работали обработчики
+        self._new_job_event = None
+        self._finished_events.clear()
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
@@ -0,0 +1,88 @@
+"""
+Функции, выполняемые в процессах пула распознавания.
+Модули распознавания (cv2, numpy, pyzbar) импортируются при первом вызове, а не при импорте
+приложения: так быстрее запускаются воркеры uvicorn, тесты и процессы, которым распознавание не нужно.
+"""
+
+import logging
+import multiprocessing
+import multiprocessing.util
+import sys
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from app.logger import logger, use_process_log_queue
+
+if TYPE_CHECKING:
+    from app.api.qr_code_recognize.enhance_and_recognize_qr_code import QRCodeData
+
+WARM_UP_QR_CODE_DATA = "warm-up"
+# Выполняется до остановки передачи записей лога основному процессу (у очереди лога приоритет -5)
+SAVE_PIPELINE_STATS_EXIT_PRIORITY = 10
+
+
+def recognize_qr_code_data(
+    file: str | bytes | memoryview, file_name: str | None = None
+) -> tuple["QRCodeData | None", bool, dict[str, Any]]:
+    """Распознавание с метриками процесса (см. get_qr_code_data_with_metrics)"""
+    from app.api.qr_code_recognize.enhance_and_recognize_qr_code import get_qr_code_data_with_metrics
+
+    return get_qr_code_data_with_metrics(file, file_name)
+
+
+def init_recognition_worker(
+    log_queue: "multiprocessing.Queue[logging.LogRecord] | None",
+    initializer: Callable[[], None] | None = None,
+) -> None:
+    """
+    Initializer пула распознавания: записи лога передаются основному процессу через log_queue
+    (не зависит от способа запуска процессов), при завершении процесса сохраняется статистика
+    улучшений, затем выполняется initializer (например, прогрев)
+    """
+    use_process_log_queue(log_queue)
+    # atexit в процессах multiprocessing не выполняется, выполняются только финализаторы
+    multiprocessing.util.Finalize(None, save_pipeline_stats, exitpriority=SAVE_PIPELINE_STATS_EXIT_PRIORITY)
+    if initializer is not None:
+        initializer()
+
+
+def save_pipeline_stats() -> None:
+    """Сохранение замеров, накопленных процессом после последнего сохранения (см. SAVE_EVERY_RECORDS)"""
+    # Процесс, который ничего не распознавал, не загружал модули распознавания и ничего не сохраняет
+    adaptive_pipeline = sys.modules.get("app.api.qr_code_recognize.adaptive_pipeline")
+    if adaptive_pipeline is not None:
+        adaptive_pipeline.pipeline_scheduler.save()
+
+
+def warm_up_recognition_worker() -> None:
+    """
+    Прогрев процесса распознавания (initializer пула): импорт модулей распознавания
+    и распознавание маленького синтетического QR-кода каждым декодером, чтобы первый запрос
+    не тратил время на загрузку библиотек и первичные выделения памяти
+    """
+    started_at = time.perf_counter()
+    try:
+        import cv2
+
+        from app.api.qr_code_recognize.qr_code_enhancer import qr_code_decoders
+
+        qr_code = cv2.QRCodeEncoder.create().encode(WARM_UP_QR_CODE_DATA)
+        qr_code = cv2.copyMakeBorder(
+            cv2.resize(qr_code, None, fx=4, fy=4, interpolation=cv2.INTER_NEAREST),
+            16,
+            16,
+            16,
+            16,
+            cv2.BORDER_CONSTANT,
+            value=255,
+        )
+        # Загрузка кодеков изображений
+        cv2.imdecode(cv2.imencode(".jpg", qr_code)[1], cv2.IMREAD_GRAYSCALE)
+        for decoder in qr_code_decoders:
+            decoder.decode(qr_code)
+    except Exception as e:
+        # Процесс остается рабочим: модули загрузятся при первом распознавании
+        logger.warning("Ошибка прогрева процесса распознавания: %s", e)
+        return
+    logger.debug("Процесс распознавания прогрет за %.3f с", time.perf_counter() - started_at)
@@ -1,9 +1,11 @@
 from datetime import datetime
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Response, status
 
-from app.api.system_api.health_check.models import HealthCheck
+from app.api.system_api.health_check.models import HealthCheck, ReadinessCheck
 from app.core.config import settings
+from app.core.load_monitor import load_monitor
+from app.core.startup import startup_state
 from app.logger import logger
 
 health_check_router = APIRouter()
@@ -25,3 +27,28 @@ async def health_check_detailed() -> HealthCheck:
     }
     logger.info(f"{health_data}")
     return HealthCheck(**health_data)
+
+
+@health_check_router.get(
+    "/health/ready",
+    response_model=ReadinessCheck,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadinessCheck}},
+    summary="Проверка готовности к приему запросов",
+    description="503, если воркер перегружен (задержка event loop, заполненность очереди распознавания)",
+)
+async def health_check_ready(response: Response) -> ReadinessCheck:
+    overload_reasons = load_monitor.get_overload_reasons()
+    if overload_reasons:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return ReadinessCheck(
+        status="OVERLOADED" if overload_reasons else "OK",
+        environment=settings.ENVIRONMENT,
+        version=settings.VERSION,
+        timestamp=datetime.now(),
+        overload_reasons=overload_reasons,
+        event_loop_lag_ms=round(load_monitor.event_loop_lag_sec * 1000, 1),
+        in_flight_requests=load_monitor.in_flight,
+        queues=load_monitor.get_queue_depths(),
+        recognition_warmed_up=startup_state.warmed_up,
+    )
@@ -10,3 +10,13 @@ class HealthCheck(SQLModel):
     version: str
     timestamp: datetime
     # database_status: Optional[str] = None
+
+
+class ReadinessCheck(HealthCheck):
+    """Готовность воркера принимать запросы: status OVERLOADED и причины, если воркер перегружен"""
+
+    overload_reasons: list[str]
+    event_loop_lag_ms: float
+    in_flight_requests: dict[str, int]
+    queues: dict[str, dict[str, int]]
+    recognition_warmed_up: bool
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Метрики приложения в формате Prometheus",
+    description="Длительность этапов распознавания, улучшения, давшие результат, ошибки, объем сохраненных файлов",
+)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, status
+
+from app.api.qr_code_recognize.recognition_cache import recognition_cache
+from app.api.system_api.recognition_cache.models import RecognitionCacheStats
+
+recognition_cache_router = APIRouter()
+
+
+@recognition_cache_router.get(
+    "/recognition-cache/stats",
+    response_model=RecognitionCacheStats,
+    status_code=status.HTTP_200_OK,
+    summary="Статистика кэша распознавания QR-кодов",
+    description="Размер кэша, количество попаданий и промахов",
+)
+async def recognition_cache_stats() -> RecognitionCacheStats:
+    return RecognitionCacheStats(**recognition_cache.stats())
@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel
+
+
+# Модель только для Pydantic (без таблицы в БД)
+class RecognitionCacheStats(SQLModel):
+    enabled: bool
+    size: int
+    max_size: int
+    hits: int
+    disk_hits: int
+    misses: int
+    hit_rate: float
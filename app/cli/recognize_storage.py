@@ -0,0 +1,209 @@
+"""
+Повторное распознавание QR-кодов во всех файлах хранилища (например, после изменения
+qr_code_enhancement_pipeline).
+
+Запуск:
+    python -m app.cli.recognize_storage --output results.jsonl
+    python -m app.cli.recognize_storage --output results.jsonl --resume
+
+Поддерживается только хранилище отдельных файлов (FILE_STORAGE_BACKEND=files).
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections.abc import Iterator
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from app.api.file_storage.pack_storage import PACKS_DIR_NAME
+from app.api.file_storage.utils import REF_FILE_SUFFIX, TMP_DIR_NAME, get_file_path_by_uuid
+from app.api.qr_code_recognize.enhance_and_recognize_qr_code import get_qr_code_data
+from app.core.config import settings
+from app.logger import logger
+
+_ROOT_DIRECTORY: Path = Path(__file__).resolve().parent.parent.parent
+DEFAULT_STORAGE_PATH = Path.joinpath(_ROOT_DIRECTORY, "file_storage")
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tiff"}
+
+
+def iter_storage_files(base_storage_path: Path) -> Iterator[tuple[str, Path]]:
+    """
+    Обход хранилища вида aa/bb/<file> без построения полного списка файлов: (идентификатор файла, путь).
+    Файлы, сохраненные по хэшу содержимого, возвращаются по ссылкам <uuid>.ref с идентификатором
+    загрузки (блоб с несколькими ссылками - для каждой), сами блобы (без расширения) пропускаются
+    """
+    for first_level in sorted(os.scandir(base_storage_path), key=lambda e: e.name):
+        if not first_level.is_dir() or first_level.name == TMP_DIR_NAME:
+            continue
+        for second_level in sorted(os.scandir(first_level.path), key=lambda e: e.name):
+            if not second_level.is_dir():
+                continue
+            for entry in sorted(os.scandir(second_level.path), key=lambda e: e.name):
+                path = Path(entry.path)
+                if not entry.is_file():
+                    continue
+                if path.suffix == REF_FILE_SUFFIX:
+                    try:
+                        yield path.stem, Path(get_file_path_by_uuid(path.stem, base_storage_path))
+                    except OSError as e:
+                        logger.warning(f"Не удалось прочитать ссылку {path}: {e}")
+                elif path.suffix.lower() in IMAGE_EXTENSIONS:
+                    yield path.stem, path
+
+
+def load_processed_file_ids(output_path: Path) -> set[str]:
+    """Идентификаторы файлов, уже записанных в результаты (для продолжения прерванной обработки)"""
+    processed: set[str] = set()
+    if not output_path.exists():
+        return processed
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                processed.add(orjson.loads(line)["file_id"])
+            except (orjson.JSONDecodeError, KeyError):
+                # Последняя строка могла быть записана не полностью
+                continue
+    return processed
+
+
+def truncate_incomplete_line(output_path: Path) -> None:
+    """Удаление не полностью записанной последней строки, чтобы дописываемые результаты не склеились с ней"""
+    with open(output_path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            block_start = max(0, position - 64 * 1024)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            newline_index = block.rfind(b"\n")
+            if newline_index != -1:
+                position = block_start + newline_index + 1
+                break
+            position = block_start
+        if position != end:
+            logger.warning(f"Удалена не полностью записанная строка в конце {output_path}")
+            f.truncate(position)
+
+
+def init_worker(log_level: int) -> None:
+    logger.setLevel(log_level)
+
+
+def recognize_storage_file(storage_file: tuple[str, Path]) -> dict[str, Any]:
+    """Распознавание одного файла (выполняется в процессе пула)"""
+    file_id, file_path = storage_file
+    started_at = time.perf_counter()
+    try:
+        qr_code_data_result = get_qr_code_data(str(file_path))
+        status = "recognized" if qr_code_data_result else "not_found"
+        detail = None
+    except Exception as e:
+        qr_code_data_result, status, detail = None, "error", str(e)
+
+    return {
+        "file_id": file_id,
+        "file_path": str(file_path),
+        "status": status,
+        "qr_code_data_result": qr_code_data_result,
+        "detail": detail,
+        "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 1),
+    }
+
+
+def recognize_storage(
+    base_storage_path: Path,
+    output_path: Path,
+    processes: int,
+    chunk_size: int = 16,
+    resume: bool = False,
+    report_every: int = 100,
+    log_level: int = logging.ERROR,
+) -> dict[str, Any]:
+    """
+    Распознавание всех файлов хранилища в пуле процессов с построчной записью результатов в JSONL
+    :param base_storage_path: Путь файлового хранилища
+    :param output_path: Файл результатов (JSONL)
+    :param processes: Количество процессов
+    :param chunk_size: Сколько файлов передается процессу за раз
+    :param resume: Пропустить файлы, уже записанные в output_path, и дописывать результаты в конец
+    :param report_every: Как часто (в файлах) выводить прогресс
+    :param log_level: Уровень логирования в процессах пула
+    :return: Итоги обработки
+    """
+    processed_file_ids = load_processed_file_ids(output_path) if resume else set()
+    if processed_file_ids:
+        logger.info(f"Продолжение обработки: пропускается {len(processed_file_ids)} файлов")
+    if resume and output_path.exists():
+        truncate_incomplete_line(output_path)
+
+    files = (
+        storage_file
+        for storage_file in iter_storage_files(base_storage_path)
+        if storage_file[0] not in processed_file_ids
+    )
+
+    summary: dict[str, float] = {"total": 0, "recognized": 0, "not_found": 0, "error": 0}
+    started_at = time.perf_counter()
+
+    with (
+        open(output_path, "ab" if resume else "wb") as output,
+        Pool(processes=processes, initializer=init_worker, initargs=(log_level,)) as pool,
+    ):
+        for result in pool.imap_unordered(recognize_storage_file, files, chunksize=chunk_size):
+            output.write(orjson.dumps(result) + b"\n")
+            summary["total"] += 1
+            summary[result["status"]] += 1
+
+            if summary["total"] % report_every == 0:
+                output.flush()
+                elapsed = time.perf_counter() - started_at
+                logger.info(
+                    f"Обработано {summary['total']}: {summary['total'] / elapsed:.1f} изобр./с, "
+                    f"{summary['total'] / elapsed / processes:.2f} изобр./с на процесс"
+                )
+
+    elapsed = time.perf_counter() - started_at
+    summary["elapsed_sec"] = round(elapsed, 3)
+    summary["images_per_sec"] = round(summary["total"] / elapsed, 2) if elapsed else 0.0
+    summary["images_per_sec_per_process"] = round(summary["images_per_sec"] / processes, 2)
+    return summary
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Распознавание QR-кодов во всех файлах хранилища")
+    parser.add_argument("--storage", type=Path, default=DEFAULT_STORAGE_PATH, help="Путь файлового хранилища")
+    parser.add_argument("--output", type=Path, required=True, help="Файл результатов (JSONL)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Количество процессов")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Файлов на одну задачу процесса")
+    parser.add_argument("--resume", action="store_true", help="Продолжить прерванную обработку")
+    parser.add_argument("--report-every", type=int, default=100, help="Частота вывода прогресса (в файлах)")
+    args = parser.parse_args(argv)
+
+    # Файлы в сегментах обход хранилища не находит: без ошибки результат был бы пустым
+    if settings.FILE_STORAGE_BACKEND == "pack" or (args.storage / PACKS_DIR_NAME).is_dir():
+        parser.exit(
+            1,
+            f"{parser.prog}: ошибка: хранилище сегментов (FILE_STORAGE_BACKEND=pack) не поддерживается, "
+            "поддерживается только хранилище отдельных файлов\n",
+        )
+
+    summary = recognize_storage(
+        args.storage,
+        args.output,
+        processes=args.processes,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        report_every=args.report_every,
+    )
+    sys.stdout.write(orjson.dumps(summary).decode() + "\n")
+
+
+if __name__ == "__main__":
+    main()
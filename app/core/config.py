@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import Literal
 
@@ -15,6 +16,112 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     ENVIRONMENT: Literal["local", "production"] = "local"
 
+    # Пул процессов для распознавания QR-кодов
+    RECOGNITION_MAX_WORKERS: int = os.cpu_count() or 1
+    RECOGNITION_MAX_QUEUE_SIZE: int = 32  # Сколько задач может ждать свободного процесса
+    RECOGNITION_TIMEOUT_SEC: float = 30.0
+    RECOGNITION_RETRY_AFTER_SEC: int = 1
+    RECOGNITION_BATCH_MAX_FILES: int = 100  # Файлов в одном запросе пакетного распознавания
+    # Прогрев при запуске (в фоне): загрузка модулей распознавания и пробное распознавание в каждом процессе
+    # пула, чтобы первый запрос не ждал их. Без прогрева модули загружаются при первом распознавании
+    RECOGNITION_WARM_UP: bool = True
+    # Очередь асинхронного распознавания (SQLite), по умолчанию file_storage/.recognition_jobs.sqlite3
+    RECOGNITION_JOBS_DB_PATH: Path | None = None
+    RECOGNITION_JOBS_CONCURRENCY: int = os.cpu_count() or 1  # Одновременно выполняемых задач
+    RECOGNITION_JOBS_MAX_ATTEMPTS: int = 3
+    RECOGNITION_JOBS_RETRY_DELAY_SEC: float = 5.0  # Задержка перед повтором, удваивается с каждой попыткой
+    RECOGNITION_JOBS_MAX_WAIT_SEC: float = 30.0  # Максимальное время ожидания результата (long polling)
+    # Срок удержания задачи обработчиком (продлевается, пока задача выполняется): задачи остановленного
+    # процесса выполняются заново другими процессами по истечении этого срока
+    RECOGNITION_JOBS_LEASE_SEC: float = 60.0
+    # Через сколько удаляются завершенные задачи (результат остается в индексе файлов) и как часто это проверяется
+    RECOGNITION_JOBS_RETENTION_SEC: float = 7 * 24 * 60 * 60
+    RECOGNITION_JOBS_CLEANUP_INTERVAL_SEC: float = 60 * 60
+
+    # Декодеры QR-кодов (pyzbar, opencv - cv2.QRCodeDetector) в порядке применения к каждому варианту
+    # изображения: sequential - по очереди до первого успешного, race - параллельно, побеждает первый успешный.
+    # opencv требует OpenCV 4.11+ (распознавание в байтах), в более ранних версиях пропускается
+    RECOGNITION_DECODERS: list[Literal["pyzbar", "opencv"]] = ["pyzbar", "opencv"]
+    RECOGNITION_DECODER_MODE: Literal["sequential", "race"] = "sequential"
+
+    # Порядок улучшений изображения: fixed - как в qr_code_enhancement_pipeline,
+    # adaptive - по статистике успешности и времени выполнения каждого улучшения (редко помогающие
+    # улучшения пропускаются, поэтому часть редких QR-кодов может не распознаться)
+    RECOGNITION_PIPELINE_MODE: Literal["fixed", "adaptive"] = "fixed"
+    RECOGNITION_PIPELINE_STATS_PATH: Path | None = None  # JSON файл для сохранения статистики
+    RECOGNITION_PIPELINE_MIN_ATTEMPTS: int = 50  # Минимум попыток до изменения порядка улучшений
+    RECOGNITION_PIPELINE_PRUNE_SUCCESS_RATE: float = 0.01  # Улучшения с меньшей успешностью пропускаются
+    RECOGNITION_PIPELINE_EXPLORATION_RATE: float = 0.05  # Доля запросов, в которых пропущенные пробуются
+    # Дополнительный шаг улучшений: бинаризация увеличенного в 2 раза изображения (меняет результаты
+    # распознавания и ключи кэша, поэтому включается явно)
+    RECOGNITION_UPSCALED_BINARIZATION: bool = False
+    # Параллельный запуск всех вариантов улучшений: побеждает первый успешно распознанный
+    RECOGNITION_SPECULATIVE: bool = False
+    RECOGNITION_SPECULATIVE_THREADS: int = 4  # Потоков в каждом процессе распознавания
+    # Поиск QR-кода на уменьшенной копии и обработка только найденной области
+    RECOGNITION_LOCALIZATION: bool = True
+    RECOGNITION_LOCALIZATION_PREVIEW_SIZE: int = 1200  # Размер большей стороны уменьшенной копии
+    RECOGNITION_LOCALIZATION_PADDING: float = 0.25  # Отступ вокруг найденной области (доля от ее размера)
+    # Большие фото сначала распознаются на уменьшенной в 2, 4 или 8 раз копии (JPEG декодируется сразу
+    # в уменьшенном размере), полное разрешение и улучшения - только если это не удалось
+    RECOGNITION_REDUCED_RESOLUTION: bool = True
+    RECOGNITION_REDUCED_TARGET_SIZE_PX: int = 1500  # Минимальный размер большей стороны уменьшенной копии
+
+    # Максимальный размер загружаемого файла
+    FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE: int = 20 * 1024 * 1024
+    # Проверка изображений по заголовку до сохранения и распознавания: максимальные ширина и высота,
+    # максимум пикселей (защита от "бомб" распаковки - маленьких файлов с огромными размерами)
+    FILE_STORAGE_IMAGE_MAX_DIMENSION_PX: int = 20_000
+    FILE_STORAGE_IMAGE_MAX_PIXELS: int = 120_000_000
+    # Хранение файлов по хэшу содержимого: одинаковые загрузки пишутся на диск один раз
+    FILE_STORAGE_CONTENT_ADDRESSED: bool = False
+    # Бэкенд хранения: files - отдельный файл на каждую загрузку, pack - дописывание в большие
+    # файлы-сегменты с индексом (меньше файлов и операций с метаданными ФС на миллионах загрузок)
+    FILE_STORAGE_BACKEND: Literal["files", "pack"] = "files"
+    FILE_STORAGE_PACK_SEGMENT_MAX_BYTE: int = 1024 * 1024 * 1024
+    FILE_STORAGE_PACK_FSYNC_INTERVAL_SEC: float = 0.2  # Задержка пакетного fsync, 0 - fsync каждой записи
+    # Пересборка сегментов, в которых удаленные файлы занимают не меньше этой доли, и как часто она запускается
+    FILE_STORAGE_PACK_COMPACTION_DEAD_RATIO: float = 0.5
+    FILE_STORAGE_PACK_COMPACTION_INTERVAL_SEC: float = 60 * 60
+    # Загрузка по частям: через сколько удаляются сессии без новых частей и как часто это проверяется
+    FILE_STORAGE_UPLOAD_SESSION_TTL_SEC: float = 24 * 60 * 60
+    FILE_STORAGE_UPLOAD_CLEANUP_INTERVAL_SEC: float = 60 * 60
+    # Индекс сохраненных файлов (SQLite), по умолчанию file_storage/.file_index.sqlite3
+    FILE_INDEX_DB_PATH: Path | None = None
+    FILE_INDEX_BATCH_SIZE: int = 100  # Записей в одной транзакции
+    FILE_INDEX_FLUSH_INTERVAL_SEC: float = 1.0  # Максимальная задержка записи в БД
+    # Уменьшенные копии изображений (превью): ширины, формат, качество и общий размер на диске
+    FILE_STORAGE_IMAGE_VARIANT_WIDTHS: list[int] = [256, 1024]
+    FILE_STORAGE_IMAGE_VARIANT_FORMAT: Literal["webp", "jpeg"] = "webp"
+    FILE_STORAGE_IMAGE_VARIANT_QUALITY: int = 80
+    FILE_STORAGE_IMAGE_VARIANTS_MAX_TOTAL_BYTE: int = 1024 * 1024 * 1024
+    # Строить копии сразу после загрузки (в фоне), а не при первом запросе
+    FILE_STORAGE_IMAGE_VARIANTS_EAGER: bool = False
+
+    # Кэш результатов распознавания по хэшу изображения
+    RECOGNITION_CACHE_ENABLED: bool = True
+    RECOGNITION_CACHE_MAX_SIZE: int = 10_000
+    RECOGNITION_CACHE_TTL_SEC: float = 24 * 60 * 60
+    RECOGNITION_CACHE_DB_PATH: Path | None = None  # SQLite файл для хранения кэша между перезапусками
+    RECOGNITION_CACHE_DB_MAX_SIZE: int = 1_000_000  # Записей в SQLite (истекшие удаляются раньше)
+
+    # Мониторинг нагрузки: как часто замеряется задержка event loop
+    LOAD_MONITOR_INTERVAL_SEC: float = 0.5
+    # Быстрый отказ (503) на маршрутах LOAD_SHEDDING_ROUTES, а /system/health/ready - 503 для балансировщика,
+    # если задержка event loop больше MAX_EVENT_LOOP_LAG_SEC или очередь распознавания заполнена
+    # на долю MAX_QUEUE_RATIO; для маршрута - также если на нем выполняется больше MAX_IN_FLIGHT запросов
+    LOAD_SHEDDING_ENABLED: bool = True
+    LOAD_SHEDDING_ROUTES: list[str] = ["/file-storage/get-qr-code-data/"]
+    LOAD_SHEDDING_MAX_EVENT_LOOP_LAG_SEC: float = 0.5
+    LOAD_SHEDDING_MAX_QUEUE_RATIO: float = 0.9
+    LOAD_SHEDDING_MAX_IN_FLIGHT: int = 64
+
+    # Логи одной строкой JSON (с request_id и полями из extra) вместо текстового формата
+    LOG_JSON: bool = False
+
+    # Метрики распознавания и файлового хранилища (/system/metrics)
+    METRICS_ENABLED: bool = True
+
 
 _ROOT_DIRECTORY: Path = Path(__file__).resolve().parent.parent.parent
 env_file_abs_path = Path.joinpath(_ROOT_DIRECTORY, ".env")
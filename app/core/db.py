@@ -0,0 +1,29 @@
+import threading
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlmodel import SQLModel, create_engine
+
+# Создание таблиц при одновременном первом обращении из нескольких потоков (иначе "table already exists")
+_create_tables_lock = threading.Lock()
+
+
+def create_sqlite_engine(db_path: Path, tables: list[Any]) -> Engine:
+    """
+    Подключение к SQLite в режиме WAL (чтение не блокируется записью, fsync только при checkpoint)
+    с созданием таблиц tables, если их нет
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection: Any, _: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    with _create_tables_lock:
+        SQLModel.metadata.create_all(engine, tables=tables)
+    return engine
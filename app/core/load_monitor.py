@@ -0,0 +1,95 @@
+"""
+Мониторинг нагрузки воркера: задержка event loop, количество выполняющихся запросов по маршрутам
+и заполненность очередей (распознавания). По этим данным /system/health/ready сообщает балансировщику,
+что воркер перегружен, а LoadSheddingMiddleware быстро отказывает (503) на тяжелых маршрутах,
+не затрагивая загрузку файлов и проверки состояния.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Во сколько раз уменьшается задержка за один замер без новой задержки: пик учитывается сразу,
+# а после снятия нагрузки значение быстро возвращается к нулю
+EVENT_LOOP_LAG_DECAY = 0.5
+
+
+class LoadMonitor:
+    def __init__(
+        self,
+        sample_interval_sec: float = 0.5,
+        max_event_loop_lag_sec: float = 0.5,
+        max_queue_ratio: float = 0.9,
+        max_in_flight: int = 64,
+    ):
+        self.sample_interval_sec = sample_interval_sec
+        self.max_event_loop_lag_sec = max_event_loop_lag_sec
+        self.max_queue_ratio = max_queue_ratio
+        self.max_in_flight = max_in_flight
+
+        self.event_loop_lag_sec = 0.0
+        # Маршрут (шаблон пути) -> количество выполняющихся запросов
+        self._in_flight: dict[str, int] = {}
+        # Имя очереди -> (текущая длина, емкость)
+        self._queues: dict[str, tuple[Callable[[], int], int]] = {}
+
+    def register_queue(self, name: str, get_depth: Callable[[], int], capacity: int) -> None:
+        """Очередь, заполненность которой учитывается при оценке перегрузки"""
+        self._queues[name] = (get_depth, capacity)
+
+    def request_started(self, route: str) -> None:
+        self._in_flight[route] = self._in_flight.get(route, 0) + 1
+
+    def request_finished(self, route: str) -> None:
+        self._in_flight[route] -= 1
+        if not self._in_flight[route]:
+            del self._in_flight[route]
+
+    @property
+    def in_flight(self) -> dict[str, int]:
+        return dict(self._in_flight)
+
+    def get_queue_depths(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {"depth": get_depth(), "capacity": capacity}
+            for name, (get_depth, capacity) in self._queues.items()
+        }
+
+    def get_overload_reasons(self, route: str | None = None) -> list[str]:
+        """
+        Причины перегрузки: event_loop_lag, <имя очереди>_queue, in_flight (запросы маршрута route)
+        :return: Пустой список, если воркер не перегружен
+        """
+        reasons = []
+        if self.event_loop_lag_sec > self.max_event_loop_lag_sec:
+            reasons.append("event_loop_lag")
+        for name, (get_depth, capacity) in self._queues.items():
+            if capacity > 0 and get_depth() >= capacity * self.max_queue_ratio:
+                reasons.append(f"{name}_queue")
+        if route is not None and self._in_flight.get(route, 0) > self.max_in_flight:
+            reasons.append("in_flight")
+        return reasons
+
+    async def sample_event_loop_lag(self) -> None:
+        """
+        Фоновая задача замера задержки event loop: насколько позже заданного просыпается asyncio.sleep.
+        Задержка растет, когда event loop занят синхронной работой и запросы ждут своей очереди
+        """
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.sample_interval_sec)
+            lag_sec = max(time.perf_counter() - started_at - self.sample_interval_sec, 0.0)
+            self.event_loop_lag_sec = max(lag_sec, self.event_loop_lag_sec * EVENT_LOOP_LAG_DECAY)
+
+
+load_monitor = LoadMonitor(
+    sample_interval_sec=settings.LOAD_MONITOR_INTERVAL_SEC,
+    max_event_loop_lag_sec=settings.LOAD_SHEDDING_MAX_EVENT_LOOP_LAG_SEC,
+    max_queue_ratio=settings.LOAD_SHEDDING_MAX_QUEUE_RATIO,
+    max_in_flight=settings.LOAD_SHEDDING_MAX_IN_FLIGHT,
+)
+metrics.register_gauge("event_loop_lag_seconds", lambda: load_monitor.event_loop_lag_sec)
+metrics.register_gauge("http_requests_in_flight", lambda: sum(load_monitor.in_flight.values()))
@@ -0,0 +1,170 @@
+"""
+Метрики приложения в формате Prometheus (text exposition format 0.0.4).
+Распознавание выполняется в пуле процессов, поэтому метрики процесса распознавания
+забираются через drain() вместе с результатом и добавляются в основной процесс через merge().
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from app.core.config import settings
+
+# Границы корзин гистограмм длительности (секунды)
+DURATION_BUCKETS_SEC = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MetricType = Literal["counter", "gauge", "histogram"]
+Labels = tuple[tuple[str, str], ...]
+
+# Имя метрики: (тип, описание)
+METRICS: dict[str, tuple[MetricType, str]] = {
+    "qr_recognition_stage_duration_seconds": ("histogram", "Длительность этапов распознавания QR-кода"),
+    "qr_recognition_success_total": ("counter", "Распознанные QR-коды по улучшению, давшему результат"),
+    "qr_recognition_failures_total": ("counter", "Нераспознанные изображения по причине"),
+    "file_storage_duration_seconds": ("histogram", "Длительность сохранения файла"),
+    "file_storage_stored_bytes_total": ("counter", "Записано байт в файловое хранилище"),
+    "file_storage_stored_files_total": ("counter", "Сохранено файлов"),
+    "qr_recognition_in_flight": ("gauge", "Задачи распознавания в работе и в очереди"),
+    "event_loop_lag_seconds": ("gauge", "Задержка event loop (насколько позже заданного просыпаются задачи)"),
+    "http_requests_in_flight": ("gauge", "Выполняющиеся HTTP-запросы"),
+    "http_requests_shed_total": ("counter", "Запросы, отклоненные с кодом 503 из-за перегрузки"),
+    "app_startup_duration_seconds": ("gauge", "Время от запуска процесса до готовности принимать запросы"),
+    "qr_recognition_warm_up_duration_seconds": ("gauge", "Длительность прогрева распознавания при запуске"),
+}
+
+
+@dataclass
+class HistogramValue:
+    bucket_counts: list[int] = field(default_factory=lambda: [0] * len(DURATION_BUCKETS_SEC))
+    count: int = 0
+    sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(DURATION_BUCKETS_SEC):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "HistogramValue") -> None:
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, other.bucket_counts, strict=True)]
+        self.count += other.count
+        self.sum += other.sum
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+    Счетчики и гистограммы с метками. При enabled=False все методы ничего не делают,
+    а timer() возвращает пустой контекстный менеджер.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, HistogramValue]] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+        # Распознавание с speculative=True пишет метрики из нескольких потоков
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            values = self._counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            self._histograms.setdefault(name, {}).setdefault(key, HistogramValue()).observe(value)
+
+    def timer(self, name: str, **labels: str) -> Any:
+        """Контекстный менеджер, записывающий длительность блока в гистограмму name"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict[str, str]) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at, **labels)
+
+    def register_gauge(self, name: str, get_value: Callable[[], float]) -> None:
+        """Значение gauge вычисляется в момент экспорта"""
+        self._gauges[name] = get_value
+
+    def drain(self) -> dict[str, Any]:
+        """Забирает накопленные счетчики и гистограммы (для передачи из процесса распознавания)"""
+        with self._lock:
+            snapshot = {"counters": self._counters, "histograms": self._histograms}
+            self._counters, self._histograms = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: dict[str, Any]) -> None:
+        """Добавляет метрики, полученные через drain() в другом процессе"""
+        with self._lock:
+            for name, values in snapshot["counters"].items():
+                counters = self._counters.setdefault(name, {})
+                for key, value in values.items():
+                    counters[key] = counters.get(key, 0) + value
+            for name, values in snapshot["histograms"].items():
+                histograms = self._histograms.setdefault(name, {})
+                for key, value in values.items():
+                    histograms.setdefault(key, HistogramValue()).merge(value)
+
+    def render(self) -> str:
+        """Экспорт в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            for name, (metric_type, description) in METRICS.items():
+                if metric_type == "counter" and name in self._counters:
+                    lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+                    for key, value in self._counters[name].items():
+                        lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+                elif metric_type == "histogram" and name in self._histograms:
+                    lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                    for key, histogram in self._histograms[name].items():
+                        cumulative = 0
+                        for bound, count in zip(DURATION_BUCKETS_SEC, histogram.bucket_counts, strict=True):
+                            cumulative += count
+                            bucket_labels = _format_labels(key, f'le="{bound:g}"')
+                            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                        bucket_labels = _format_labels(key, 'le="+Inf"')
+                        lines.append(f"{name}_bucket{bucket_labels} {histogram.count}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                        lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+                elif metric_type == "gauge" and name in self._gauges:
+                    lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+                    lines.append(f"{name} {self._gauges[name]():g}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
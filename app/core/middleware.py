@@ -0,0 +1,119 @@
+import time
+from uuid import uuid4
+
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.load_monitor import LoadMonitor
+from app.core.metrics import metrics
+from app.logger import logger, request_id_var
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class RequestContextMiddleware:
+    """
+    Присваивает запросу идентификатор (из заголовка X-Request-ID или новый), который попадает
+    во все записи лога, сделанные при обработке запроса, и в заголовок ответа.
+    По завершении запроса пишет в лог метод, путь, код ответа и время обработки.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        request_id = request_id[:64] or uuid4().hex
+        token = request_id_var.set(request_id)
+
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed_ms = round((time.perf_counter() - started_at) * 1000, 1)
+            logger.info(
+                "%s %s %s %.1f мс",
+                scope["method"],
+                scope["path"],
+                status_code,
+                elapsed_ms,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status_code": status_code,
+                    "elapsed_ms": elapsed_ms,
+                },
+            )
+            request_id_var.reset(token)
+
+
+def get_route_path(scope: Scope) -> str | None:
+    """Шаблон пути маршрута, соответствующего запросу (как /file-storage/files/{file_id})"""
+    for route in getattr(scope.get("app"), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return str(route.path)
+    return None
+
+
+class LoadSheddingMiddleware:
+    """
+    Считает выполняющиеся запросы по маршрутам и при перегрузке (см. LoadMonitor.get_overload_reasons)
+    сразу отвечает 503 на маршрутах shed_routes, не читая тело запроса.
+    Остальные маршруты (загрузка файлов, проверки состояния) обрабатываются как обычно.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        load_monitor: LoadMonitor,
+        shed_routes: list[str],
+        retry_after_sec: int = 1,
+        enabled: bool = True,
+    ):
+        self.app = app
+        self.load_monitor = load_monitor
+        self.shed_routes = set(shed_routes)
+        self.retry_after_sec = retry_after_sec
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = get_route_path(scope) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.enabled and route in self.shed_routes:
+            reasons = self.load_monitor.get_overload_reasons(route)
+            if reasons:
+                for reason in reasons:
+                    metrics.inc("http_requests_shed_total", route=route, reason=reason)
+                logger.warning("Запрос отклонен из-за перегрузки: %s", ", ".join(reasons))
+                response = ORJSONResponse(
+                    status_code=503,
+                    content={"detail": "Сервис перегружен, повторите запрос позже", "reasons": reasons},
+                    headers={"Retry-After": str(self.retry_after_sec)},
+                )
+                await response(scope, receive, send)
+                return
+
+        self.load_monitor.request_started(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.load_monitor.request_finished(route)
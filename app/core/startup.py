@@ -0,0 +1,49 @@
+"""
+Время запуска воркера: от старта процесса до готовности принимать запросы и до окончания прогрева
+распознавания. По нему видно, как быстро новые воркеры становятся готовы при горизонтальном масштабировании.
+"""
+
+import os
+
+from app.core.metrics import metrics
+from app.logger import logger
+
+
+def get_process_uptime_sec() -> float | None:
+    """Время с запуска процесса (включая запуск интерпретатора и импорты), None - нет /proc"""
+    try:
+        with open("/proc/self/stat", encoding="utf-8") as f:
+            stat = f.read()
+        with open("/proc/uptime", encoding="utf-8") as f:
+            uptime_sec = float(f.read().split()[0])
+    except OSError:
+        return None
+    # Имя процесса в скобках может содержать пробелы; starttime - 22-е поле, в тиках с загрузки системы
+    start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+    return max(uptime_sec - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+class StartupState:
+    """Этапы запуска воркера"""
+
+    def __init__(self) -> None:
+        self.ready_sec: float | None = None
+        self.warm_up_sec: float | None = None
+
+    @property
+    def warmed_up(self) -> bool:
+        return self.warm_up_sec is not None
+
+    def mark_ready(self) -> None:
+        """Приложение принимает запросы (lifespan запущен)"""
+        self.ready_sec = get_process_uptime_sec()
+        logger.info("Приложение готово к работе через %s с после запуска процесса", self.ready_sec)
+
+    def mark_warmed_up(self, warm_up_sec: float) -> None:
+        self.warm_up_sec = warm_up_sec
+        logger.info("Прогрев распознавания завершен за %.3f с", warm_up_sec)
+
+
+startup_state = StartupState()
+metrics.register_gauge("app_startup_duration_seconds", lambda: startup_state.ready_sec or 0.0)
+metrics.register_gauge("qr_recognition_warm_up_duration_seconds", lambda: startup_state.warm_up_sec or 0.0)
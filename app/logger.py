@@ -1,16 +1,69 @@
+import atexit
 import logging
+import multiprocessing
+import multiprocessing.queues
+import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, cast
+
+import orjson
+
+from app.core.config import settings
 
 _ROOT_DIRECTORY: Path = Path(__file__).resolve().parent.parent
 LOG_FILE_PATH = Path.joinpath(_ROOT_DIRECTORY, "logs/app.log")
 
-LOG_FORMAT = "%(asctime)s - [%(levelname)s] - [%(module)s - %(funcName)s - %(lineno)d] - %(message)s"
+LOG_FORMAT = "%(asctime)s - [%(levelname)s] - [%(module)s - %(funcName)s - %(lineno)d] - [%(request_id)s] - %(message)s"
 
-logger = logging.getLogger()
+# Идентификатор текущего HTTP-запроса (устанавливается RequestContextMiddleware)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Стандартные атрибуты LogRecord; остальные атрибуты - поля из extra
+_LOG_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON, включая поля из extra (например, elapsed_ms)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_data: dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        log_data.update(
+            {key: value for key, value in record.__dict__.items() if key not in _LOG_RECORD_ATTRIBUTES}
+        )
+        if record.exc_info:
+            log_data["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(log_data, default=str).decode()
 
-formatter = logging.Formatter(fmt=LOG_FORMAT)
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Передает записи в очередь без форматирования: сообщение собирается и пишется на диск
+    в потоке QueueListener. В вызывающем потоке к записи добавляется только request_id.
+    В дочернем процессе записи передаются основному через очередь multiprocessing (см. use_process_log_queue).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        if isinstance(self.queue, multiprocessing.queues.Queue):
+            # Запись передается в другой процесс через pickle: аргументы и исключение - уже в тексте сообщения
+            return cast(logging.LogRecord, super().prepare(record))
+        return record
+
+
+formatter: logging.Formatter = JSONFormatter() if settings.LOG_JSON else logging.Formatter(fmt=LOG_FORMAT)
 
 stream_handler = logging.StreamHandler(sys.stdout)
 stream_handler.setFormatter(formatter)
@@ -21,9 +74,80 @@ file_handler = RotatingFileHandler(
     encoding="utf-8",
     maxBytes=1 * 1024 * 1024,  # 1Mb
     backupCount=3,
+    # Файл открывается при первой записи, а не при импорте
+    delay=True,
 )
 file_handler.setFormatter(formatter)
 
-logger.handlers = [stream_handler, file_handler]
+queue_handler = ContextQueueHandler(queue.SimpleQueue())
+_queue_listener: QueueListener | None = None
+# Записи дочерних процессов (пул распознавания): файл лога ротирует только основной процесс,
+# иначе несколько RotatingFileHandler переименовывают один файл и теряют или перемешивают записи
+_process_log_queue: "multiprocessing.Queue[logging.LogRecord] | None" = None
+_process_queue_listener: QueueListener | None = None
+
+
+def start_queue_listener() -> None:
+    """Запуск фоновых потоков, которые форматируют и пишут записи из очереди процесса и дочерних процессов"""
+    global _queue_listener, _process_log_queue, _process_queue_listener
+    queue_handler.queue = queue.SimpleQueue()
+    _queue_listener = QueueListener(
+        queue_handler.queue, stream_handler, file_handler, respect_handler_level=True
+    )
+    _queue_listener.start()
 
+    # Очередь из контекста spawn можно передать процессам с любым способом запуска
+    # (очередь из контекста fork передается только процессам, запущенным через fork)
+    _process_log_queue = multiprocessing.get_context("spawn").Queue()
+    _process_queue_listener = QueueListener(
+        _process_log_queue, stream_handler, file_handler, respect_handler_level=True
+    )
+    _process_queue_listener.start()
+
+
+def stop_queue_listener() -> None:
+    """Остановка фоновых потоков с записью оставшихся в очередях сообщений"""
+    global _queue_listener, _process_queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+    if _process_queue_listener is not None:
+        _process_queue_listener.stop()
+        _process_queue_listener = None
+
+
+logger = logging.getLogger()
+logger.handlers = [queue_handler]
 logger.setLevel(logging.INFO)
+
+
+def get_process_log_queue() -> "multiprocessing.Queue[logging.LogRecord] | None":
+    """Очередь записей дочерних процессов: передается им явно (initargs пула) при любом способе запуска"""
+    return _process_log_queue
+
+
+def use_process_log_queue(log_queue: "multiprocessing.Queue[logging.LogRecord] | None") -> None:
+    """
+    Передача записей дочернего процесса основному через log_queue (initializer пула распознавания).
+    При запуске через spawn/forkserver модуль импортируется заново и запускает собственные потоки
+    QueueListener - они останавливаются, файл лога пишет и ротирует только основной процесс
+    """
+    stop_queue_listener()
+    if log_queue is not None:
+        queue_handler.queue = log_queue
+
+
+def _use_parent_log_queue() -> None:
+    global _queue_listener, _process_queue_listener
+    # Контекст запроса, во время которого был запущен процесс, к его дальнейшей работе не относится
+    request_id_var.set("-")
+    # Потоки QueueListener не переживают fork: дочерние процессы передают записи основному процессу.
+    # Остановка унаследованных объектов отправила бы ему сигнал остановки
+    _queue_listener = _process_queue_listener = None
+    if _process_log_queue is not None:
+        queue_handler.queue = _process_log_queue
+
+
+start_queue_listener()
+atexit.register(stop_queue_listener)
+os.register_at_fork(after_in_child=_use_parent_log_queue)
@@ -1,8 +1,81 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
+from app.api.file_storage.api import (
+    BASE_STORAGE_PATH,
+    file_index,
+    file_storage,
+    recognition_job_queue,
+    run_recognition_job,
+    warm_up_recognition,
+)
+from app.api.file_storage.middleware import UploadSizeLimitMiddleware
+from app.api.file_storage.resumable_upload import cleanup_upload_sessions_periodically
+from app.api.file_storage.storage import PackFileStorage, compact_pack_storage_periodically
 from app.api.main import api_router
+from app.api.qr_code_recognize.recognition_executor import recognition_executor
 from app.core.config import settings
+from app.core.load_monitor import load_monitor
+from app.core.middleware import LoadSheddingMiddleware, RequestContextMiddleware
+from app.core.startup import startup_state
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncGenerator[None]:
+    if isinstance(file_storage, PackFileStorage):
+        # Сегменты может дописывать только один процесс: второй воркер не запустится
+        await asyncio.to_thread(file_storage.open)
+    recognition_executor.start()
+    cleanup_task = asyncio.create_task(
+        cleanup_upload_sessions_periodically(
+            BASE_STORAGE_PATH,
+            settings.FILE_STORAGE_UPLOAD_SESSION_TTL_SEC,
+            settings.FILE_STORAGE_UPLOAD_CLEANUP_INTERVAL_SEC,
+        )
+    )
+    background_tasks = [
+        cleanup_task,
+        asyncio.create_task(load_monitor.sample_event_loop_lag()),
+        asyncio.create_task(
+            recognition_job_queue.delete_finished_periodically(
+                settings.RECOGNITION_JOBS_RETENTION_SEC, settings.RECOGNITION_JOBS_CLEANUP_INTERVAL_SEC
+            )
+        ),
+    ]
+    if settings.RECOGNITION_WARM_UP:
+        background_tasks.append(asyncio.create_task(warm_up_recognition()))
+    if isinstance(file_storage, PackFileStorage):
+        background_tasks.append(
+            asyncio.create_task(
+                compact_pack_storage_periodically(
+                    file_storage,
+                    settings.FILE_STORAGE_PACK_COMPACTION_DEAD_RATIO,
+                    settings.FILE_STORAGE_PACK_COMPACTION_INTERVAL_SEC,
+                )
+            )
+        )
+    job_worker_tasks = [
+        asyncio.create_task(recognition_job_queue.run_worker(run_recognition_job))
+        for _ in range(settings.RECOGNITION_JOBS_CONCURRENCY)
+    ]
+    startup_state.mark_ready()
+    yield
+    for task in background_tasks:
+        task.cancel()
+    for task in job_worker_tasks:
+        task.cancel()
+    await asyncio.gather(*job_worker_tasks, return_exceptions=True)
+    recognition_job_queue.close()
+    file_index.close()
+    file_storage.close()
+    # Дожидаемся завершения уже запущенных распознаваний (в потоке, не блокируя event loop),
+    # ожидающие задачи отменяются
+    await asyncio.to_thread(recognition_executor.shutdown, True)
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -12,7 +85,28 @@ app = FastAPI(
     # openapi_url=f"{settings.API_V1_STR}/openapi.json",
     # openapi_url=None if settings.srv.ENVIRONMENT not in settings.srv.SHOW_DOCS_ENVIRONMENT else settings.srv.OPENAPI_URL,
     default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_upload_size=settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE,
+    # Пакет может содержать RECOGNITION_BATCH_MAX_FILES файлов, размер каждого проверяется отдельно
+    route_max_upload_sizes={
+        "/file-storage/get-qr-code-data/batch/": settings.RECOGNITION_BATCH_MAX_FILES
+        * settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE
+    },
+)
+# Снаружи UploadSizeLimitMiddleware: при перегрузке отказ приходит до чтения тела запроса
+app.add_middleware(
+    LoadSheddingMiddleware,
+    load_monitor=load_monitor,
+    shed_routes=settings.LOAD_SHEDDING_ROUTES,
+    retry_after_sec=settings.RECOGNITION_RETRY_AFTER_SEC,
+    enabled=settings.LOAD_SHEDDING_ENABLED,
 )
+# Добавляется последним, чтобы быть внешним: request_id есть и в логах отклоненных запросов
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(
     api_router,
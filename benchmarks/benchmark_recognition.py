@@ -0,0 +1,154 @@
+"""
+Бенчмарк распознавания QR-кодов на синтетическом наборе изображений.
+Замеряет время загрузки изображения, распознавания zbar, каждого улучшения из qr_code_enhancement_pipeline
+и get_qr_code_data целиком, а также долю распознанных QR-кодов. Результаты сравниваются с сохраненными
+базовыми значениями: при ухудшении скрипт завершается с кодом 1.
+
+Запуск:
+    python -m benchmarks.benchmark_recognition
+    python -m benchmarks.benchmark_recognition --save-baseline
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from app.api.qr_code_recognize.adaptive_pipeline import AdaptivePipelineScheduler
+from app.api.qr_code_recognize.enhance_and_recognize_qr_code import (
+    get_qr_code_data,
+    load_image,
+    parse_qr_data,
+)
+from app.api.qr_code_recognize.qr_code_enhancer import qr_code_decoders, qr_code_enhancement_pipeline
+from app.logger import logger
+from benchmarks.qr_code_corpus import CorpusImage, generate_corpus
+
+DEFAULT_BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+
+def measure_ms(func: Callable[..., Any], *args: Any, repeat: int = 1) -> tuple[float, Any]:
+    """Минимальное время выполнения из repeat запусков (мс) и результат"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func(*args)
+        best = min(best, (time.perf_counter() - started_at) * 1000)
+    return best, result
+
+
+def summarize_latency(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def run_benchmark(corpus: list[CorpusImage], repeat: int = 1) -> dict[str, Any]:
+    """
+    Замер этапов распознавания на наборе изображений
+    :return: {"stages": {этап: задержки}, "recognition": {искажение: доля распознанных}}
+    """
+    # Порядок улучшений не должен зависеть от накопленной статистики (общий pipeline_scheduler не меняется)
+    scheduler = AdaptivePipelineScheduler(deterministic=True)
+
+    latencies: dict[str, list[float]] = {"load": []}
+    recognized: dict[str, list[bool]] = {}
+
+    for image in corpus:
+        elapsed, gray_image = measure_ms(load_image, image.image_data, repeat=repeat)
+        latencies["load"].append(elapsed)
+
+        for decoder in qr_code_decoders:
+            elapsed, _ = measure_ms(decoder.decode, gray_image, repeat=repeat)
+            latencies.setdefault(f"decode: {decoder.name}", []).append(elapsed)
+
+        for enhancement in qr_code_enhancement_pipeline:
+            elapsed, _ = measure_ms(enhancement.enhance, gray_image, repeat=repeat)
+            latencies.setdefault(f"enhance: {enhancement.name}", []).append(elapsed)
+
+        elapsed, result = measure_ms(get_qr_code_data, image.image_data, image.name, scheduler, repeat=repeat)
+        latencies.setdefault("get_qr_code_data", []).append(elapsed)
+        recognized.setdefault(image.degradation, []).append(result == parse_qr_data(image.payload))
+
+    all_recognized = [value for values in recognized.values() for value in values]
+    return {
+        "images": len(corpus),
+        "stages": {stage: summarize_latency(values) for stage, values in latencies.items()},
+        "recognition": {
+            "total": round(sum(all_recognized) / len(all_recognized), 4),
+            **{
+                degradation: round(sum(values) / len(values), 4) for degradation, values in recognized.items()
+            },
+        },
+    }
+
+
+def compare_with_baseline(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    latency_tolerance: float = 0.25,
+    recognition_tolerance: float = 0.02,
+) -> list[str]:
+    """
+    Сравнение с базовыми значениями
+    :param latency_tolerance: Допустимый рост медианной задержки (доля)
+    :param recognition_tolerance: Допустимое снижение доли распознанных
+    :return: Описания ухудшений
+    """
+    regressions = []
+    for stage, stats in results["stages"].items():
+        base_stats = baseline.get("stages", {}).get(stage)
+        if base_stats and stats["median_ms"] > base_stats["median_ms"] * (1 + latency_tolerance):
+            regressions.append(
+                f"{stage}: медиана {stats['median_ms']} мс, базовое значение {base_stats['median_ms']} мс"
+            )
+
+    for degradation, rate in results["recognition"].items():
+        base_rate = baseline.get("recognition", {}).get(degradation)
+        if base_rate is not None and rate < base_rate - recognition_tolerance:
+            regressions.append(f"Распознавание {degradation}: {rate:.2%}, базовое значение {base_rate:.2%}")
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк распознавания QR-кодов")
+    parser.add_argument("--images-per-case", type=int, default=2, help="Изображений на искажение и уровень")
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого замера (берется минимум)")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно генератора набора изображений")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE_PATH, help="Файл базовых значений")
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как базовые")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25, help="Допустимый рост задержки")
+    args = parser.parse_args(argv)
+
+    logger.setLevel(logging.ERROR)
+    corpus = generate_corpus(seed=args.seed, images_per_case=args.images_per_case)
+    results = run_benchmark(corpus, repeat=args.repeat)
+    sys.stdout.write(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode() + "\n")
+
+    if args.save_baseline:
+        args.baseline.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2) + b"\n")
+        return
+
+    if args.baseline.exists():
+        regressions = compare_with_baseline(
+            results, orjson.loads(args.baseline.read_bytes()), latency_tolerance=args.latency_tolerance
+        )
+        for regression in regressions:
+            sys.stdout.write(f"Ухудшение: {regression}\n")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Синтетический набор изображений с QR-кодами оплаты ST00012 и контролируемыми искажениями
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# Размер "фотографии", на которой размещается QR-код
+CANVAS_SIZE = (1200, 1600)
+
+PAYEES = [
+    ("ООО «Ромашка»", "7701234567", "ПАО Сбербанк", "044525225"),
+    ("ТСЖ «Северный»", "7812345678", "АО «Альфа-Банк»", "044525593"),
+    ("ООО «УК Жилсервис»", "5401234567", "Банк ВТБ (ПАО)", "044525187"),
+]
+
+
+@dataclass
+class CorpusImage:
+    """Изображение набора и ожидаемые данные QR-кода"""
+
+    name: str
+    degradation: str
+    level: float
+    payload: str
+    image_data: bytes
+
+
+def make_payment_payload(index: int) -> str:
+    """Данные QR-кода оплаты в формате ST00012"""
+    name, inn, bank_name, bic = PAYEES[index % len(PAYEES)]
+    return "|".join(
+        [
+            "ST00012",
+            f"Name={name}",
+            f"PersonalAcc=4070281000000000{index:04d}",
+            f"BankName={bank_name}",
+            f"BIC={bic}",
+            "CorrespAcc=30101810400000000225",
+            f"PayeeINN={inn}",
+            "LastName=Иванов",
+            "FirstName=Иван",
+            f"PersAcc={100000 + index}",
+            "Purpose=Оплата жилищно-коммунальных услуг",
+            f"Sum={(index + 1) * 123456}",
+        ]
+    )
+
+
+def render_qr_code(text: str, module_size: float) -> np.ndarray:
+    """QR-код в оттенках серого, модуль которого занимает module_size пикселей"""
+    qr_code = cv2.QRCodeEncoder.create().encode(text)
+    interpolation = cv2.INTER_NEAREST if module_size >= 1 else cv2.INTER_AREA
+    return cv2.resize(qr_code, None, fx=module_size, fy=module_size, interpolation=interpolation)
+
+
+def place_on_canvas(qr_code: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Размещает QR-код в случайном месте светлого фона с текстоподобными полосами"""
+    height, width = CANVAS_SIZE
+    canvas = np.full((height, width), 225, dtype=np.uint8)
+    for y in range(40, height - 40, 36):
+        line_width = int(rng.integers(width // 3, width - 80))
+        canvas[y : y + 10, 40 : 40 + line_width] = 90
+
+    qr_height, qr_width = qr_code.shape
+    y = int(rng.integers(0, height - qr_height))
+    x = int(rng.integers(0, width - qr_width))
+    canvas[y : y + qr_height, x : x + qr_width] = qr_code
+    return canvas
+
+
+def blur(image: np.ndarray, level: float, _: np.random.Generator) -> np.ndarray:
+    return cv2.GaussianBlur(image, (0, 0), level)
+
+
+def noise(image: np.ndarray, level: float, rng: np.random.Generator) -> np.ndarray:
+    return np.clip(image + rng.normal(0, level, image.shape), 0, 255).astype(np.uint8)
+
+
+def low_contrast(image: np.ndarray, level: float, _: np.random.Generator) -> np.ndarray:
+    # level - итоговая разница яркости черного и белого
+    return (128 - level / 2 + image.astype(np.float32) * level / 255).astype(np.uint8)
+
+
+def rotation(image: np.ndarray, level: float, _: np.random.Generator) -> np.ndarray:
+    height, width = image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), level, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=225)
+
+
+def no_degradation(image: np.ndarray, _: float, __: np.random.Generator) -> np.ndarray:
+    return image
+
+
+# Искажение: (функция, уровни искажения)
+DEGRADATIONS: dict[
+    str, tuple[Callable[[np.ndarray, float, np.random.Generator], np.ndarray], list[float]]
+] = {
+    "clean": (no_degradation, [0]),
+    "blur": (blur, [1.0, 2.0, 3.0]),
+    "noise": (noise, [10, 25, 40]),
+    "low_contrast": (low_contrast, [80, 40, 20]),
+    "rotation": (rotation, [10, 30, 45]),
+    # level - размер модуля QR-кода в пикселях
+    "small_module": (no_degradation, [2.0, 1.5, 1.2]),
+    # Данные в CP1251, прочитанные как Latin-1 и закодированные в UTF-8
+    "cp1251": (no_degradation, [0]),
+}
+
+
+def generate_corpus(seed: int = 0, images_per_case: int = 2, module_size: float = 4.0) -> list[CorpusImage]:
+    """
+    Генерация воспроизводимого набора изображений
+    :param seed: Зерно генератора случайных чисел
+    :param images_per_case: Количество изображений на каждое сочетание искажения и уровня
+    :param module_size: Размер модуля QR-кода в пикселях (кроме small_module)
+    """
+    rng = np.random.default_rng(seed)
+    corpus = []
+    index = 0
+    for degradation, (degrade, levels) in DEGRADATIONS.items():
+        for level in levels:
+            for _ in range(images_per_case):
+                payload = make_payment_payload(index)
+                encoded_text = (
+                    payload.encode("cp1251").decode("latin-1") if degradation == "cp1251" else payload
+                )
+                size = level if degradation == "small_module" else module_size
+
+                image = degrade(place_on_canvas(render_qr_code(encoded_text, size), rng), level, rng)
+                _, image_data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+                corpus.append(
+                    CorpusImage(
+                        name=f"{degradation}_{level:g}_{index:03d}.jpg",
+                        degradation=degradation,
+                        level=level,
+                        payload=payload,
+                        image_data=image_data.tobytes(),
+                    )
+                )
+                index += 1
+    return corpus
@@ -0,0 +1,45 @@
+from app.api.qr_code_recognize.adaptive_pipeline import pipeline_scheduler
+from benchmarks.benchmark_recognition import compare_with_baseline, run_benchmark
+from benchmarks.qr_code_corpus import generate_corpus
+
+
+def test_generate_corpus_reproducible() -> None:
+    """Тест воспроизводимости набора изображений при одинаковом зерне"""
+    first = generate_corpus(seed=1, images_per_case=1)
+    second = generate_corpus(seed=1, images_per_case=1)
+
+    assert [image.image_data for image in first] == [image.image_data for image in second]
+    assert {image.degradation for image in first} >= {"clean", "blur", "small_module", "cp1251"}
+
+
+def test_run_benchmark_clean_images() -> None:
+    """Тест замера этапов: неискаженные QR-коды распознаются все"""
+    corpus = [
+        image for image in generate_corpus(images_per_case=1) if image.degradation in {"clean", "cp1251"}
+    ]
+    deterministic = pipeline_scheduler.deterministic
+    results = run_benchmark(corpus)
+
+    # Общий планировщик улучшений не переключается в детерминированный режим
+    assert pipeline_scheduler.deterministic == deterministic
+
+    assert results["images"] == len(corpus)
+    assert {"load", "decode: pyzbar", "decode: opencv", "get_qr_code_data"} <= results["stages"].keys()
+    assert results["recognition"] == {"total": 1.0, "clean": 1.0, "cp1251": 1.0}
+
+
+def test_compare_with_baseline() -> None:
+    """Тест обнаружения ухудшения задержки и доли распознанных"""
+    baseline = {"stages": {"decode": {"median_ms": 10.0}}, "recognition": {"total": 0.9}}
+
+    assert (
+        compare_with_baseline(
+            {"stages": {"decode": {"median_ms": 12.0}}, "recognition": {"total": 0.89}}, baseline
+        )
+        == []
+    )
+
+    regressions = compare_with_baseline(
+        {"stages": {"decode": {"median_ms": 13.0}}, "recognition": {"total": 0.85}}, baseline
+    )
+    assert len(regressions) == 2
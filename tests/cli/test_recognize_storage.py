@@ -0,0 +1,105 @@
+from pathlib import Path
+
+import cv2
+import orjson
+import pytest
+
+from app.api.file_storage.pack_storage import PACKS_DIR_NAME
+from app.cli.recognize_storage import iter_storage_files, main, recognize_storage
+from app.core.config import settings
+
+BLOB_NAME = "ee" * 32
+
+
+def make_storage(base_storage_path: Path) -> None:
+    qr_code = cv2.QRCodeEncoder.create().encode("ST00012|Name=ООО Ромашка|Sum=12345")
+    qr_code = cv2.resize(qr_code, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+
+    for file_id in ["aaaa0000-qr", "aabb0000-qr", "bbcc0000-qr"]:
+        target_dir = base_storage_path / file_id[:2] / file_id[2:4]
+        target_dir.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(target_dir / f"{file_id}.png"), qr_code)
+
+    (base_storage_path / "cc" / "dd").mkdir(parents=True)
+    (base_storage_path / "cc" / "dd" / "ccdd0000-empty.jpg").write_bytes(b"fake_image_data")
+    # Файл, сохраненный по хэшу содержимого, и две загрузки с таким содержимым
+    (base_storage_path / "ee" / "ee").mkdir(parents=True)
+    (base_storage_path / "ee" / "ee" / BLOB_NAME).write_bytes(b"fake_image_data")
+    (base_storage_path / "cc" / "dd" / "ccdd0001-ref.ref").write_text(f"{BLOB_NAME}.jpg")
+    (base_storage_path / "cc" / "dd" / "ccdd0002-ref.ref").write_text(f"{BLOB_NAME}.jpg")
+    (base_storage_path / ".tmp").mkdir()
+    (base_storage_path / ".tmp" / "upload.jpg").write_bytes(b"fake_image_data")
+
+
+def test_iter_storage_files(tmp_path: Path) -> None:
+    """Тест обхода хранилища: служебные файлы пропускаются, блобы возвращаются по ссылкам"""
+    make_storage(tmp_path)
+
+    assert [(file_id, path.name) for file_id, path in iter_storage_files(tmp_path)] == [
+        ("aaaa0000-qr", "aaaa0000-qr.png"),
+        ("aabb0000-qr", "aabb0000-qr.png"),
+        ("bbcc0000-qr", "bbcc0000-qr.png"),
+        ("ccdd0000-empty", "ccdd0000-empty.jpg"),
+        ("ccdd0001-ref", BLOB_NAME),
+        ("ccdd0002-ref", BLOB_NAME),
+    ]
+
+
+def test_recognize_storage_resume(tmp_path: Path) -> None:
+    """Тест распознавания хранилища и продолжения обработки"""
+    storage_path, output_path = tmp_path / "storage", tmp_path / "results.jsonl"
+    make_storage(storage_path)
+
+    summary = recognize_storage(storage_path, output_path, processes=2, chunk_size=2)
+
+    assert summary["total"] == 6
+    assert summary["recognized"] == 3
+    assert summary["not_found"] == 3
+
+    results = [orjson.loads(line) for line in output_path.read_bytes().splitlines()]
+    assert {result["file_id"] for result in results} == {
+        "aaaa0000-qr",
+        "aabb0000-qr",
+        "bbcc0000-qr",
+        "ccdd0000-empty",
+        "ccdd0001-ref",
+        "ccdd0002-ref",
+    }
+
+    # Повторный запуск с resume не обрабатывает файлы заново
+    assert recognize_storage(storage_path, output_path, processes=1, resume=True)["total"] == 0
+    assert len(output_path.read_bytes().splitlines()) == 6
+
+
+def test_recognize_storage_resume_after_incomplete_line(tmp_path: Path) -> None:
+    """Тест продолжения обработки, прерванной во время записи строки результатов"""
+    storage_path, output_path = tmp_path / "storage", tmp_path / "results.jsonl"
+    make_storage(storage_path)
+    recognize_storage(storage_path, output_path, processes=1)
+    lines = output_path.read_bytes().splitlines(keepends=True)
+    output_path.write_bytes(b"".join(lines[:-1]) + lines[-1][:10])
+
+    assert recognize_storage(storage_path, output_path, processes=1, resume=True)["total"] == 1
+
+    results = [orjson.loads(line) for line in output_path.read_bytes().splitlines()]
+    assert sorted(result["file_id"] for result in results) == sorted(
+        orjson.loads(line)["file_id"] for line in lines
+    )
+
+
+def test_recognize_storage_pack_backend_not_supported(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Тест: для хранилища сегментов команда завершается с ошибкой, а не с пустым результатом"""
+    output_path = tmp_path / "results.jsonl"
+    (tmp_path / "storage" / PACKS_DIR_NAME).mkdir(parents=True)
+    with pytest.raises(SystemExit) as exc_info:
+        main(["--storage", str(tmp_path / "storage"), "--output", str(output_path)])
+    assert exc_info.value.code == 1
+    assert "FILE_STORAGE_BACKEND=pack" in capsys.readouterr().err
+    assert not output_path.exists()
+
+    monkeypatch.setattr(settings, "FILE_STORAGE_BACKEND", "pack")
+    with pytest.raises(SystemExit) as exc_info:
+        main(["--storage", str(tmp_path), "--output", str(output_path)])
+    assert exc_info.value.code == 1
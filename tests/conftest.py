@@ -3,9 +3,22 @@ from collections.abc import Generator
 import pytest
 from fastapi.testclient import TestClient
 
+from app.api.file_storage.api import file_index, recognition_job_queue
 from app.main import app
 
 
+@pytest.fixture(scope="session", autouse=True)
+def isolated_databases(tmp_path_factory: pytest.TempPathFactory) -> Generator[None]:
+    """Индекс файлов и очередь распознавания приложения пишутся во временную директорию, а не в file_storage"""
+    db_dir = tmp_path_factory.mktemp("db")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(file_index, "db_path", db_dir / file_index.db_path.name)
+        monkeypatch.setattr(recognition_job_queue, "db_path", db_dir / recognition_job_queue.db_path.name)
+        yield
+        file_index.close()
+        recognition_job_queue.close()
+
+
 @pytest.fixture(scope="module")
 def client() -> Generator[TestClient]:
     with TestClient(app) as c:
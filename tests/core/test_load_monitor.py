@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from app.core.load_monitor import LoadMonitor
+
+
+def test_load_monitor_overload_reasons() -> None:
+    """Тест причин перегрузки: заполненность очереди и количество запросов маршрута"""
+    queue_depth = 0
+    load_monitor = LoadMonitor(max_event_loop_lag_sec=0.5, max_queue_ratio=0.5, max_in_flight=1)
+    load_monitor.register_queue("recognition", lambda: queue_depth, capacity=4)
+    assert load_monitor.get_overload_reasons() == []
+
+    queue_depth = 2
+    load_monitor.request_started("/route")
+    load_monitor.request_started("/route")
+    assert load_monitor.in_flight == {"/route": 2}
+    assert load_monitor.get_overload_reasons() == ["recognition_queue"]
+    assert load_monitor.get_overload_reasons("/route") == ["recognition_queue", "in_flight"]
+
+    load_monitor.request_finished("/route")
+    load_monitor.request_finished("/route")
+    assert load_monitor.in_flight == {}
+    assert load_monitor.get_queue_depths() == {"recognition": {"depth": 2, "capacity": 4}}
+
+
+def test_load_monitor_event_loop_lag() -> None:
+    """Тест замера задержки event loop, занятого синхронной работой"""
+    load_monitor = LoadMonitor(sample_interval_sec=0.05, max_event_loop_lag_sec=0.1)
+
+    async def block_event_loop() -> None:
+        task = asyncio.create_task(load_monitor.sample_event_loop_lag())
+        await asyncio.sleep(0)
+        time.sleep(0.2)
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(block_event_loop())
+    assert load_monitor.event_loop_lag_sec >= 0.1
+    assert load_monitor.get_overload_reasons() == ["event_loop_lag"]
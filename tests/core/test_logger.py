@@ -0,0 +1,86 @@
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app import logger as app_logger
+from app.logger import ContextQueueHandler, JSONFormatter, logger, request_id_var
+from app.main import app
+
+
+class RecordCollector(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def log_in_child_process() -> None:
+    try:
+        raise ValueError("ошибка в дочернем процессе")
+    except ValueError:
+        logger.exception("Запись из процесса %s", os.getpid(), extra={"elapsed_ms": 1.5})
+
+
+def test_queue_handler_defers_formatting() -> None:
+    """Тест: запись попадает в очередь с request_id, но без форматирования сообщения"""
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    test_logger = logging.getLogger("test_queue_handler")
+    test_logger.propagate = False
+    test_logger.handlers = [ContextQueueHandler(log_queue)]
+
+    token = request_id_var.set("request-1")
+    try:
+        test_logger.warning("QR-код не найден на %s", "qr_code.jpg", extra={"elapsed_ms": 12.5})
+    finally:
+        request_id_var.reset(token)
+
+    record = log_queue.get_nowait()
+    assert record.msg == "QR-код не найден на %s"
+    assert record.args == ("qr_code.jpg",)
+
+    log_data = orjson.loads(JSONFormatter().format(record))
+    assert log_data["message"] == "QR-код не найден на qr_code.jpg"
+    assert log_data["request_id"] == "request-1"
+    assert log_data["elapsed_ms"] == 12.5
+    assert log_data["level"] == "WARNING"
+
+
+def test_request_id_header() -> None:
+    """Тест: идентификатор запроса из заголовка возвращается в ответе, иначе генерируется новый"""
+    client = TestClient(app)
+
+    response = client.get("/system/health/detailed", headers={"X-Request-ID": "test-request-id"})
+    assert response.headers["X-Request-ID"] == "test-request-id"
+
+    response = client.get("/system/health/detailed")
+    assert len(response.headers["X-Request-ID"]) == 32
+
+
+def test_child_process_logs_written_by_parent(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: записи дочернего процесса пишет основной процесс (один обработчик файла лога на все процессы)"""
+    collector = RecordCollector()
+    assert app_logger._process_queue_listener is not None
+    monkeypatch.setattr(app_logger._process_queue_listener, "handlers", (collector,))
+
+    process = multiprocessing.get_context("fork").Process(target=log_in_child_process)
+    process.start()
+    process.join(timeout=10)
+    assert process.exitcode == 0
+
+    deadline = time.monotonic() + 5
+    while not collector.records and time.monotonic() < deadline:
+        time.sleep(0.05)
+    (record,) = collector.records
+    assert record.process == process.pid
+    assert record.getMessage().startswith(f"Запись из процесса {process.pid}")
+    assert "ValueError: ошибка в дочернем процессе" in record.getMessage()
+    assert record.request_id == "-"  # type: ignore[attr-defined]
+    assert record.elapsed_ms == 1.5  # type: ignore[attr-defined]
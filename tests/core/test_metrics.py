@@ -0,0 +1,28 @@
+from app.core.metrics import MetricsRegistry
+
+
+def test_metrics_drain_and_merge() -> None:
+    """Тест передачи метрик процесса распознавания в основной процесс"""
+    worker_metrics = MetricsRegistry()
+    worker_metrics.inc("qr_recognition_success_total", step="Upscale (x2.0)")
+    worker_metrics.observe("qr_recognition_stage_duration_seconds", 0.02, stage="decode")
+
+    main_metrics = MetricsRegistry()
+    main_metrics.merge(worker_metrics.drain())
+    main_metrics.merge(worker_metrics.drain())
+
+    rendered = main_metrics.render()
+    assert 'qr_recognition_success_total{step="Upscale (x2.0)"} 1' in rendered
+    assert 'qr_recognition_stage_duration_seconds_bucket{stage="decode",le="0.01"} 0' in rendered
+    assert 'qr_recognition_stage_duration_seconds_bucket{stage="decode",le="0.025"} 1' in rendered
+    assert 'qr_recognition_stage_duration_seconds_count{stage="decode"} 1' in rendered
+
+
+def test_metrics_disabled() -> None:
+    """Тест отключенных метрик: ничего не записывается"""
+    disabled_metrics = MetricsRegistry(enabled=False)
+    disabled_metrics.inc("qr_recognition_success_total", step="Без улучшения")
+    with disabled_metrics.timer("qr_recognition_stage_duration_seconds", stage="decode"):
+        pass
+
+    assert disabled_metrics.render() == "\n"
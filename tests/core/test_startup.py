@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.startup import get_process_uptime_sec
+
+_ROOT_DIRECTORY = Path(__file__).resolve().parent.parent.parent
+
+
+def test_app_import_without_recognition_modules() -> None:
+    """Тест: импорт приложения не загружает модули распознавания (cv2, numpy, pyzbar)"""
+    code = "import sys, app.main; print(sorted({'cv2', 'numpy', 'pyzbar'} & set(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=_ROOT_DIRECTORY, env=os.environ, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_get_process_uptime_sec() -> None:
+    """Тест времени с запуска процесса"""
+    uptime_sec = get_process_uptime_sec()
+    if sys.platform == "linux":
+        assert uptime_sec is not None and 0 <= uptime_sec < 24 * 60 * 60
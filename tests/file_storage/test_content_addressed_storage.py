@@ -0,0 +1,79 @@
+import asyncio
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+
+from app.api.file_storage.storage import FilesystemStorage
+from app.api.file_storage.utils import (
+    LINKS_DIR_SUFFIX,
+    FileTooLargeError,
+    get_stored_file_by_uuid,
+    save_file,
+    write_to_tmp_file,
+)
+
+
+def test_content_addressed_duplicate_upload(tmp_path: Path) -> None:
+    """Тест повторной загрузки одинакового файла в режиме хранения по хэшу"""
+    image_data = b"fake_image_data"
+
+    async def upload(filename: str) -> dict:
+        file = UploadFile(file=io.BytesIO(image_data), filename=filename)
+        return await save_file(file, tmp_path, content_addressed=True)
+
+    first = asyncio.run(upload("test_image.png"))
+    # Расширение не входит в ключ блоба: то же содержимое с другим расширением - дубликат
+    second = asyncio.run(upload("test_image.jpg"))
+
+    assert first["file_id"] != second["file_id"]
+    assert first["content_hash"] == second["content_hash"]
+    assert first["duplicate"] is False
+    assert second["duplicate"] is True
+
+    first_path, first_extension = get_stored_file_by_uuid(first["file_id"], tmp_path)
+    assert (first_path, ".jpg") == get_stored_file_by_uuid(second["file_id"], tmp_path)
+    assert first_extension == ".png"
+    assert Path(first_path).name == first["content_hash"]
+    assert Path(first_path).read_bytes() == image_data
+    # Один блоб и по ссылке на него на каждую загрузку
+    links_dir = Path(first_path).with_name(f"{first['content_hash']}{LINKS_DIR_SUFFIX}")
+    blobs = [
+        path
+        for path in tmp_path.rglob("*")
+        if path.is_file() and path.suffix != ".ref" and path.parent != links_dir
+    ]
+    assert [path.name for path in blobs] == [first["content_hash"]]
+    assert sorted(path.name for path in links_dir.iterdir()) == sorted([first["file_id"], second["file_id"]])
+
+
+def test_content_addressed_delete(tmp_path: Path) -> None:
+    """Тест удаления в режиме хранения по хэшу: блоб удаляется вместе с последней ссылкой на него"""
+    storage = FilesystemStorage(tmp_path, content_addressed=True)
+
+    async def upload() -> dict:
+        file = UploadFile(file=io.BytesIO(b"fake_image_data"), filename="test_image.png")
+        return await save_file(file, tmp_path, storage=storage)
+
+    first, second = asyncio.run(upload()), asyncio.run(upload())
+    blob_path = Path(storage.get_file_path(first["file_id"]))
+
+    assert storage.delete(first["file_id"])
+    assert blob_path.exists()
+    assert storage.read(second["file_id"]) == (b"fake_image_data", ".png")
+
+    assert storage.delete(second["file_id"])
+    assert not storage.delete(second["file_id"])
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+    assert not blob_path.with_name(f"{blob_path.name}{LINKS_DIR_SUFFIX}").exists()
+
+
+def test_save_file_too_large(tmp_path: Path) -> None:
+    """Тест прерывания записи файла больше допустимого размера"""
+    file = UploadFile(file=io.BytesIO(b"0" * 1024), filename="test_image.jpg")
+
+    with pytest.raises(FileTooLargeError):
+        asyncio.run(write_to_tmp_file(file, tmp_path, "test_image", chunk_size=100, max_size=500))
+
+    assert list(tmp_path.rglob("*.part")) == []
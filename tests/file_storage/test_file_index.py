@@ -0,0 +1,85 @@
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api.file_storage.file_index import FileIndex
+from app.main import app
+
+
+def test_file_index(tmp_path: Path) -> None:
+    """Тест пакетной записи индекса файлов: чтение до и после записи в БД"""
+    file_index = FileIndex(tmp_path / "index.sqlite3", batch_size=100, flush_interval_sec=60)
+
+    file_index.add("file-1", ".png", 100, "hash-1", content_type="image/png", file_name="a.png")
+    file_index.add("file-2", ".jpg", 200, "hash-2", content_type="image/jpeg", file_name="b.jpg")
+    file_index.set_recognition("file-1", "recognized", {"Sum": "123,45"})
+
+    # Еще не записанные данные доступны для чтения
+    stored_file = file_index._get("file-1")
+    assert stored_file is not None
+    assert stored_file.extension == ".png"
+    assert stored_file.recognition_result == {"Sum": "123,45"}
+
+    file_index.flush()
+    file_index.set_recognition("file-2", "not_found", None)
+    assert file_index._get("file-2").recognition_status == "not_found"  # type: ignore[union-attr]
+
+    assert file_index._stats() == {
+        "total": 2,
+        "total_size_byte": 300,
+        "by_recognition_status": {"recognized": 1, "not_found": 1},
+    }
+    assert [f.id for f in file_index._list(10, 0, "recognized")] == ["file-1"]
+
+    with file_index.engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    file_index.close()
+
+    # Данные сохраняются между перезапусками
+    reopened_index = FileIndex(tmp_path / "index.sqlite3")
+    assert reopened_index._get("file-1").content_hash == "hash-1"  # type: ignore[union-attr]
+    reopened_index.close()
+
+
+def test_file_index_flush_retried_after_error(tmp_path: Path) -> None:
+    """Тест фонового сброса пакета: после ошибки записи сброс повторяется по таймеру"""
+    # Вместо директории БД - файл: подключение к БД не создается
+    (tmp_path / "db").write_bytes(b"")
+    file_index = FileIndex(tmp_path / "db" / "index.sqlite3", batch_size=100, flush_interval_sec=0.05)
+
+    file_index.add("file-1", ".png", 100, "hash-1")
+    time.sleep(0.2)
+    assert file_index._pending_inserts
+
+    (tmp_path / "db").unlink()
+    deadline = time.monotonic() + 5
+    while file_index._pending_inserts and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not file_index._pending_inserts
+    assert file_index._get("file-1").content_hash == "hash-1"  # type: ignore[union-attr]
+    file_index.close()
+
+
+def test_files_list_and_stats() -> None:
+    """Тест списка и статистики файлов после загрузки"""
+    client = TestClient(app)
+
+    image_data = cv2.imencode(".png", np.zeros((8, 8), dtype=np.uint8))[1].tobytes()
+    files = {"file": ("indexed.png", image_data, "image/png")}
+    file_id = client.post("/file-storage/upload-image/", files=files).json()["file_id"]
+
+    response = client.get("/file-storage/files/", params={"limit": 1000})
+    assert response.status_code == 200
+    stored_file = next(f for f in response.json() if f["id"] == file_id)
+    assert stored_file["extension"] == ".png"
+    assert stored_file["file_name"] == "indexed.png"
+
+    response = client.get("/file-storage/files/stats")
+    assert response.status_code == 200
+    assert response.json()["total"] >= 1
+
+    assert client.get(f"/file-storage/files/{file_id}").content == image_data
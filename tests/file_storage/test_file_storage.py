@@ -1,14 +1,40 @@
+import asyncio
+import io
+import zipfile
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+import orjson
+import pytest
 from fastapi.testclient import TestClient
 
+from app.api.file_storage import api
+from app.api.file_storage.storage import FilesystemStorage
+from app.api.qr_code_recognize.recognition_executor import RecognitionExecutorBusyError
+from app.core.config import settings
 from app.main import app
 
+# Минимальный GIF 1x1 (OpenCV не записывает GIF)
+GIF_IMAGE_DATA = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff"
+    b"!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+def make_image_data(extension: str = ".jpg", width: int = 64, height: int = 48) -> bytes:
+    if extension == ".gif":
+        return GIF_IMAGE_DATA
+    return cv2.imencode(extension, np.full((height, width), 255, dtype=np.uint8))[1].tobytes()
+
 
 def test_upload_image_success() -> None:
     """Тест успешной загрузки изображения"""
     client = TestClient(app)
 
     # Создаем тестовое изображение в памяти
-    image_data = b"fake_image_data"
+    image_data = make_image_data()
     files = {"file": ("test_image.jpg", image_data, "image/jpeg")}
 
     response = client.post("/file-storage/upload-image/", files=files)
@@ -61,7 +87,7 @@ def test_upload_image_different_image_types() -> None:
     ]
 
     for filename, content_type in supported_types:
-        image_data = b"fake_image_data"
+        image_data = make_image_data(f".{filename.rsplit('.', 1)[-1]}")
         files = {"file": (filename, image_data, content_type)}
 
         response = client.post("/file-storage/upload-image/", files=files)
@@ -78,7 +104,7 @@ def test_upload_image_large_filename() -> None:
     client = TestClient(app)
 
     long_filename = "a" * 100 + ".jpg"
-    image_data = b"fake_image_data"
+    image_data = make_image_data()
     files = {"file": (long_filename, image_data, "image/jpeg")}
 
     response = client.post("/file-storage/upload-image/", files=files)
@@ -87,3 +113,148 @@ def test_upload_image_large_filename() -> None:
 
     response_data = response.json()
     assert response_data["file_name"] == long_filename
+
+
+def test_get_qr_code_data() -> None:
+    """Тест распознавания QR-кода оплаты"""
+    client = TestClient(app)
+
+    qr_code = cv2.QRCodeEncoder.create().encode("ST00012|Name=ООО Ромашка|Sum=12345")
+    qr_code = cv2.resize(qr_code, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+    qr_code = cv2.copyMakeBorder(qr_code, 40, 40, 40, 40, cv2.BORDER_CONSTANT, value=255)
+    _, image_data = cv2.imencode(".jpg", qr_code)
+    files = {"file": ("qr_code.jpg", image_data.tobytes(), "image/jpeg")}
+
+    response = client.post("/file-storage/get-qr-code-data/", files=files)
+
+    assert response.status_code == 200
+
+    qr_code_data_result = response.json()["qr_code_data_result"]
+    assert qr_code_data_result["Name"] == "ООО Ромашка"
+    assert qr_code_data_result["Sum"] == "123,45"
+
+
+@pytest.mark.parametrize("content_addressed", [False, True])
+@pytest.mark.parametrize(
+    ("error", "status_code"), [(RecognitionExecutorBusyError(), 429), (TimeoutError(), 504)]
+)
+def test_get_qr_code_data_rejected_not_saved(
+    error: Exception,
+    status_code: int,
+    content_addressed: bool,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Тест: файл, распознавание которого отклонено, не остается в хранилище и индексе файлов"""
+    client = TestClient(app)
+
+    async def reject(*_: Any) -> Any:
+        # Распознавание дольше сохранения: к моменту отказа файл уже сохранен
+        await asyncio.sleep(0.2)
+        raise error
+
+    monkeypatch.setattr(api, "file_storage", FilesystemStorage(tmp_path, content_addressed))
+    monkeypatch.setattr(api.recognition_executor, "run", reject)
+    monkeypatch.setattr(settings, "RECOGNITION_CACHE_ENABLED", False)
+    files_before = api.file_index._stats()["total"]
+
+    files = {"file": ("rejected.png", make_image_data(".png"), "image/png")}
+    response = client.post("/file-storage/get-qr-code-data/", files=files)
+
+    assert response.status_code == status_code
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+    assert api.file_index._stats()["total"] == files_before
+
+
+def test_upload_image_too_large() -> None:
+    """Тест отклонения слишком большого файла"""
+    client = TestClient(app)
+
+    image_data = b"0" * (settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE + 1)
+    files = {"file": ("test_image.jpg", image_data, "image/jpeg")}
+
+    response = client.post("/file-storage/upload-image/", files=files)
+
+    assert response.status_code == 413
+
+
+def test_get_qr_code_data_batch_larger_than_single_file() -> None:
+    """Тест пакета, общий размер которого больше предела одного файла: предел пакета свой"""
+    client = TestClient(app)
+
+    file_data = b"0" * (settings.FILE_STORAGE_MAX_UPLOAD_SIZE_BYTE // 2 + 128 * 1024)
+    files = [("files", (f"photo_{i}.jpg", file_data, "image/jpeg")) for i in range(2)]
+
+    response = client.post("/file-storage/get-qr-code-data/batch/", files=files)
+
+    assert response.status_code == 200
+    assert orjson.loads(response.text.splitlines()[-1])["summary"]["total"] == 2
+
+
+def test_get_qr_code_data_batch() -> None:
+    """Тест пакетного распознавания изображений и zip-архива"""
+    client = TestClient(app)
+
+    qr_code = cv2.QRCodeEncoder.create().encode("ST00012|Name=ООО Ромашка|Sum=12345")
+    qr_code = cv2.resize(qr_code, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+    _, image_data = cv2.imencode(".png", qr_code)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("photos/qr_code_in_zip.png", image_data.tobytes())
+        zip_file.writestr("photos/readme.txt", b"text")
+
+    files = [
+        ("files", ("qr_code.png", image_data.tobytes(), "image/png")),
+        ("files", ("empty.jpg", make_image_data(), "image/jpeg")),
+        ("files", ("fake.jpg", b"fake_image_data", "image/jpeg")),
+        ("files", ("photos.zip", archive.getvalue(), "application/zip")),
+    ]
+
+    response = client.post("/file-storage/get-qr-code-data/batch/", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    results = {line["file_name"]: line for line in lines[:-1]}
+    assert results["qr_code.png"]["status"] == "recognized"
+    assert results["qr_code.png"]["qr_code_data_result"]["Sum"] == "123,45"
+    assert results["qr_code_in_zip.png"]["status"] == "recognized"
+    assert results["empty.jpg"]["status"] == "not_found"
+    assert results["fake.jpg"]["status"] == "error"
+    assert results["readme.txt"]["status"] == "error"
+    assert lines[-1]["summary"] == {
+        "total": 5,
+        "recognized": 2,
+        "not_found": 1,
+        "error": 2,
+        "elapsed_sec": lines[-1]["summary"]["elapsed_sec"],
+    }
+
+
+def test_download_file() -> None:
+    """Тест получения сохраненного файла: расширение при сохранении, Range и If-None-Match"""
+    client = TestClient(app)
+
+    image_data = make_image_data(".png")
+    files = {"file": ("image.png", image_data, "image/png")}
+    file_id = client.post("/file-storage/upload-image/", files=files).json()["file_id"]
+
+    response = client.get(f"/file-storage/files/{file_id}")
+    assert response.status_code == 200
+    assert response.content == image_data
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(f"/file-storage/files/{file_id}", headers={"Range": "bytes=0-7"})
+    assert response.status_code == 206
+    assert response.content == image_data[:8]
+
+    etag = response.headers["etag"]
+    response = client.get(f"/file-storage/files/{file_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    assert client.get("/file-storage/files/00000000-0000-0000-0000-000000000000").status_code == 404
+    assert client.get("/file-storage/files/not-a-uuid").status_code == 404
@@ -0,0 +1,72 @@
+import io
+import struct
+import zlib
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.file_storage.image_probe import (
+    ImageDimensionsError,
+    InvalidImageError,
+    probe_image,
+    validate_image,
+)
+from app.main import app
+
+
+def make_png_header(width: int, height: int) -> bytes:
+    """Заголовок PNG с заданными размерами (без данных изображения)"""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + b"IHDR"
+        + ihdr
+        + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    )
+
+
+@pytest.mark.parametrize("extension, image_format", [(".jpg", "jpeg"), (".png", "png"), (".webp", "webp")])
+def test_probe_image(extension: str, image_format: str) -> None:
+    """Тест определения формата и размеров по заголовку"""
+    image_data = cv2.imencode(extension, np.zeros((30, 50, 3), dtype=np.uint8))[1].tobytes()
+    file = io.BytesIO(image_data)
+
+    assert probe_image(file) == (image_format, 50, 30)
+    assert file.tell() == 0
+
+
+def test_probe_jpeg_with_large_segment() -> None:
+    """Тест пропуска больших сегментов JPEG (EXIF) до сегмента с размерами"""
+    image_data = cv2.imencode(".jpg", np.zeros((30, 50), dtype=np.uint8))[1].tobytes()
+    app1 = b"\xff\xe1" + struct.pack(">H", 60_002) + b"\x00" * 60_000
+    assert probe_image(io.BytesIO(image_data[:2] + app1 + image_data[2:])) == ("jpeg", 50, 30)
+
+
+def test_validate_image_rejected() -> None:
+    """Тест отклонения не изображений, обрезанных заголовков и слишком больших размеров"""
+    with pytest.raises(InvalidImageError):
+        probe_image(io.BytesIO(b"fake_image_data"))
+    with pytest.raises(InvalidImageError):
+        probe_image(io.BytesIO(b"\xff\xd8\xff\xe0\x00\x10JFIF"))
+
+    bomb = io.BytesIO(make_png_header(100_000, 100_000))
+    with pytest.raises(ImageDimensionsError):
+        validate_image(bomb, max_dimension=200_000, max_pixels=100_000_000)
+    with pytest.raises(ImageDimensionsError):
+        validate_image(bomb, max_dimension=20_000, max_pixels=10**12)
+
+
+def test_upload_image_rejected_by_header() -> None:
+    """Тест отклонения файла по содержимому до сохранения"""
+    client = TestClient(app)
+
+    files = {"file": ("text.jpg", b"not an image at all", "image/jpeg")}
+    response = client.post("/file-storage/upload-image/", files=files)
+    assert response.status_code == 400
+
+    files = {"file": ("bomb.png", make_png_header(60_000, 60_000), "image/png")}
+    response = client.post("/file-storage/get-qr-code-data/", files=files)
+    assert response.status_code == 422
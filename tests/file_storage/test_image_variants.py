@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.file_storage import api
+from app.api.file_storage.image_variants import ImageVariantStore
+from app.api.file_storage.storage import FilesystemStorage
+from app.api.file_storage.utils import get_img_name_uuid4, get_sharded_dir
+from app.main import app
+
+
+def make_image_data(width: int = 2000, height: int = 1500) -> bytes:
+    image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def save_image(base_storage_path: Path) -> str:
+    file_id = get_img_name_uuid4()
+    target_dir = get_sharded_dir(file_id, base_storage_path)
+    target_dir.mkdir(parents=True)
+    (target_dir / f"{file_id}.png").write_bytes(make_image_data())
+    return file_id
+
+
+def test_image_variant_store(tmp_path: Path) -> None:
+    """Тест построения превью и вытеснения давно не запрашивавшихся при превышении размера"""
+    store = ImageVariantStore(tmp_path, widths=[256])
+    first_id, second_id = save_image(tmp_path), save_image(tmp_path)
+
+    first_variant = store.get_variant(first_id, 256)
+    assert cv2.imread(str(first_variant)).shape[1] == 256
+    assert store.get_variant(first_id, 256) == first_variant
+
+    # Лимит вмещает одно превью: при построении второго первое удаляется
+    store.max_total_bytes = first_variant.stat().st_size + 1
+    second_variant = store.get_variant(second_id, 256)
+    assert second_variant.exists()
+    assert not first_variant.exists()
+
+    # Индекс восстанавливается обходом хранилища
+    assert ImageVariantStore(tmp_path, widths=[256])._load_index() == {second_variant: store.total_bytes}
+
+
+def test_image_variant_store_read_evicted(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест чтения превью, вытесненного другим запросом сразу после построения"""
+    store = ImageVariantStore(tmp_path, widths=[256])
+    file_id = save_image(tmp_path)
+    get_variant = store.get_variant
+    calls = []
+
+    def get_evicted_variant(file_id: str, width: int) -> Path:
+        variant_path = get_variant(file_id, width)
+        calls.append(variant_path)
+        if len(calls) == 1:
+            variant_path.unlink()
+        return variant_path
+
+    monkeypatch.setattr(store, "get_variant", get_evicted_variant)
+
+    variant_path, variant_data = store.read_variant(file_id, 256)
+
+    assert len(calls) == 2
+    assert variant_data == variant_path.read_bytes()
+    assert cv2.imdecode(np.frombuffer(variant_data, dtype=np.uint8), cv2.IMREAD_COLOR).shape[1] == 256
+
+
+def test_download_file_preview() -> None:
+    """Тест получения превью загруженного изображения"""
+    client = TestClient(app)
+
+    files = {"file": ("photo.png", make_image_data(), "image/png")}
+    file_id = client.post("/file-storage/upload-image/", files=files).json()["file_id"]
+
+    response = client.get(f"/file-storage/files/{file_id}/preview?width=256")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    preview_data = response.content
+    preview = cv2.imdecode(np.frombuffer(preview_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert preview.shape[:2] == (192, 256)
+
+    response = client.get(
+        f"/file-storage/files/{file_id}/preview?width=256",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+    response = client.head(f"/file-storage/files/{file_id}/preview?width=256")
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == len(preview_data)
+
+    assert client.get(f"/file-storage/files/{file_id}/preview?width=100").status_code == 400
+
+
+@pytest.mark.parametrize("content_addressed", [False, True])
+def test_delete_file_removes_previews(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, content_addressed: bool
+) -> None:
+    """Тест: превью удаляются вместе с оригиналом, а превью общего блоба - вместе с последней ссылкой"""
+    storage = FilesystemStorage(tmp_path, content_addressed=content_addressed)
+    monkeypatch.setattr(api, "file_storage", storage)
+    monkeypatch.setattr(api.image_variant_store, "storage", storage)
+    monkeypatch.setattr(api.image_variant_store, "base_storage_path", tmp_path)
+
+    files = {"file": ("photo.png", make_image_data(), "image/png")}
+    file_ids = [client.post("/file-storage/upload-image/", files=files).json()["file_id"] for _ in range(2)]
+    for file_id in file_ids:
+        assert client.get(f"/file-storage/files/{file_id}/preview?width=256").status_code == 200
+    assert len(list(tmp_path.glob("??/??/.variants/*"))) == (1 if content_addressed else 2)
+
+    assert client.delete(f"/file-storage/files/{file_ids[0]}").status_code == 204
+    assert len(list(tmp_path.glob("??/??/.variants/*"))) == 1
+    assert client.get(f"/file-storage/files/{file_ids[1]}/preview?width=256").status_code == 200
+
+    assert client.delete(f"/file-storage/files/{file_ids[1]}").status_code == 204
+    assert not list(tmp_path.glob("??/??/.variants/*"))
@@ -0,0 +1,206 @@
+import os
+import threading
+from pathlib import Path
+from uuid import uuid4
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.file_storage import api
+from app.api.file_storage.pack_storage import PackStorage, PackStorageLockedError
+from app.api.file_storage.storage import PackFileStorage
+
+
+def test_pack_storage_rotation_and_reload(tmp_path: Path) -> None:
+    """Тест записи и чтения из закрытых и текущего сегментов, загрузки индекса после перезапуска"""
+    storage = PackStorage(tmp_path, segment_max_bytes=700, fsync_interval_sec=0)
+    files = {str(uuid4()): bytes([i]) * 300 for i in range(5)}
+    for file_id, data in files.items():
+        storage.put(file_id, ".jpg", data)
+
+    assert storage.stats()["segments"] == 3
+    assert len(list(tmp_path.glob("*.idx"))) == 2
+    for file_id, data in files.items():
+        assert storage.read(file_id) == (data, ".jpg")
+    storage.close()
+
+    storage = PackStorage(tmp_path, segment_max_bytes=700)
+    for file_id, data in files.items():
+        assert storage.read(file_id) == (data, ".jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.read(str(uuid4()))
+    storage.close()
+
+
+def test_pack_storage_delete_and_compact(tmp_path: Path) -> None:
+    """Тест удаления и пересборки сегментов: удаленные файлы не появляются после перезапуска"""
+    storage = PackStorage(tmp_path, segment_max_bytes=1000, fsync_interval_sec=0)
+    file_ids = [str(uuid4()) for _ in range(6)]
+    for file_id in file_ids:
+        storage.put(file_id, ".png", file_id.encode() * 8)
+
+    assert storage.delete(file_ids[0])
+    assert storage.delete(file_ids[2])
+    assert not storage.delete(file_ids[0])
+    assert storage.compact(min_dead_ratio=0.5) == 1
+    assert storage.stats()["files"] == 4
+    storage.close()
+
+    storage = PackStorage(tmp_path, segment_max_bytes=1000)
+    for file_id in file_ids[1:2] + file_ids[3:]:
+        assert storage.read(file_id)[0] == file_id.encode() * 8
+    for file_id in (file_ids[0], file_ids[2]):
+        assert storage.get_entry(file_id) is None
+    storage.close()
+
+
+def test_pack_storage_compact_does_not_block_writes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: во время копирования сегмента файлы записываются, читаются и удаляются, изменения не теряются"""
+    storage = PackStorage(tmp_path, segment_max_bytes=1000, fsync_interval_sec=0)
+    file_ids = [str(uuid4()) for _ in range(6)]
+    for file_id in file_ids:
+        storage.put(file_id, ".png", file_id.encode() * 8)
+    assert storage.delete(file_ids[0])
+    assert storage.delete(file_ids[2])
+
+    copy_started = threading.Event()
+    resume_copy = threading.Event()
+    pread = os.pread
+
+    def blocking_pread(fd: int, length: int, offset: int) -> bytes:
+        copy_started.set()
+        assert resume_copy.wait(timeout=10)
+        return pread(fd, length, offset)
+
+    monkeypatch.setattr(os, "pread", blocking_pread)
+    compaction = threading.Thread(target=storage.compact)
+    compaction.start()
+    assert copy_started.wait(timeout=10)
+
+    new_file_id = str(uuid4())
+    storage.put(new_file_id, ".png", b"new image")
+    assert storage.delete(file_ids[1])
+    assert storage.read(file_ids[3])[0] == file_ids[3].encode() * 8
+    resume_copy.set()
+    compaction.join(timeout=10)
+    monkeypatch.setattr(os, "pread", pread)
+
+    live_file_ids = [*file_ids[3:], new_file_id]
+    for reloaded in (False, True):
+        if reloaded:
+            storage.close()
+            storage = PackStorage(tmp_path, segment_max_bytes=1000)
+        assert storage.stats()["files"] == len(live_file_ids)
+        for file_id in file_ids[3:]:
+            assert storage.read(file_id)[0] == file_id.encode() * 8
+        assert storage.read(new_file_id)[0] == b"new image"
+        for file_id in file_ids[:3]:
+            assert storage.get_entry(file_id) is None
+    storage.close()
+
+
+def test_pack_storage_torn_tail(tmp_path: Path) -> None:
+    """Тест восстановления после сбоя во время записи: оборванная запись отрезается"""
+    storage = PackStorage(tmp_path, fsync_interval_sec=0)
+    file_id = str(uuid4())
+    storage.put(file_id, ".jpg", b"image data")
+    storage.close()
+
+    (segment_path,) = tmp_path.glob("*.pack")
+    size = segment_path.stat().st_size
+    with open(segment_path, "ab") as f:
+        f.write(b"QRPK\x00" + b"\x00" * 10)
+
+    storage = PackStorage(tmp_path)
+    assert storage.read(file_id) == (b"image data", ".jpg")
+    assert segment_path.stat().st_size == size
+    new_file_id = str(uuid4())
+    storage.put(new_file_id, ".png", b"new image")
+    assert storage.read(new_file_id) == (b"new image", ".png")
+    storage.close()
+
+
+def test_pack_storage_api(client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест загрузки, получения (Range, If-None-Match), превью и удаления файла в сегментах"""
+    storage = PackFileStorage(tmp_path, segment_max_bytes=1024 * 1024, fsync_interval_sec=0)
+    monkeypatch.setattr(api, "file_storage", storage)
+    monkeypatch.setattr(api.image_variant_store, "storage", storage)
+    monkeypatch.setattr(api.image_variant_store, "base_storage_path", tmp_path)
+
+    image_data = cv2.imencode(".png", np.zeros((40, 300), dtype=np.uint8))[1].tobytes()
+    response = client.post(
+        "/file-storage/upload-image/", files={"file": ("test.png", image_data, "image/png")}
+    )
+    assert response.status_code == 200
+    file_id = response.json()["file_id"]
+    assert not list(tmp_path.glob("??/??/*.png"))
+
+    response = client.get(f"/file-storage/files/{file_id}")
+    assert response.content == image_data
+    assert response.headers["content-type"] == "image/png"
+    assert (
+        client.get(
+            f"/file-storage/files/{file_id}", headers={"If-None-Match": response.headers["etag"]}
+        ).status_code
+        == 304
+    )
+
+    response = client.get(f"/file-storage/files/{file_id}", headers={"Range": "bytes=0-7"})
+    assert response.status_code == 206
+    assert response.content == image_data[:8]
+    assert response.headers["content-range"] == f"bytes 0-7/{len(image_data)}"
+    assert client.get(f"/file-storage/files/{file_id}", headers={"Range": "bytes=999999-"}).status_code == 416
+
+    response = client.get(f"/file-storage/files/{file_id}/preview", params={"width": 256})
+    assert response.status_code == 200
+    assert cv2.imdecode(np.frombuffer(response.content, dtype=np.uint8), cv2.IMREAD_COLOR).shape[1] == 256
+
+    assert len(list(tmp_path.glob(f"??/??/.variants/{file_id}_w256_*"))) == 1
+
+    assert client.delete(f"/file-storage/files/{file_id}").status_code == 204
+    assert client.get(f"/file-storage/files/{file_id}").status_code == 404
+    assert not list(tmp_path.glob("??/??/.variants/*"))
+    assert client.delete(f"/file-storage/files/{file_id}").status_code == 404
+    storage.close()
+
+
+def test_pack_storage_single_process_lock(tmp_path: Path) -> None:
+    """Тест блокировки директории сегментов: второй экземпляр не открывается, пока открыт первый"""
+    storage = PackStorage(tmp_path, fsync_interval_sec=0)
+    storage.open()
+    with pytest.raises(PackStorageLockedError):
+        PackStorage(tmp_path).open()
+    storage.close()
+
+    storage = PackStorage(tmp_path)
+    storage.open()
+    storage.close()
+
+
+def test_pack_storage_interrupted_compaction(tmp_path: Path) -> None:
+    """Тест запуска после сбоя пересборки (сегмент удален, индекс остался) и закрытого сегмента без индекса"""
+    storage = PackStorage(tmp_path, segment_max_bytes=700, fsync_interval_sec=0)
+    files = {str(uuid4()): bytes([i]) * 300 for i in range(5)}
+    for file_id, data in files.items():
+        storage.put(file_id, ".jpg", data)
+    storage.close()
+
+    (tmp_path / "segment-00000001.idx").unlink()
+    orphan_index_path = tmp_path / "segment-00000009.idx"
+    orphan_index_path.write_bytes(b"")
+
+    storage = PackStorage(tmp_path, segment_max_bytes=700, fsync_interval_sec=0)
+    for file_id, data in files.items():
+        assert storage.read(file_id) == (data, ".jpg")
+    assert not orphan_index_path.exists()
+    assert (tmp_path / "segment-00000001.idx").exists()
+    new_file_id = str(uuid4())
+    storage.put(new_file_id, ".jpg", b"new image")
+    storage.close()
+
+    storage = PackStorage(tmp_path)
+    assert storage.read(new_file_id) == (b"new image", ".jpg")
+    assert storage.stats()["files"] == 6
+    storage.close()
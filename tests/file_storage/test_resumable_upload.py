@@ -0,0 +1,115 @@
+import os
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.api.file_storage import resumable_upload
+from app.api.file_storage.api import BASE_STORAGE_PATH
+from app.api.file_storage.resumable_upload import (
+    cleanup_expired_upload_sessions,
+    create_upload_session,
+    get_session_paths,
+)
+from app.api.file_storage.utils import get_content_hasher, get_file_path_by_uuid
+from app.main import app
+
+
+def test_resumable_upload() -> None:
+    """Тест загрузки по частям с повтором части после "обрыва" и проверкой хэша"""
+    client = TestClient(app)
+    image = np.random.default_rng(0).integers(0, 255, (600, 600, 3), dtype=np.uint8)
+    image_data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+    content_hash = get_content_hasher()
+    content_hash.update(image_data)
+
+    response = client.post(
+        "/file-storage/uploads/",
+        json={"file_name": "photo.jpg", "content_type": "image/jpeg", "size": len(image_data)},
+    )
+    assert response.status_code == 201
+    upload_id = response.json()["upload_id"]
+
+    response = client.put(f"/file-storage/uploads/{upload_id}?offset=0", content=image_data[:100_000])
+    assert response.json()["offset"] == 100_000
+
+    # Повтор уже принятой части отклоняется с текущим смещением
+    response = client.put(f"/file-storage/uploads/{upload_id}?offset=0", content=image_data[:100_000])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "100000"
+
+    # Завершение до получения всех байт
+    response = client.post(
+        f"/file-storage/uploads/{upload_id}/complete", json={"content_hash": content_hash.hexdigest()}
+    )
+    assert response.status_code == 409
+
+    offset = client.get(f"/file-storage/uploads/{upload_id}").json()["offset"]
+    response = client.put(f"/file-storage/uploads/{upload_id}?offset={offset}", content=image_data[offset:])
+    assert response.json()["offset"] == len(image_data)
+
+    response = client.post(
+        f"/file-storage/uploads/{upload_id}/complete", json={"content_hash": content_hash.hexdigest()}
+    )
+    assert response.status_code == 200
+    assert response.json()["file_id"] == upload_id
+    assert response.json()["file_size_byte"] == len(image_data)
+    assert Path(get_file_path_by_uuid(upload_id, BASE_STORAGE_PATH)).read_bytes() == image_data
+
+    assert client.get(f"/file-storage/uploads/{upload_id}").status_code == 404
+
+
+def test_resumable_upload_checksum_mismatch() -> None:
+    """Тест отклонения файла с неверным хэшем и части больше объявленного размера"""
+    client = TestClient(app)
+
+    upload_id = client.post(
+        "/file-storage/uploads/", json={"file_name": "photo.png", "content_type": "image/png", "size": 4}
+    ).json()["upload_id"]
+
+    assert client.put(f"/file-storage/uploads/{upload_id}?offset=0", content=b"12345").status_code == 413
+    assert client.put(f"/file-storage/uploads/{upload_id}?offset=0", content=b"1234").status_code == 200
+
+    response = client.post(f"/file-storage/uploads/{upload_id}/complete", json={"content_hash": "0" * 64})
+    assert response.status_code == 400
+    assert client.get(f"/file-storage/uploads/{upload_id}").status_code == 404
+
+    assert client.get("/file-storage/uploads/..%2F..%2Fsecret").status_code == 404
+
+
+def test_resumable_upload_session_locks_released() -> None:
+    """Тест удаления блокировок сессий: после запросов к несуществующим и удаленным сессиям их не остается"""
+    client = TestClient(app)
+
+    assert client.put("/file-storage/uploads/garbage?offset=0", content=b"1234").status_code == 404
+    assert client.put(f"/file-storage/uploads/{uuid4()}?offset=0", content=b"1234").status_code == 404
+    assert (
+        client.post(f"/file-storage/uploads/{uuid4()}/complete", json={"content_hash": "0" * 64}).status_code
+        == 404
+    )
+
+    upload_id = client.post(
+        "/file-storage/uploads/", json={"file_name": "photo.png", "content_type": "image/png", "size": 4}
+    ).json()["upload_id"]
+    assert client.put(f"/file-storage/uploads/{upload_id}?offset=0", content=b"12").status_code == 200
+    assert client.delete(f"/file-storage/uploads/{upload_id}").status_code == 204
+    assert client.delete(f"/file-storage/uploads/{upload_id}").status_code == 404
+
+    assert resumable_upload._session_locks == {}
+
+
+def test_cleanup_expired_upload_sessions(tmp_path: Path) -> None:
+    """Тест удаления заброшенных сессий загрузки"""
+    expired = create_upload_session("old.jpg", "image/jpeg", 10, tmp_path)["upload_id"]
+    active = create_upload_session("new.jpg", "image/jpeg", 10, tmp_path)["upload_id"]
+
+    old_time = time.time() - 3600
+    for path in get_session_paths(expired, tmp_path):
+        os.utime(path, (old_time, old_time))
+
+    assert cleanup_expired_upload_sessions(tmp_path, ttl_sec=60) == 1
+    assert not any(path.exists() for path in get_session_paths(expired, tmp_path))
+    assert all(path.exists() for path in get_session_paths(active, tmp_path))
@@ -0,0 +1,86 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.api.qr_code_recognize import adaptive_pipeline
+from app.api.qr_code_recognize.adaptive_pipeline import AdaptivePipelineScheduler
+from app.api.qr_code_recognize.image_enhancement import BinarizationEnhancement, UpscaleEnhancement
+from app.api.qr_code_recognize.recognition_executor import RecognitionExecutor
+
+PIPELINE = [
+    BinarizationEnhancement(),
+    UpscaleEnhancement(scale_factor=2.0),
+    UpscaleEnhancement(scale_factor=4.0),
+]
+
+
+def collect_stats(scheduler: AdaptivePipelineScheduler) -> None:
+    for _ in range(10):
+        scheduler.record(PIPELINE[0].name, success=False, elapsed_ms=5)
+        scheduler.record(PIPELINE[1].name, success=True, elapsed_ms=20)
+        scheduler.record(PIPELINE[2].name, success=True, elapsed_ms=10)
+
+
+def test_adaptive_pipeline_order(tmp_path: Path) -> None:
+    """Тест упорядочивания улучшений по успешности на миллисекунду и пропуска бесполезных"""
+    stats_path = tmp_path / "stats.json"
+    scheduler = AdaptivePipelineScheduler(
+        stats_path=stats_path, min_attempts=10, prune_success_rate=0.05, exploration_rate=0
+    )
+    assert scheduler.order(PIPELINE) == PIPELINE
+
+    collect_stats(scheduler)
+    assert scheduler.order(PIPELINE) == [PIPELINE[2], PIPELINE[1]]
+
+    # Статистика переживает перезапуск
+    scheduler.save()
+    restored = AdaptivePipelineScheduler(
+        stats_path=stats_path, min_attempts=10, prune_success_rate=0.05, exploration_rate=0
+    )
+    assert restored.snapshot() == scheduler.snapshot()
+    assert restored.order(PIPELINE) == [PIPELINE[2], PIPELINE[1]]
+
+
+def test_adaptive_pipeline_deterministic() -> None:
+    """Тест детерминированного режима: порядок не меняется"""
+    scheduler = AdaptivePipelineScheduler(deterministic=True, min_attempts=10)
+    collect_stats(scheduler)
+    assert scheduler.order(PIPELINE) == PIPELINE
+    assert scheduler.snapshot() == {}
+
+
+def test_adaptive_pipeline_save_merges_processes(tmp_path: Path) -> None:
+    """Тест сохранения статистики несколькими процессами: замеры складываются, а не перезаписываются"""
+    stats_path = tmp_path / "stats.json"
+    first = AdaptivePipelineScheduler(stats_path=stats_path)
+    second = AdaptivePipelineScheduler(stats_path=stats_path)
+    collect_stats(first)
+    collect_stats(second)
+    first.save()
+    second.save()
+    second.save()
+
+    restored = AdaptivePipelineScheduler(stats_path=stats_path)
+    assert restored.snapshot()[PIPELINE[1].name] == {"attempts": 20, "successes": 20, "total_ms": 400.0}
+
+
+def record_in_worker() -> None:
+    collect_stats(adaptive_pipeline.pipeline_scheduler)
+
+
+def test_adaptive_pipeline_saved_at_worker_exit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: замеры процесса пула, не достигшие SAVE_EVERY_RECORDS, сохраняются при его завершении"""
+    stats_path = tmp_path / "stats.json"
+    monkeypatch.setattr(
+        adaptive_pipeline, "pipeline_scheduler", AdaptivePipelineScheduler(stats_path=stats_path)
+    )
+    executor = RecognitionExecutor(max_workers=1, max_queue_size=0, timeout=10)
+    try:
+        asyncio.run(executor.run(record_in_worker))
+        assert not stats_path.exists()
+    finally:
+        executor.shutdown()
+
+    restored = AdaptivePipelineScheduler(stats_path=stats_path)
+    assert restored.snapshot()[PIPELINE[1].name] == {"attempts": 10, "successes": 10, "total_ms": 200.0}
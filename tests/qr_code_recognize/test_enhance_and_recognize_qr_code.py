@@ -0,0 +1,114 @@
+from typing import Any
+
+import cv2
+import numpy as np
+import pytest
+
+from app.api.qr_code_recognize import enhance_and_recognize_qr_code as recognition
+from app.api.qr_code_recognize.adaptive_pipeline import AdaptivePipelineScheduler
+from app.api.qr_code_recognize.enhance_and_recognize_qr_code import (
+    enhance_and_recognize_qr_code,
+    enhance_and_recognize_qr_code_with_status,
+    get_qr_code_data,
+    get_qr_code_data_with_status,
+    get_reduction_factor,
+    recognize_reduced_image,
+)
+from app.api.qr_code_recognize.image_enhancement import BinarizationEnhancement, UpscaleEnhancement
+
+QR_CODE_DATA = "ST00012|Name=ООО Ромашка|PersonalAcc=40702810000000000000|Sum=12345"
+
+
+def make_qr_code_image(scale: float, extension: str = ".png") -> bytes:
+    """Изображение QR-кода, модуль которого занимает scale пикселей"""
+    qr_code = cv2.QRCodeEncoder.create().encode(QR_CODE_DATA)
+    qr_code = cv2.resize(qr_code, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    qr_code = cv2.copyMakeBorder(qr_code, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+    _, image_data = cv2.imencode(extension, qr_code)
+    return np.asarray(image_data).tobytes()
+
+
+def test_get_qr_code_data_from_bytes() -> None:
+    """Тест распознавания QR-кода из содержимого PNG файла без записи на диск"""
+    result = get_qr_code_data(make_qr_code_image(scale=8), "qr_code.png")
+
+    assert result == {"Name": "ООО Ромашка", "PersonalAcc": "40702810000000000000", "Sum": "123,45"}
+
+
+@pytest.mark.parametrize(
+    ("qr_content", "expected"),
+    [
+        ({"data": "https://example.com"}, ("https://example.com", True)),
+        ({"data": None, "double_encoded": False}, (None, True)),
+    ],
+)
+def test_get_qr_code_data_not_payment_or_undecoded(
+    monkeypatch: pytest.MonkeyPatch, qr_content: dict[str, Any], expected: tuple[Any, bool]
+) -> None:
+    """Тест: текст QR-кода не для оплаты возвращается как есть, недекодированные данные - None"""
+    monkeypatch.setattr(
+        recognition, "enhance_and_recognize_qr_code_with_status", lambda *_, **__: (qr_content, True)
+    )
+
+    assert get_qr_code_data_with_status(b"image", "qr_code.png") == expected
+
+
+def test_get_qr_code_data_broken_image() -> None:
+    """Тест обработки содержимого, которое не является изображением"""
+    assert get_qr_code_data(b"fake_image_data", "test_image.jpg") is None
+
+
+def test_enhance_and_recognize_qr_code_speculative() -> None:
+    """Тест параллельного распознавания: результат совпадает с последовательным"""
+    scheduler = AdaptivePipelineScheduler(deterministic=True)
+
+    # Мелкий QR-код распознается только после увеличения
+    image_data = make_qr_code_image(scale=1.5)
+    sequential = enhance_and_recognize_qr_code(image_data, scheduler=scheduler, speculative=False)
+    speculative = enhance_and_recognize_qr_code(image_data, scheduler=scheduler, speculative=True)
+
+    assert sequential is not None
+    assert speculative is not None
+    assert speculative["data"] == sequential["data"] == QR_CODE_DATA
+
+    assert enhance_and_recognize_qr_code(b"fake_image_data", scheduler=scheduler, speculative=True) is None
+
+
+def test_enhance_and_recognize_qr_code_pruned() -> None:
+    """Тест результата "не найден" после пропуска улучшений: он не окончательный"""
+    pipeline = [BinarizationEnhancement(), UpscaleEnhancement(scale_factor=2.0)]
+    scheduler = AdaptivePipelineScheduler(min_attempts=1, prune_success_rate=0.5, exploration_rate=0)
+    scheduler.record(pipeline[0].name, success=True, elapsed_ms=1)
+    scheduler.record(pipeline[1].name, success=False, elapsed_ms=1)
+
+    image_data = cv2.imencode(".png", np.full((100, 100), 255, dtype=np.uint8))[1].tobytes()
+    assert enhance_and_recognize_qr_code_with_status(image_data, pipeline, scheduler=scheduler) == (
+        None,
+        False,
+    )
+    assert enhance_and_recognize_qr_code_with_status(
+        image_data, pipeline, scheduler=AdaptivePipelineScheduler(deterministic=True)
+    ) == (None, True)
+    assert enhance_and_recognize_qr_code_with_status(b"fake_image_data", pipeline, scheduler=scheduler) == (
+        None,
+        True,
+    )
+
+
+def test_recognize_reduced_image() -> None:
+    """Тест распознавания большого фото на уменьшенной копии"""
+    assert get_reduction_factor(8000, 6000, target_size=1500) == 4
+    assert get_reduction_factor(3000, 2000, target_size=1500) == 2
+    assert get_reduction_factor(2000, 1500, target_size=1500) == 1
+
+    qr_code = cv2.imdecode(np.frombuffer(make_qr_code_image(scale=40), np.uint8), cv2.IMREAD_GRAYSCALE)
+    photo = np.full((3000, 4000), 255, dtype=np.uint8)
+    photo[500 : 500 + qr_code.shape[0], 800 : 800 + qr_code.shape[1]] = qr_code
+    image_data = cv2.imencode(".jpg", photo)[1].tobytes()
+
+    result = recognize_reduced_image(image_data, "photo.jpg", target_size=1500)
+    assert result is not None
+    assert result["data"] == QR_CODE_DATA
+
+    # Небольшие изображения сразу обрабатываются в полном разрешении
+    assert recognize_reduced_image(make_qr_code_image(scale=8, extension=".jpg"), "small.jpg", 1500) is None
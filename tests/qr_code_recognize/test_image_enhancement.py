@@ -0,0 +1,40 @@
+import numpy as np
+
+from app.api.qr_code_recognize.image_enhancement import (
+    BinarizationEnhancement,
+    EnhancementCache,
+    EnhancementChain,
+    UpscaleEnhancement,
+)
+
+
+class CountingUpscaleEnhancement(UpscaleEnhancement):
+    calls = 0
+
+    def enhance(self, image: np.ndarray) -> np.ndarray:
+        CountingUpscaleEnhancement.calls += 1
+        return super().enhance(image)
+
+
+def test_enhancement_grayscale() -> None:
+    """Тест: улучшения возвращают одноканальное изображение и для цветного входа"""
+    image = np.random.default_rng(0).integers(0, 255, (20, 30, 3), dtype=np.uint8)
+
+    assert UpscaleEnhancement(2.0).enhance(image).shape == (40, 60)
+    assert BinarizationEnhancement().enhance(image).shape == (20, 30)
+
+
+def test_enhancement_chain_reuses_steps() -> None:
+    """Тест: общий шаг цепочки и отдельного улучшения вычисляется один раз"""
+    image = np.random.default_rng(0).integers(0, 255, (20, 30), dtype=np.uint8)
+    upscale = CountingUpscaleEnhancement(2.0)
+    chain = EnhancementChain(upscale, BinarizationEnhancement())
+    assert chain.name == "Upscale (x2.0) -> Binarization Enhancement"
+
+    pipeline = [upscale, chain]
+    cache = EnhancementCache(pipeline)
+    results = [cache.enhance(enhancement, image) for enhancement in pipeline]
+
+    assert CountingUpscaleEnhancement.calls == 1
+    assert results[1].shape == (40, 60)
+    assert set(np.unique(results[1])) <= {0, 255}
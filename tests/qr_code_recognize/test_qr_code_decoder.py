@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.api.qr_code_recognize.adaptive_pipeline import AdaptivePipelineScheduler
+from app.api.qr_code_recognize.enhance_and_recognize_qr_code import (
+    decode_image,
+    enhance_and_recognize_qr_code,
+)
+from app.api.qr_code_recognize.qr_code_decoder import get_qr_code_decoders
+
+QR_CODE_DATA = "ST00012|Name=ООО Ромашка|Sum=12345"
+
+
+def make_qr_code(scale: int = 4) -> np.ndarray:
+    qr_code = cv2.QRCodeEncoder.create().encode(QR_CODE_DATA)
+    qr_code = cv2.resize(qr_code, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+    return cv2.copyMakeBorder(qr_code, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+
+
+@pytest.mark.parametrize("decoder_name", ["pyzbar", "opencv"])
+def test_qr_code_decoder(decoder_name: str) -> None:
+    """Тест распознавания каждым декодером: данные в байтах, имя декодера в результате"""
+    (decoder,) = get_qr_code_decoders([decoder_name])
+
+    decoded_objects = decoder.decode(make_qr_code())
+    assert len(decoded_objects) == 1
+    assert decoded_objects[0].data.decode("utf-8") == QR_CODE_DATA
+    assert decoded_objects[0].decoder == decoder_name
+    assert len(decoded_objects[0].polygon) >= 4
+
+    assert decoder.decode(np.full((100, 100), 255, dtype=np.uint8)) == []
+
+
+def test_decode_image_race() -> None:
+    """Тест последовательного и параллельного запуска декодеров"""
+    decoders = get_qr_code_decoders(["pyzbar", "opencv"])
+    image = make_qr_code()
+
+    assert decode_image(image, "test", decoders, race=False)[0].decoder == "pyzbar"
+    assert decode_image(image, "test", decoders, race=True)[0].data.decode("utf-8") == QR_CODE_DATA
+    assert decode_image(np.full((100, 100), 255, dtype=np.uint8), "test", decoders, race=True) == []
+
+
+def test_enhance_and_recognize_qr_code_decoder_order() -> None:
+    """Тест порядка декодеров: результат возвращает первый распознавший"""
+    scheduler = AdaptivePipelineScheduler(deterministic=True)
+    image_data = cv2.imencode(".png", make_qr_code())[1].tobytes()
+
+    result = enhance_and_recognize_qr_code(
+        image_data, scheduler=scheduler, decoders=get_qr_code_decoders(["opencv", "pyzbar"])
+    )
+    assert result is not None
+    assert result["decoder"] == "opencv"
+    assert result["data"] == QR_CODE_DATA
+
+
+def test_get_qr_code_decoders_unavailable(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест пропуска декодера opencv без распознавания в байтах (OpenCV до 4.11)"""
+
+    class QRCodeDetector:
+        def detectAndDecodeMulti(self, image: np.ndarray) -> None:
+            pass
+
+    monkeypatch.setattr(cv2, "QRCodeDetector", QRCodeDetector)
+
+    assert [decoder.name for decoder in get_qr_code_decoders(["pyzbar", "opencv"])] == ["pyzbar"]
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.api.qr_code_recognize import enhance_and_recognize_qr_code as recognition
+from app.api.qr_code_recognize.adaptive_pipeline import AdaptivePipelineScheduler
+from app.api.qr_code_recognize.enhance_and_recognize_qr_code import enhance_and_recognize_qr_code
+from app.api.qr_code_recognize.image_enhancement import BinarizationEnhancement, UpscaleEnhancement
+from app.api.qr_code_recognize.qr_code_localizer import crop_region, locate_qr_code_regions
+
+QR_CODE_DATA = "ST00012|Name=ООО Ромашка|PersonalAcc=40702810000000000000|Sum=12345"
+
+
+def make_receipt_photo() -> np.ndarray:
+    """Большое фото, на котором QR-код занимает небольшую часть кадра"""
+    qr_code = cv2.QRCodeEncoder.create().encode(QR_CODE_DATA)
+    qr_code = cv2.resize(qr_code, None, fx=10, fy=10, interpolation=cv2.INTER_NEAREST)
+    photo = np.full((3000, 4000), 200, dtype=np.uint8)
+    photo[1500 : 1500 + qr_code.shape[0], 2000 : 2000 + qr_code.shape[1]] = qr_code
+    return photo
+
+
+def test_locate_qr_code_regions() -> None:
+    """Тест поиска области QR-кода на уменьшенной копии"""
+    photo = make_receipt_photo()
+
+    regions = locate_qr_code_regions(photo, preview_size=1200, padding=0.25)
+
+    assert len(regions) == 1
+    x, y, w, h = regions[0]
+    assert x < 2020 and y < 1520
+    assert x + w > 2350 and y + h > 1850
+    assert w * h < photo.size / 10
+    assert crop_region(photo, regions[0]).shape == (h, w)
+
+
+def test_locate_qr_code_regions_not_found() -> None:
+    """Тест изображения без QR-кода"""
+    assert locate_qr_code_regions(np.full((600, 800), 200, dtype=np.uint8)) == []
+
+
+def test_enhance_and_recognize_qr_code_localization() -> None:
+    """Тест распознавания QR-кода в найденной области"""
+    _, image_data = cv2.imencode(".png", make_receipt_photo())
+    scheduler = AdaptivePipelineScheduler(deterministic=True)
+
+    result = enhance_and_recognize_qr_code(image_data.tobytes(), scheduler=scheduler, localization=True)
+
+    assert result is not None
+    assert result["data"] == QR_CODE_DATA
+    # Координаты - во всем изображении, а не в найденной области
+    x, y, w, h = result["rect"]
+    assert abs(x - 2000) < 50 and abs(y - 1500) < 50
+    assert all(1450 < point_y < 1950 for _, point_y in result["polygon"])
+
+
+def test_enhance_and_recognize_qr_code_localization_records_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест статистики улучшений: одна попытка на изображение, хотя улучшения применялись к области и кадру"""
+    monkeypatch.setattr(recognition, "locate_qr_code_regions", lambda *args, **kwargs: [(0, 0, 50, 50)])
+    _, image_data = cv2.imencode(".png", np.full((200, 200), 255, dtype=np.uint8))
+    scheduler = AdaptivePipelineScheduler()
+    pipeline = [BinarizationEnhancement(), UpscaleEnhancement(scale_factor=2.0)]
+
+    result = enhance_and_recognize_qr_code(
+        image_data.tobytes(),
+        pipeline,
+        scheduler=scheduler,
+        localization=True,
+        reduced_resolution=False,
+    )
+
+    assert result is None
+    snapshot = scheduler.snapshot()
+    assert {name: stats["attempts"] for name, stats in snapshot.items()} == {e.name: 1 for e in pipeline}
+    assert all(stats["successes"] == 0 for stats in snapshot.values())
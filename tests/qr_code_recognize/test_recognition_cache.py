@@ -0,0 +1,70 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.api.qr_code_recognize import recognition_cache
+from app.api.qr_code_recognize.recognition_cache import RecognitionCache
+
+
+def test_recognition_cache_lru() -> None:
+    """Тест вытеснения давно не использованных результатов"""
+    cache = RecognitionCache(max_size=2, ttl_sec=60)
+
+    async def scenario() -> None:
+        await cache.set("a", {"Sum": "1,00"})
+        await cache.set("b", None)
+        assert await cache.get("a") == (True, {"Sum": "1,00"})
+        await cache.set("c", "text")
+
+        assert await cache.get("b") == (False, None)
+        assert await cache.get("a") == (True, {"Sum": "1,00"})
+        assert await cache.get("c") == (True, "text")
+
+    asyncio.run(scenario())
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_recognition_cache_not_found_and_ttl() -> None:
+    """Тест кэширования результата "не найден" и истечения TTL"""
+    cache = RecognitionCache(max_size=10, ttl_sec=60)
+    asyncio.run(cache.set("a", None))
+    assert asyncio.run(cache.get("a")) == (True, None)
+
+    cache.ttl_sec = -1
+    assert asyncio.run(cache.get("a")) == (False, None)
+
+
+def test_recognition_cache_disk(tmp_path: Path) -> None:
+    """Тест хранения кэша в SQLite между перезапусками"""
+    db_path = tmp_path / "cache.sqlite"
+    asyncio.run(RecognitionCache(max_size=10, ttl_sec=60, db_path=db_path).set("a", {"Sum": "1,00"}))
+
+    cache = RecognitionCache(max_size=10, ttl_sec=60, db_path=db_path)
+    assert asyncio.run(cache.get("a")) == (True, {"Sum": "1,00"})
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_recognition_cache_disk_pruned(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест ограничения SQLite: истекшие и самые старые сверх disk_max_size результаты удаляются"""
+    monkeypatch.setattr(recognition_cache, "DISK_PRUNE_EVERY_WRITES", 5)
+    db_path = tmp_path / "cache.sqlite"
+    cache = RecognitionCache(max_size=100, ttl_sec=60, db_path=db_path, disk_max_size=3)
+
+    async def fill() -> None:
+        for i in range(10):
+            await cache.set(f"key-{i}", i)
+
+    asyncio.run(fill())
+
+    def disk_keys() -> list[str]:
+        with sqlite3.connect(db_path) as db:
+            return sorted(row[0] for row in db.execute("SELECT key FROM recognition_cache"))
+
+    assert disk_keys() == ["key-7", "key-8", "key-9"]
+
+    # Истекшие результаты удаляются при открытии кэша
+    RecognitionCache(max_size=100, ttl_sec=-1, db_path=db_path)
+    assert disk_keys() == []
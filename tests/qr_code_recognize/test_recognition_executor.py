@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+
+import pytest
+
+from app import logger as app_logger
+from app.api.qr_code_recognize.recognition_executor import RecognitionExecutor, RecognitionExecutorBusyError
+from app.api.qr_code_recognize.recognition_worker import warm_up_recognition_worker
+from app.logger import logger
+
+
+def test_recognition_executor_run() -> None:
+    """Тест выполнения задачи в пуле процессов"""
+    executor = RecognitionExecutor(max_workers=1, max_queue_size=0, timeout=10)
+    try:
+        assert asyncio.run(executor.run(pow, 2, 10)) == 1024
+        assert executor.in_flight == 0
+    finally:
+        executor.shutdown()
+
+
+def test_recognition_executor_busy() -> None:
+    """Тест отказа при заполненной очереди"""
+    executor = RecognitionExecutor(max_workers=1, max_queue_size=0, timeout=10)
+
+    async def run_two() -> None:
+        first = asyncio.create_task(executor.run(time.sleep, 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(RecognitionExecutorBusyError):
+            await executor.run(time.sleep, 0)
+        await first
+
+    try:
+        asyncio.run(run_two())
+    finally:
+        executor.shutdown()
+
+
+def test_recognition_executor_timeout() -> None:
+    """Тест таймаута задачи"""
+    executor = RecognitionExecutor(max_workers=1, max_queue_size=0, timeout=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            asyncio.run(executor.run(time.sleep, 1))
+    finally:
+        executor.shutdown()
+
+
+def test_recognition_executor_warm_up() -> None:
+    """Тест прогрева: процессы запускаются с initializer, пустые задачи не занимают очередь"""
+    executor = RecognitionExecutor(
+        max_workers=2, max_queue_size=0, timeout=10, initializer=warm_up_recognition_worker
+    )
+    try:
+        asyncio.run(executor.warm_up())
+        assert executor.in_flight == 0
+        assert asyncio.run(executor.run(pow, 2, 10)) == 1024
+    finally:
+        executor.shutdown()
+
+
+class RecordCollector(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.mark.parametrize("start_method", ["fork", "forkserver", "spawn"])
+def test_recognition_executor_logs_written_by_parent(
+    start_method: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Тест: записи процессов пула пишет основной процесс при любом способе запуска процессов"""
+    collector = RecordCollector()
+    assert app_logger._process_queue_listener is not None
+    monkeypatch.setattr(app_logger._process_queue_listener, "handlers", (collector,))
+
+    executor = RecognitionExecutor(
+        max_workers=1, max_queue_size=0, timeout=30, mp_context=multiprocessing.get_context(start_method)
+    )
+    try:
+        asyncio.run(executor.run(logger.warning, "Запись из пула: %s", start_method))
+    finally:
+        executor.shutdown()
+
+    deadline = time.monotonic() + 5
+    while not collector.records and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert [record.getMessage() for record in collector.records] == [f"Запись из пула: {start_method}"]
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import cv2
+from fastapi.testclient import TestClient
+
+from app.api.qr_code_recognize.models import RecognitionJob
+from app.api.qr_code_recognize.recognition_job_queue import RecognitionJobQueue
+
+
+def test_recognition_job_queue(tmp_path: Path) -> None:
+    """Тест порядка выбора задач и повторов"""
+    job_queue = RecognitionJobQueue(tmp_path / "jobs.sqlite3", max_attempts=2, retry_delay_sec=0)
+
+    low = asyncio.run(job_queue.enqueue("file-1", "/tmp/file-1.png", priority=0))
+    high = asyncio.run(job_queue.enqueue("file-2", "/tmp/file-2.png", priority=10))
+
+    # Сначала задача с большим приоритетом
+    claimed = job_queue.claim()
+    assert claimed is not None and claimed.id == high.id and claimed.attempts == 1
+
+    # Первая неудача - повтор, вторая - задача завершается со статусом failed
+    assert job_queue.fail(claimed, "error")
+    claimed = job_queue.claim()
+    assert claimed is not None and claimed.id == high.id and claimed.attempts == 2
+    assert not job_queue.fail(claimed, "error")
+    assert job_queue._get(high.id).status == "failed"  # type: ignore[union-attr]
+
+    async def run_worker_until_done() -> RecognitionJob | None:
+        async def handler(job: RecognitionJob) -> Any:
+            return {"file_id": job.file_id}
+
+        worker = asyncio.create_task(job_queue.run_worker(handler, poll_interval_sec=0.1))
+        try:
+            return await job_queue.get(low.id, wait_sec=5)
+        finally:
+            worker.cancel()
+
+    job = asyncio.run(run_worker_until_done())
+    assert job is not None
+    assert job.status == "done"
+    assert job.result == {"file_id": "file-1"}
+    job_queue.close()
+
+
+def test_recognition_job_queue_lease(tmp_path: Path) -> None:
+    """Тест удержания задачи: другой процесс берет ее только по истечении срока, результат прежнего не сохраняется"""
+    first = RecognitionJobQueue(tmp_path / "jobs.sqlite3", lease_sec=0.3)
+    second = RecognitionJobQueue(tmp_path / "jobs.sqlite3", lease_sec=0.3)
+    job = asyncio.run(first.enqueue("file-1", "/tmp/file-1.png"))
+
+    claimed = first.claim()
+    assert claimed is not None and claimed.owner == first.owner
+    assert second.claim() is None
+    assert first.renew_lease(job.id)
+    assert second.claim() is None
+
+    time.sleep(0.4)
+    claimed = second.claim()
+    assert claimed is not None and claimed.owner == second.owner and claimed.attempts == 2
+    assert not first.renew_lease(job.id)
+
+    first.complete(job.id, {"owner": "first"})
+    second.complete(job.id, {"owner": "second"})
+    assert second._get(job.id).result == {"owner": "second"}  # type: ignore[union-attr]
+    first.close()
+    second.close()
+
+
+def test_recognition_job_queue_claim_across_processes(tmp_path: Path) -> None:
+    """Тест одновременного выбора задач через два подключения к одной БД: каждая задача выбирается один раз"""
+    queues = [RecognitionJobQueue(tmp_path / "jobs.sqlite3") for _ in range(2)]
+    jobs = [asyncio.run(queues[0].enqueue(f"file-{i}", f"/tmp/file-{i}.png")) for i in range(20)]
+
+    def claim_all(job_queue: RecognitionJobQueue) -> list[str]:
+        claimed = []
+        while (job := job_queue.claim()) is not None:
+            claimed.append(job.id)
+        return claimed
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first_claimed, second_claimed = pool.map(claim_all, queues)
+
+    assert sorted(first_claimed + second_claimed) == sorted(job.id for job in jobs)
+    assert all(queues[0]._get(job.id).attempts == 1 for job in jobs)  # type: ignore[union-attr]
+    for job_queue in queues:
+        job_queue.close()
+
+
+def test_recognition_job_queue_worker_survives_errors(tmp_path: Path) -> None:
+    """Тест обработчика очереди: ошибка сохранения результата не останавливает его, старые задачи удаляются"""
+    job_queue = RecognitionJobQueue(tmp_path / "jobs.sqlite3", max_attempts=1, retry_delay_sec=0)
+    broken = asyncio.run(job_queue.enqueue("file-1", "/tmp/file-1.png", priority=10))
+    valid = asyncio.run(job_queue.enqueue("file-2", "/tmp/file-2.png"))
+
+    async def run_worker_until_done() -> RecognitionJob | None:
+        async def handler(job: RecognitionJob) -> Any:
+            # Результат, который нельзя сохранить в JSON
+            return object() if job.id == broken.id else {"file_id": job.file_id}
+
+        worker = asyncio.create_task(job_queue.run_worker(handler, poll_interval_sec=0.1))
+        try:
+            return await job_queue.get(valid.id, wait_sec=5)
+        finally:
+            worker.cancel()
+
+    job = asyncio.run(run_worker_until_done())
+    assert job is not None and job.status == "done"
+    assert job_queue._get(broken.id).status == "failed"  # type: ignore[union-attr]
+
+    assert job_queue.delete_finished(ttl_sec=60) == 0
+    assert job_queue.delete_finished(ttl_sec=0) == 2
+    assert job_queue._get(valid.id) is None
+    job_queue.close()
+
+
+def test_get_qr_code_data_async(client: TestClient) -> None:
+    """Тест асинхронного распознавания: постановка задачи и ожидание результата"""
+    qr_code = cv2.QRCodeEncoder.create().encode("ST00012|Name=ООО Ромашка|Sum=12345")
+    qr_code = cv2.resize(qr_code, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+    qr_code = cv2.copyMakeBorder(qr_code, 40, 40, 40, 40, cv2.BORDER_CONSTANT, value=255)
+    _, image_data = cv2.imencode(".jpg", qr_code)
+    files = {"file": ("qr_code.jpg", image_data.tobytes(), "image/jpeg")}
+
+    response = client.post("/file-storage/get-qr-code-data/async/", files=files, params={"priority": 5})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["Location"].endswith(f"/file-storage/jobs/{job_id}")
+
+    response = client.get(f"/file-storage/jobs/{job_id}", params={"wait": 20})
+    assert response.status_code == 200
+    job_status = response.json()
+    assert job_status["status"] == "done"
+    assert job_status["qr_code_data_result"]["Sum"] == "123,45"
+
+    assert client.get("/file-storage/jobs/unknown-job").status_code == 404
@@ -1,7 +1,11 @@
 from datetime import datetime
 
+import cv2
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core.load_monitor import load_monitor
 from app.main import app
 
 
@@ -40,3 +44,24 @@ def test_system_health() -> None:
     assert isinstance(json_data["environment"], str)
     assert isinstance(json_data["version"], str)
     assert isinstance(json_data["timestamp"], str)
+
+
+def test_system_health_ready(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест готовности и отказа 503 на распознавании при перегрузке; загрузка файлов продолжает работать"""
+    response = client.get("/system/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "OK"
+    assert response.json()["queues"]["recognition"]["capacity"] > 0
+
+    monkeypatch.setattr(load_monitor, "max_event_loop_lag_sec", -1.0)
+    response = client.get("/system/health/ready")
+    assert response.status_code == 503
+    assert response.json()["overload_reasons"] == ["event_loop_lag"]
+
+    image_data = cv2.imencode(".png", np.zeros((20, 20), dtype=np.uint8))[1].tobytes()
+    files = {"file": ("test.png", image_data, "image/png")}
+    response = client.post("/file-storage/get-qr-code-data/", files=files)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert client.post("/file-storage/upload-image/", files=files).status_code == 200
+    assert client.get("/system/health/detailed").status_code == 200
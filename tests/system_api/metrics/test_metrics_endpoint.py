@@ -0,0 +1,28 @@
+import cv2
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_metrics() -> None:
+    """Тест метрик после распознавания QR-кода"""
+    qr_code = cv2.QRCodeEncoder.create().encode("ST00012|Name=ООО Метрика|Sum=100")
+    qr_code = cv2.resize(qr_code, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+    qr_code = cv2.copyMakeBorder(qr_code, 40, 40, 40, 40, cv2.BORDER_CONSTANT, value=255)
+    _, image_data = cv2.imencode(".png", qr_code)
+    files = {"file": ("qr_code_metrics.png", image_data.tobytes(), "image/png")}
+
+    with TestClient(app) as client:
+        assert client.post("/file-storage/get-qr-code-data/", files=files).status_code == 200
+        response = client.get("/system/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for metric in [
+        'qr_recognition_stage_duration_seconds_count{stage="imread"}',
+        'qr_recognition_stage_duration_seconds_count{stage="parse_qr_data"}',
+        "qr_recognition_success_total",
+        "file_storage_stored_bytes_total",
+        "qr_recognition_in_flight",
+    ]:
+        assert metric in response.text
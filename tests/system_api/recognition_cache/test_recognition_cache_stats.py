@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_recognition_cache_stats() -> None:
+    client = TestClient(app)
+    response = client.get("/system/recognition-cache/stats")
+
+    assert response.status_code == 200
+
+    json_data = response.json()
+    for field in ["enabled", "size", "max_size", "hits", "disk_hits", "misses", "hit_rate"]:
+        assert field in json_data